@@ -1,20 +1,77 @@
-from neo4j import GraphDatabase
+from neo4j.exceptions import ServiceUnavailable, SessionExpired, TransientError
 from dotenv import load_dotenv
-import re
-import os
+from KG_Schema import ensure_schema
+from KG_Export import export_csv, import_command
+from KG_Driver import MAX_POOL_SIZE, close_pool, get_pool
+from KG_Graph import GRAPH_SNAPSHOT_PATH, LocalGraph, Neo4jGraph, load_records
+from KG_Parser import (CASE_LABELS, HASHED_LABELS, citation_extractor, collect_citations, collect_nodes, iter_batches,
+                       iter_case_records, iter_statutes)
+import argparse
+import queue
+import threading
+import time
 # 加載 .env 文件中的環境變數
 load_dotenv()
-# 連接到 Neo4j 資料庫
-# 使用環境變數
-uri = os.getenv("NEO4J_URI")
-username = os.getenv("NEO4J_USERNAME")
-password = os.getenv("NEO4J_PASSWORD")
-driver = GraphDatabase.driver(uri, auth=(username, password))
+# Neo4j 連線由 KG_Driver 的共用連線池在 main() 中建立（連線設定見 KG_Driver），export 模式不需要資料庫
+
+# 批次寫入時每個交易包含的案件數量
+BATCH_SIZE = 1000
+# 批量寫入引用關係時每個交易包含的關係數量
+CITATION_BATCH_SIZE = 10000
+# 管線模式的寫入執行緒數量、階段之間佇列可容納的批次數量及進度回報間隔（秒）
+WRITER_WORKERS = 4
+QUEUE_SIZE = 8
+PROGRESS_INTERVAL = 5
+# 寫入遇到暫時性錯誤時的重試次數與初始退避秒數
+MAX_RETRIES = 5
+RETRY_BACKOFF = 0.5
+
+# 各標籤節點連接到其父節點的 Cypher 片段（n 為節點本身，row.parent_id 為父節點 ID）
+PARENT_LINKS = {
+    "Statute": "MATCH (p:LawNode {name: '起訴書相關法條'}) MERGE (p)-[:相關法條]->(n)",
+    "Explanation": "MATCH (p:Statute {id: row.parent_id}) MERGE (p)-[:口語化解釋]->(n)",
+    "Case": "MATCH (p:ReferenceNode {name: '參考用判決書'}) MERGE (p)-[:參考用資料]->(n)",
+    "Fact": "MATCH (p:Case {id: row.parent_id}) MERGE (p)-[:案件事實]->(n)",
+    "LegalReference": "MATCH (p:Case {id: row.parent_id}) MERGE (p)-[:案件相關法條]->(n)",
+    "Compensation": "MATCH (p:Case {id: row.parent_id}) MERGE (p)-[:賠償]->(n)",
+    "CompensationItem": "MATCH (p:Compensation {id: row.parent_id}) MERGE (p)-[:細項]->(n)",
+}
+
+# 批次寫入語句（KG_Schema.check_query_plans 會以 EXPLAIN 檢查這些語句是否命中索引）
+# 以 UNWIND 批次創建某一標籤的節點並連接到其父節點，{label} 與 {parent_link} 由 PARENT_LINKS 填入
+MERGE_NODES_QUERY = (
+    "UNWIND $rows AS row "
+    "MERGE (n:{label} {{id: row.id}}) "
+    "SET n.text = row.text, n.content_hash = row.hash "
+    "WITH n, row "
+    "{parent_link}"
+)
+# 增量建置：新增或更新內容有變動的節點，並標記為需要重新嵌入
+UPSERT_CHANGED_QUERY = (
+    "UNWIND $rows AS row "
+    "MERGE (n:{label} {{id: row.id}}) "
+    "SET n.text = row.text, n.content_hash = row.hash, n.needs_embedding = true "
+    "WITH n, row "
+    "{parent_link}"
+)
+# 建立 LegalReference 與 Statute 之間的引用關係
+LINK_CITATIONS_QUERY = (
+    "UNWIND $rows AS row "
+    "MATCH (l:LegalReference {id: row.legal_id}), (s:Statute {id: row.statute_id}) "
+    "MERGE (l)-[r:引用法條]->(s) "
+    "SET r.qualifiers = row.qualifiers"
+)
+# 刪除來源中已不存在的節點
+DELETE_NODES_QUERY = "UNWIND $ids AS id MATCH (n:{label} {{id: id}}) DETACH DELETE n"
+
+# 函數：以標籤及其父節點連接片段填入 MERGE_NODES_QUERY 等語句樣板
+def node_query(template, label):
+    return template.format(label=label, parent_link=PARENT_LINKS[label])
 
 # 函數：創建 Statute 和 Explanation 節點
 def create_statute_and_explanation(tx, statute_id, statute_text, explanation_text):
-    tx.run("MERGE (s:Statute {id: $id, text: $text})", id=statute_id, text=statute_text)
-    tx.run("MERGE (e:Explanation {id: $id, text: $text})", id=f"{statute_id}_explanation", text=explanation_text)
+    tx.run("MERGE (s:Statute {id: $id}) SET s.text = $text", id=statute_id, text=statute_text)
+    tx.run("MERGE (e:Explanation {id: $id}) SET e.text = $text", id=f"{statute_id}_explanation", text=explanation_text)
     tx.run("MATCH (s:Statute {id: $id}), (e:Explanation {id: $explanation_id}) MERGE (s)-[:口語化解釋]->(e)",
            id=statute_id, explanation_id=f"{statute_id}_explanation")
     print(f"已建立{statute_id}節點")
@@ -34,12 +91,12 @@ def link_statutes(tx):
 
 # 函數：創建 Case 節點
 def create_case_node(tx, case_id, case_text):
-    tx.run("MERGE (c:Case {id: $id, text: $text})", id=case_id, text=case_text)
+    tx.run("MERGE (c:Case {id: $id}) SET c.text = $text", id=case_id, text=case_text)
     print(f"已建立{case_id}節點")
 
 # 函數：創建 Fact 節點
 def create_fact_node(tx, fact_id, fact_text):
-    tx.run("MERGE (f:Fact {id: $id, text: $text})", id=fact_id, text=fact_text)
+    tx.run("MERGE (f:Fact {id: $id}) SET f.text = $text", id=fact_id, text=fact_text)
     print(f"已建立{fact_id}節點")
 
 # 函數：連接 Fact 節點到 Case 節點
@@ -50,32 +107,22 @@ def link_fact_to_case(tx, case_id, fact_id):
 
 # 函數：創建 LegalReference 節點
 def create_legal_node(tx, legal_id, legal_text):
-    tx.run("MERGE (l:LegalReference {id: $id, text: $text})", id=legal_id, text=legal_text)
+    tx.run("MERGE (l:LegalReference {id: $id}) SET l.text = $text", id=legal_id, text=legal_text)
     print(f"已建立{legal_id}節點")
 
-# 函數：將法條格式標準化
-def normalize_statute_reference(reference):
-    # 將 "第191條之2" 轉換為 "191-2條"
-    normalized = re.sub(r"條之(\d+)", r"-\1條", reference)
-    return normalized
-
-def create_and_link_legal_node(tx, legal_id, legal_text):
+def create_and_link_legal_node(tx, legal_id, legal_text, citations):
     # 創建 LegalReference 節點
-    tx.run("MERGE (l:LegalReference {id: $id, text: $text})", id=legal_id, text=legal_text)
+    tx.run("MERGE (l:LegalReference {id: $id}) SET l.text = $text", id=legal_id, text=legal_text)
     print(f"已建立{legal_id}節點")
 
-    # 找出所有引用的法條
-    references = re.findall(r"第(\d+-?\d*條之?\d*)", legal_text)
-    for ref in references:
-        # 標準化引用格式
-        normalized_ref = normalize_statute_reference(ref)
-        statute_id = f"民法第{normalized_ref}"
-
+    # 解析時擷取的法條引用，項、款、前後段等限定語存為關係屬性
+    for row in citations:
+        statute_id = row["statute_id"]
         # 創建 LegalReference 節點與 Statute 節點的關係
         tx.run(
             "MATCH (l:LegalReference {id: $legal_id}), (s:Statute {id: $statute_id}) "
-            "MERGE (l)-[:引用法條]->(s)",
-            legal_id=legal_id, statute_id=statute_id
+            "MERGE (l)-[r:引用法條]->(s) SET r.qualifiers = $qualifiers",
+            legal_id=legal_id, statute_id=statute_id, qualifiers=row["qualifiers"]
         )
         print(f"將{legal_id}連結到{statute_id}")
 
@@ -87,7 +134,7 @@ def link_legal_to_case(tx, case_id, legal_id):
 
 # 函數：創建 Compensation 節點
 def create_compensation_node(tx, comp_id, comp_text):
-    tx.run("MERGE (comp:Compensation {id: $id, text: $text})", id=comp_id, text=comp_text)
+    tx.run("MERGE (comp:Compensation {id: $id}) SET comp.text = $text", id=comp_id, text=comp_text)
     print(f"已建立{comp_id}節點")
 
 # 函數：連接 Compensation 節點到 Case 節點
@@ -98,7 +145,7 @@ def link_compensation_to_case(tx, case_id, comp_id):
 
 # 函數：創建 CompensationItem 節點
 def create_comp_item_node(tx, item_id, item_text):
-    tx.run("MERGE (item:CompensationItem {id: $id, text: $text})", id=item_id, text=item_text)
+    tx.run("MERGE (item:CompensationItem {id: $id}) SET item.text = $text", id=item_id, text=item_text)
     print(f"已建立{item_id}節點")
 
 # 函數：連接 CompensationItem 節點到 Compensation 節點
@@ -134,79 +181,355 @@ def create_and_link_reference_data_node(tx):
            "MERGE (ref)-[:範例判決書]->(rn)")
     print("創建 參考資料 節點並將 起訴書相關法條 和 參考用判決書 連接到它")
 
-# 加載文檔並解析
-with open('statute.txt', 'r', encoding='utf-8') as file:
-    content = file.read()
-
-with driver.session() as session:
-    session.execute_write(delete_all_nodes)
-
-# 使用 """ 分割法條和口語化解釋
-sections = content.split('"""')
-for section in sections:
-    match = re.search(r"第 (\d+-?\d*) 條\n(.*?)\n口語化解釋:\s*(.*)", section, re.S)
-    if match:
-        statute_number = match.group(1).strip()
-        statute_text = match.group(2).strip()
-        explanation_text = match.group(3).strip()
-
-        statute_id = f"民法第{statute_number}條"
+# 函數：以 UNWIND 批次創建某一標籤的節點並連接到其父節點
+def merge_nodes_batch(tx, label, rows):
+    tx.run(node_query(MERGE_NODES_QUERY, label), rows=rows)
+
+# 函數：以 UNWIND 批次建立 LegalReference 與 Statute 之間的引用關係
+def link_citations_batch(tx, rows):
+    tx.run(LINK_CITATIONS_QUERY, rows=rows)
+
+# 函數：所有案件寫入後，一次批量寫入全部引用關係
+# write 為 session.execute_write 或 DriverPool.write（後者會計入連線池的統計）
+def link_citations_bulk(write, citations, batch_size=CITATION_BATCH_SIZE):
+    start = time.perf_counter()
+    for offset in range(0, len(citations), batch_size):
+        write(link_citations_batch, citations[offset:offset + batch_size])
+    elapsed = time.perf_counter() - start
+    print(f"已寫入 {len(citations)} 條引用關係，{len(citations) / max(elapsed, 1e-9):.1f} rows/sec")
+
+# 函數：以 UNWIND 批次創建 Statute 和 Explanation 節點
+def create_statutes_batch(tx, statutes):
+    nodes = collect_nodes(statutes, [])
+    merge_nodes_batch(tx, "Statute", nodes["Statute"])
+    merge_nodes_batch(tx, "Explanation", nodes["Explanation"])
+    print(f"已批次建立{len(statutes)}個法條節點")
+
+# 函數：以 UNWIND 在同一個交易中寫入已整理好的案件節點與結構關係
+def write_node_rows(tx, nodes):
+    for label in CASE_LABELS:
+        merge_nodes_batch(tx, label, nodes[label])
+    return sum(len(nodes[label]) for label in CASE_LABELS)
+
+# 函數：以 UNWIND 在同一個交易中批次寫入一批案件的所有節點與結構關係（引用關係另行批量寫入）
+def write_case_batch(tx, records):
+    return write_node_rows(tx, collect_nodes([], records))
+
+# 函數：逐筆交易寫入法條（原始寫法）
+def build_statutes(pool, statutes):
+    for statute in statutes:
+        with pool.session() as session:
+            session.execute_write(create_statute_and_explanation,
+                                  statute["id"], statute["text"], statute["explanation"])
+
+# 函數：逐筆交易寫入案件（原始寫法）
+def build_cases(session, records):
+    for record in records:
+        case_id = record["case_id"]
+        session.execute_write(create_case_node, case_id, record["case_text"])
+        session.execute_write(link_case_to_reference, case_id)
+        session.execute_write(create_fact_node, record["fact_id"], record["fact_text"])
+        session.execute_write(link_fact_to_case, case_id, record["fact_id"])
+
+        if record["legal_id"]:
+            session.execute_write(create_and_link_legal_node, record["legal_id"], record["legal_text"],
+                                  record["citations"])
+            session.execute_write(link_legal_to_case, case_id, record["legal_id"])
+
+        # Create and link the "賠償細項" node
+        if record["comp_id"]:
+            comp_id = record["comp_id"]
+            session.execute_write(create_compensation_node, comp_id, record["comp_text"])
+            session.execute_write(link_compensation_to_case, case_id, comp_id)
+            for item in record["comp_items"]:
+                session.execute_write(create_comp_item_node, item["id"], item["text"])
+                session.execute_write(link_comp_item_to_comp, comp_id, item["id"])
+
+# 函數：每 batch_size 個案件一個交易，以 UNWIND 批次寫入並回報吞吐量
+# records 可以是解析器產生的串流，邊解析邊寫入，不需要先把所有案件載入記憶體
+def build_cases_batched(session, records, batch_size=BATCH_SIZE):
+    start = time.perf_counter()
+    total_cases = 0
+    total_rows = 0
+    citations = []
+    for batch in iter_batches(records, batch_size):
+        total_rows += session.execute_write(write_case_batch, batch)
+        citations.extend(collect_citations(batch))
+        total_cases += len(batch)
+        elapsed = time.perf_counter() - start
+        print(f"已寫入 {total_cases} 個案件，"
+              f"{total_cases / elapsed:.1f} cases/sec，{total_rows / elapsed:.1f} rows/sec")
+    link_citations_bulk(session.execute_write, citations)
+    return total_cases, total_rows + len(citations)
+
+# 函數：執行寫入交易，遇到暫時性錯誤（死鎖、連線中斷、叢集切換）時以指數退避重試
+# write 為 session.execute_write 或 DriverPool.write
+def execute_write_with_retry(write, work, *args, retries=MAX_RETRIES):
+    for attempt in range(retries + 1):
+        try:
+            return write(work, *args)
+        except (TransientError, ServiceUnavailable, SessionExpired) as e:
+            if attempt == retries:
+                raise
+            delay = RETRY_BACKOFF * 2 ** attempt
+            print(f"寫入失敗（{type(e).__name__}），{delay:.1f} 秒後重試")
+            time.sleep(delay)
+
+# 函數：在佇列有空位前持續等待，若其他階段已失敗則放棄
+def _put(q, item, stop):
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+# 函數：從佇列取出下一個項目，若其他階段已失敗則回傳 None
+def _get(q, stop):
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.5)
+        except queue.Empty:
+            continue
+    return None
+
+# 函數：以「解析 -> 整理 -> 寫入」三段管線寫入案件
+# 各階段以有界佇列相連（佇列滿時上游會等待，形成背壓），寫入階段有 writers 個執行緒，
+# 各自經由共用的連線池（KG_Driver.DriverPool.write）寫入，讓解析與資料庫寫入同時進行，
+# 取得連線的等待時間與同時使用數都計入 pool.metrics
+def build_cases_pipelined(pool, records, batch_size=BATCH_SIZE, writers=WRITER_WORKERS, queue_size=QUEUE_SIZE):
+    batches = queue.Queue(maxsize=queue_size)
+    writes = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    done = threading.Event()
+    lock = threading.Lock()
+    errors = []
+    citations = []
+    stats = {"parsed": 0, "cases": 0, "rows": 0}
+    start = time.perf_counter()
+
+    def run_stage(stage):
+        def wrapper(*args):
+            try:
+                stage(*args)
+            except Exception as e:
+                errors.append(e)
+                stop.set()
+        return wrapper
+
+    def parse_stage():
+        try:
+            for batch in iter_batches(records, batch_size):
+                with lock:
+                    stats["parsed"] += len(batch)
+                if not _put(batches, batch, stop):
+                    return
+        finally:
+            _put(batches, None, stop)
+
+    def transform_stage():
+        try:
+            while (batch := _get(batches, stop)) is not None:
+                citations.extend(collect_citations(batch))
+                if not _put(writes, (len(batch), collect_nodes([], batch)), stop):
+                    return
+        finally:
+            for _ in range(writers):
+                _put(writes, None, stop)
+
+    def write_stage():
+        while (item := _get(writes, stop)) is not None:
+            case_count, nodes = item
+            rows = execute_write_with_retry(pool.write, write_node_rows, nodes)
+            with lock:
+                stats["cases"] += case_count
+                stats["rows"] += rows
+
+    def report_progress():
+        while not done.wait(PROGRESS_INTERVAL):
+            elapsed = time.perf_counter() - start
+            with lock:
+                parsed, cases, rows = stats["parsed"], stats["cases"], stats["rows"]
+            print(f"已解析 {parsed} 個案件，已寫入 {cases} 個案件，"
+                  f"{cases / elapsed:.1f} cases/sec，{rows / elapsed:.1f} rows/sec，"
+                  f"佇列 {batches.qsize()}/{writes.qsize()}")
+
+    threads = [threading.Thread(target=run_stage(parse_stage), name="parse"),
+               threading.Thread(target=run_stage(transform_stage), name="transform")]
+    threads += [threading.Thread(target=run_stage(write_stage), name=f"writer-{i}") for i in range(writers)]
+    reporter = threading.Thread(target=report_progress, name="progress", daemon=True)
+    for thread in threads:
+        thread.start()
+    reporter.start()
+    for thread in threads:
+        thread.join()
+    done.set()
+    if errors:
+        raise errors[0]
+
+    link_citations_bulk(pool.write, citations)
+    elapsed = time.perf_counter() - start
+    total_rows = stats["rows"] + len(citations)
+    print(f"管線寫入完成：{stats['cases']} 個案件，{total_rows} 筆節點與關係，耗時 {elapsed:.2f} 秒，"
+          f"{stats['cases'] / elapsed:.1f} cases/sec，{total_rows / elapsed:.1f} rows/sec")
+    return stats["cases"], total_rows
+
+# 函數：讀取圖中所有帶內容雜湊之節點的 (標籤, ID) -> 雜湊
+def fetch_node_hashes(tx):
+    results = tx.run(
+        "MATCH (n) WHERE n.id IS NOT NULL "
+        "RETURN labels(n)[0] AS label, n.id AS id, n.content_hash AS hash"
+    )
+    return {(record["label"], record["id"]): record["hash"] for record in results}
 
-        with driver.session() as session:
-            session.execute_write(create_statute_and_explanation, statute_id, statute_text, explanation_text)
+# 函數：批次刪除來源中已不存在的節點
+def delete_nodes_batch(tx, label, ids):
+    tx.run(node_query(DELETE_NODES_QUERY, label), ids=ids)
 
-# 加載範例案件並解析
-with open('example_cases.txt', 'r', encoding='utf-8') as file2:
-    content2 = file2.read()
+# 函數：批次新增或更新內容有變動的節點，並標記為需要重新嵌入
+def upsert_changed_nodes(tx, label, rows):
+    tx.run(node_query(UPSERT_CHANGED_QUERY, label), rows=rows)
 
-cases = [case.strip() for case in content2.split('"') if case.strip()]
+# 函數：刪除指定 LegalReference 既有的引用關係，以便依新條文重建
+def unlink_citations_batch(tx, legal_ids):
+    tx.run(
+        "UNWIND $ids AS id "
+        "MATCH (l:LegalReference {id: id})-[r:引用法條]->(:Statute) "
+        "DELETE r",
+        ids=legal_ids
+    )
 
-# 創建和連接所有節點
-with driver.session() as session:
+# 函數：比對來源與圖中的內容雜湊，只新增、更新或刪除有變動的節點與關係，回傳圖譜是否有變動
+def build_incremental(session, statutes, records, batch_size=BATCH_SIZE):
+    start = time.perf_counter()
+    existing = session.execute_read(fetch_node_hashes)
+    nodes = collect_nodes(statutes, records)
+
+    desired = {(label, row["id"]) for label, rows in nodes.items() for row in rows}
+    deleted = {}
+    for label, node_id in existing:
+        if (label, node_id) not in desired and label in nodes:
+            deleted.setdefault(label, []).append(node_id)
+    changed = {label: [row for row in rows if existing.get((label, row["id"])) != row["hash"]]
+               for label, rows in nodes.items()}
+
+    # 引用關係：條文有變動的 LegalReference 需重建，新出現的 Statute 也需補上既有判決書對它的引用
+    changed_legal_ids = {row["id"] for row in changed["LegalReference"]}
+    new_statute_ids = {row["id"] for row in changed["Statute"] if ("Statute", row["id"]) not in existing}
+    citations = [row for row in collect_citations(records)
+                 if row["legal_id"] in changed_legal_ids or row["statute_id"] in new_statute_ids]
+
+    # 確保錨點節點存在（MERGE 為冪等操作）
     session.execute_write(create_law_node)
-    
-    # 連接所有 Statute 節點到 "起訴書相關法條"
-    session.execute_write(link_statutes)
     session.execute_write(create_reference_node)
-
-    for i, case in enumerate(cases):
-        case_id = f"Case{i+1}"
-        match = re.search(r'一、(.*?)二、(.*)', case, re.S)
-        if match:
-            fact_text = match.group(1).strip()
-            remaining_text = match.group(2).strip()
-            comp_match = re.search(r'\（\s*一\s*\）', remaining_text)
-            if comp_match:
-                legal_text = remaining_text[:comp_match.start()].strip()
-                compensation_text = remaining_text[comp_match.start():].strip()
-            else:
-                legal_text = remaining_text
-                compensation_text = ""
-
-            session.execute_write(create_case_node, case_id, case)
-            session.execute_write(link_case_to_reference, case_id)
-            fact_id = f"Fact{i+1}"
-            session.execute_write(create_fact_node, fact_id, fact_text)
-            session.execute_write(link_fact_to_case, case_id, fact_id)
-            
-            if legal_text:
-                legal_id = f"Legal{i+1}"
-                session.execute_write(create_and_link_legal_node, legal_id, legal_text)
-                session.execute_write(link_legal_to_case, case_id, legal_id)
-            
-            # Create and link the "賠償細項" node
-            if compensation_text:
-                comp_id = f"Compensation{i+1}"
-                session.execute_write(create_compensation_node, comp_id, compensation_text)
-                session.execute_write(link_compensation_to_case, case_id, comp_id)
-
-                # Update the regular expression to handle both half-width and full-width brackets
-                comp_items = re.findall(r'[（(]([^）)]+)[）)]\s*(.*?)(?=[（(]\w+[）)]|$)', compensation_text, re.S)
-
-                for j, (item_label, item_text) in enumerate(comp_items):
-                    item_id = f"CompItem{i+1}_{j+1}"
-                    session.execute_write(create_comp_item_node, item_id, item_text.strip())
-                    session.execute_write(link_comp_item_to_comp, comp_id, item_id)
-
-    # 創建並連接 "參考資料" 節點
     session.execute_write(create_and_link_reference_data_node)
+
+    for label in reversed(HASHED_LABELS):
+        ids = deleted.get(label, [])
+        for offset in range(0, len(ids), batch_size):
+            session.execute_write(delete_nodes_batch, label, ids[offset:offset + batch_size])
+    for label in HASHED_LABELS:
+        rows = changed[label]
+        for offset in range(0, len(rows), batch_size):
+            session.execute_write(upsert_changed_nodes, label, rows[offset:offset + batch_size])
+    legal_ids = sorted(changed_legal_ids)
+    for offset in range(0, len(legal_ids), batch_size):
+        session.execute_write(unlink_citations_batch, legal_ids[offset:offset + batch_size])
+    link_citations_bulk(session.execute_write, citations)
+
+    elapsed = time.perf_counter() - start
+    for label in HASHED_LABELS:
+        if changed[label] or deleted.get(label):
+            print(f"{label}: 新增或更新 {len(changed[label])} 個，刪除 {len(deleted.get(label, []))} 個")
+    print(f"增量建置完成：共 {len(desired)} 個節點，"
+          f"{sum(len(rows) for rows in changed.values())} 個需要重新嵌入，耗時 {elapsed:.2f} 秒")
+    return bool(deleted or citations or any(changed.values()))
+
+def main():
+    parser = argparse.ArgumentParser(description="建立民法法條與範例判決書的知識圖譜")
+    parser.add_argument("--statutes", default="statute.txt", help="法條文檔路徑")
+    parser.add_argument("--cases", default="example_cases.txt", help="範例案件文檔路徑")
+    parser.add_argument("--mode", choices=["batch", "pipeline", "single", "incremental", "export", "local"],
+                        default="batch",
+                        help="batch: 以 UNWIND 批次寫入；pipeline: 解析與多個寫入執行緒同時進行；"
+                             "single: 每個節點一個交易；"
+                             "incremental: 保留既有圖譜，只寫入內容有變動的節點；"
+                             "export: 不連線資料庫，輸出 neo4j-admin import 格式的 CSV；"
+                             "local: 不連線資料庫，建立行程內圖譜快照")
+    parser.add_argument("--out", default="import", help="export 模式的 CSV 輸出目錄")
+    parser.add_argument("--snapshot", default=GRAPH_SNAPSHOT_PATH, help="local 模式的圖譜快照檔路徑")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="每個交易包含的案件數量")
+    parser.add_argument("--workers", type=int, default=0, help="平行解析案件的行程數量，0 表示不使用行程池")
+    parser.add_argument("--writers", type=int, default=WRITER_WORKERS, help="pipeline 模式的寫入執行緒數量")
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE, help="pipeline 模式各階段佇列可容納的批次數量")
+    args = parser.parse_args()
+
+    if args.mode == "export":
+        counts = export_csv(args.statutes, args.cases, args.out, workers=args.workers)
+        print(", ".join(f"{key}: {value}" for key, value in counts.items()))
+        print(f"匯入指令：{import_command(args.out)}")
+        return
+
+    if args.mode == "local":
+        start = time.perf_counter()
+        statutes = list(iter_statutes(args.statutes))
+        records = iter_case_records(args.cases, citation_extractor(statutes), workers=args.workers)
+        load_records(LocalGraph(args.snapshot), statutes, records, args.batch_size)
+        print(f"已建立圖譜快照 {args.snapshot}，耗時 {time.perf_counter() - start:.2f} 秒")
+        return
+
+    # 連接到 Neo4j 資料庫，連線池須足以供所有寫入執行緒同時使用
+    pool = get_pool(max_pool_size=max(MAX_POOL_SIZE, args.writers + 2))
+
+    # 加載文檔並解析
+    statutes = list(iter_statutes(args.statutes))
+
+    # 以串流方式解析範例案件，解析結果直接交給寫入流程
+    records = iter_case_records(args.cases, citation_extractor(statutes), workers=args.workers)
+
+    # 建立唯一性約束，讓以 id 進行的 MERGE/MATCH 都走索引
+    with pool.session() as session:
+        ensure_schema(session)
+
+    if args.mode == "incremental":
+        with pool.session() as session:
+            # 增量建置需要完整的來源資料才能找出被刪除的節點
+            changed = build_incremental(session, statutes, list(records), args.batch_size)
+        if changed:
+            # 更新建置編號，讓由圖譜衍生的檢索快照（KG_RetrievalSnapshot）失效
+            Neo4jGraph(pool).mark_build()
+        close_pool()
+        return
+
+    with pool.session() as session:
+        session.execute_write(delete_all_nodes)
+
+    if args.mode in ("batch", "pipeline"):
+        with pool.session() as session:
+            session.execute_write(create_statutes_batch, statutes)
+    else:
+        build_statutes(pool, statutes)
+
+    # 創建和連接所有節點
+    with pool.session() as session:
+        session.execute_write(create_law_node)
+
+        # 連接所有 Statute 節點到 "起訴書相關法條"
+        session.execute_write(link_statutes)
+        session.execute_write(create_reference_node)
+
+        if args.mode == "pipeline":
+            build_cases_pipelined(pool, records, args.batch_size, args.writers, args.queue_size)
+        elif args.mode == "batch":
+            build_cases_batched(session, records, args.batch_size)
+        else:
+            build_cases(session, records)
+
+        # 創建並連接 "參考資料" 節點
+        session.execute_write(create_and_link_reference_data_node)
+    Neo4jGraph(pool).mark_build()
+    close_pool()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+import argparse
+import re
+import timeit
+
+# 判決書中常見的法規名稱；建立擷取器時會再加入已知法條 ID 中出現的法規
+KNOWN_CODES = [
+    "民法",
+    "刑法",
+    "民事訴訟法",
+    "刑事訴訟法",
+    "強制汽車責任保險法",
+    "保險法",
+    "道路交通管理處罰條例",
+    "道路交通安全規則",
+]
+# 引用未標明法規時視為民法（與原本的擷取規則相同）
+DEFAULT_CODE = "民法"
+# 「同法」表示沿用前一個引用的法規
+SAME_CODE = "同法"
+# 法規名稱與條號之間最多容許的空白字元數
+CODE_GAP = 4
+# 兩個引用之間只有頓號或「及」等列舉連接詞時，未標明法規的後者沿用前者的法規
+ENUMERATION_SEPARATORS = frozenset(["", "、", "及", "以及", "暨"])
+
+STATUTE_ID_PATTERN = re.compile(r"^(.+?)第")
+ARTICLE_PATTERN = (r"第\s*(?P<article>\d+)(?:-(?P<dash>\d+))?\s*條(?:之(?P<sub>\d+))?"
+                   r"(?P<qualifier>(?:第\s*\d+\s*項)?(?:第\s*\d+\s*款)?(?:前段|後段|但書)?)")
+# 原本 KG_Parser 的寫法，只供 benchmark 比較
+LEGACY_REFERENCE_PATTERN = re.compile(r"第(\d+-?\d*條之?\d*)")
+LEGACY_SUB_ARTICLE_PATTERN = re.compile(r"條之(\d+)")
+
+class CitationExtractor:
+    """
+    法條引用擷取器。每段文字只以條號的正則掃描一次（以「第」開頭，re 可快速跳到下一個候選位置），
+    同時辨識條號（含「之」與「-」兩種寫法）及項、款、前後段等限定語；法規名稱編譯成單一正則
+    （依長度排序，最長者優先），只在每個條號之前的一小段文字中比對。
+
+    「同法」沿用前一個引用的法規；未標明法規的引用只有緊接在前一個引用之後的列舉
+    （例如「道路交通安全規則第94條、第95條」中的後者，兩者之間只有「、」或「及」）才沿用前一個引用的法規，
+    其餘視為民法。提供已知法條 ID 時，沿用後的法條不在其中則改回民法。
+    """
+
+    def __init__(self, statute_ids: Iterable[str] = (), codes: Iterable[str] = KNOWN_CODES,
+                 default_code: str = DEFAULT_CODE):
+        self.statute_ids = set(statute_ids)
+        code_names = set(codes) | {SAME_CODE}
+        for statute_id in self.statute_ids:
+            match = STATUTE_ID_PATTERN.match(statute_id)
+            if match:
+                code_names.add(match.group(1))
+        self.default_code = default_code
+        alternation = "|".join(re.escape(code) for code in sorted(code_names, key=len, reverse=True))
+        # 條號以「第」開頭，re 可直接跳到下一個「第」；法規名稱只在條號前的一小段文字中比對
+        self.pattern = re.compile(ARTICLE_PATTERN)
+        self.code_pattern = re.compile(f"(?P<code>{alternation})\\s*$")
+        self.code_window = max(map(len, code_names)) + CODE_GAP
+        # 法規名稱的最後一個字；條號前一個非空白字元不在其中時不必比對法規名稱
+        self.code_tails = frozenset(name[-1] for name in code_names)
+
+    def extract(self, text: str) -> List[Tuple[str, str]]:
+        """
+        擷取一段文字中的所有法條引用。
+
+        Args:
+            text (str): 判決書的法條段落。
+
+        Returns:
+            List[Tuple[str, str]]: 依出現順序排列的 (標準化法條 ID, 限定語)，
+            例如 ("民法第184條", "第1項前段")、("民法第191-2條", "")。
+        """
+        citations = []
+        previous: Optional[str] = None
+        code_search = self.code_pattern.search
+        code_tails = self.code_tails
+        statute_ids = self.statute_ids
+        # split 在 C 層一次完成掃描，每個引用佔 5 格：前方文字、條、-、之、限定語
+        parts = self.pattern.split(text)
+        for gap, article, dash, sub, qualifier in zip(parts[0::5], parts[1::5], parts[2::5], parts[3::5], parts[4::5]):
+            sub = dash or sub
+            if sub:
+                article = article + "-" + sub
+            explicit = None
+            if gap:
+                before = gap[-self.code_window:].rstrip()
+                if before and before[-1] in code_tails:
+                    code_match = code_search(before)
+                    explicit = code_match.group("code") if code_match else None
+            if explicit and explicit != SAME_CODE:
+                code = explicit
+            elif previous is not None and (explicit == SAME_CODE or gap.strip() in ENUMERATION_SEPARATORS):
+                code = previous
+            else:
+                code = self.default_code
+            statute_id = code + "第" + article + "條"
+            if code is previous and statute_ids and statute_id not in statute_ids:
+                code = self.default_code
+                statute_id = code + "第" + article + "條"
+            previous = code
+            if qualifier and not qualifier.isalnum():
+                qualifier = "".join(qualifier.split())
+            citations.append((statute_id, qualifier))
+        return citations
+
+    def extract_batch(self, texts: Iterable[Tuple[str, str]],
+                      stats: Optional[Dict[str, int]] = None) -> List[Dict[str, object]]:
+        """
+        擷取一批文字的法條引用，合併為可一次寫入的引用關係。
+
+        Args:
+            texts (Iterable[Tuple[str, str]]): (LegalReference ID, 法條段落)。
+            stats (Optional[Dict[str, int]]): 若提供，會累加 texts、citations、unresolved 計數。
+
+        Returns:
+            List[Dict[str, object]]: 每筆含 legal_id、statute_id 及 qualifiers（限定語列表）。
+            建立擷取器時若提供了已知法條 ID，不在其中的引用會被略過並計入 unresolved。
+        """
+        edges: Dict[Tuple[str, str], List[str]] = {}
+        statute_ids = self.statute_ids
+        n_texts = n_citations = n_unresolved = 0
+        for legal_id, text in texts:
+            n_texts += 1
+            for statute_id, qualifier in self.extract(text):
+                n_citations += 1
+                if statute_ids and statute_id not in statute_ids:
+                    n_unresolved += 1
+                    continue
+                qualifiers = edges.get((legal_id, statute_id))
+                if qualifiers is None:
+                    qualifiers = edges[(legal_id, statute_id)] = []
+                if qualifier and qualifier not in qualifiers:
+                    qualifiers.append(qualifier)
+        if stats is not None:
+            for name, count in (("texts", n_texts), ("citations", n_citations), ("unresolved", n_unresolved)):
+                stats[name] = stats.get(name, 0) + count
+        return [{"legal_id": legal_id, "statute_id": statute_id, "qualifiers": qualifiers}
+                for (legal_id, statute_id), qualifiers in edges.items()]
+
+def benchmark(statute_path: str, case_path: str, repeat: int = 7, number: int = 20) -> None:
+    """
+    以完整語料比較原本的寫法（逐段 findall、標準化「條之」、過濾未知法條、合併同一對節點）與擷取器的吞吐量。
+    兩者產生同樣形式的引用關係，但原本的寫法一律視為民法，也不擷取限定語。
+
+    Args:
+        statute_path (str): 法條文檔路徑。
+        case_path (str): 範例案件文檔路徑。
+        repeat (int): 量測次數，取最佳值。
+        number (int): 每次量測處理整份語料的次數。
+    """
+    from KG_Parser import iter_case_records, iter_statutes
+
+    statute_ids = [statute["id"] for statute in iter_statutes(statute_path)]
+    extractor = CitationExtractor(statute_ids)
+    known = set(statute_ids)
+    texts = [(record["legal_id"], record["legal_text"])
+             for record in iter_case_records(case_path, extractor) if record["legal_id"]]
+
+    def legacy():
+        edges: Dict[Tuple[str, str], List[str]] = {}
+        for legal_id, text in texts:
+            for ref in LEGACY_REFERENCE_PATTERN.findall(text):
+                statute_id = "民法第" + LEGACY_SUB_ARTICLE_PATTERN.sub(r"-\1條", ref)
+                if statute_id in known:
+                    edges.setdefault((legal_id, statute_id), [])
+        return [{"legal_id": legal_id, "statute_id": statute_id, "qualifiers": qualifiers}
+                for (legal_id, statute_id), qualifiers in edges.items()]
+
+    for name, run in [("legacy", legacy), ("extractor", lambda: extractor.extract_batch(texts))]:
+        best = min(timeit.repeat(run, number=number, repeat=repeat)) / number
+        print(f"{name}: {len(texts)} 段文字，{best * 1000:.2f} ms，{len(texts) / best:.1f} texts/sec")
+    stats: Dict[str, int] = {}
+    edges = extractor.extract_batch(texts, stats)
+    print(f"引用 {stats.get('citations', 0)} 筆，無對應法條 {stats.get('unresolved', 0)} 筆，"
+          f"合併後 {len(edges)} 條引用關係")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="法條引用擷取吞吐量測試")
+    parser.add_argument("--statutes", default="statute.txt", help="法條文檔路徑")
+    parser.add_argument("--cases", default="example_cases.txt", help="範例案件文檔路徑")
+    args = parser.parse_args()
+    benchmark(args.statutes, args.cases)
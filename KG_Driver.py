@@ -0,0 +1,252 @@
+from collections import deque
+from dotenv import load_dotenv
+from typing import Any, Callable, Dict, Iterator, Optional
+import argparse
+import atexit
+import numpy as np
+import os
+import threading
+import time
+
+# 加載 .env 文件中的環境變數
+load_dotenv()
+
+# 連線設定
+NEO4J_URI = os.getenv("NEO4J_URI")
+NEO4J_USERNAME = os.getenv("NEO4J_USERNAME")
+NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")
+# 資料庫名稱，未設定時使用伺服器的預設資料庫
+NEO4J_DATABASE = os.getenv("NEO4J_DATABASE") or None
+# 連線池大小、每次從伺服器拉取的記錄數，以及各項逾時（秒）
+MAX_POOL_SIZE = int(os.getenv("NEO4J_MAX_POOL_SIZE", "100"))
+FETCH_SIZE = int(os.getenv("NEO4J_FETCH_SIZE", "1000"))
+CONNECTION_TIMEOUT = float(os.getenv("NEO4J_CONNECTION_TIMEOUT", "30"))
+ACQUISITION_TIMEOUT = float(os.getenv("NEO4J_ACQUISITION_TIMEOUT", "60"))
+MAX_RETRY_TIME = float(os.getenv("NEO4J_MAX_RETRY_TIME", "30"))
+MAX_CONNECTION_LIFETIME = float(os.getenv("NEO4J_MAX_CONNECTION_LIFETIME", "3600"))
+# 計算等待時間百分位數時保留的最近取得連線次數
+METRICS_WINDOW = 10000
+
+class PoolMetrics:
+    """
+    取得連線的統計：從開啟 session 到交易函數開始執行（或串流查詢送出）的等待時間、同時進行中的查詢數（含等待連線者），
+    以及因連線池已滿而逾時的次數。neo4j 驅動程式沒有公開連線池的統計，因此在 DriverPool 的進出點量測。
+    """
+
+    def __init__(self, window: int = METRICS_WINDOW):
+        self.lock = threading.Lock()
+        self.waits = deque(maxlen=window)
+        self.acquisitions = 0
+        self.timeouts = 0
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def begin(self) -> float:
+        with self.lock:
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+        return time.perf_counter()
+
+    def acquired(self, start: float) -> None:
+        wait = time.perf_counter() - start
+        with self.lock:
+            self.acquisitions += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            self.waits.append(wait)
+
+    def end(self, timed_out: bool = False) -> None:
+        with self.lock:
+            self.in_use -= 1
+            if timed_out:
+                self.timeouts += 1
+
+    def snapshot(self) -> Dict[str, float]:
+        """
+        回傳目前的統計。
+
+        Returns:
+            Dict[str, float]: acquisitions、timeouts、in_use、peak_in_use，
+            以及等待時間的 mean_wait_ms、p50_wait_ms、p99_wait_ms、max_wait_ms。
+        """
+        with self.lock:
+            waits = np.array(self.waits) * 1000 if self.waits else np.zeros(1)
+            return {
+                "acquisitions": self.acquisitions,
+                "timeouts": self.timeouts,
+                "in_use": self.in_use,
+                "peak_in_use": self.peak_in_use,
+                "mean_wait_ms": self.total_wait / max(self.acquisitions, 1) * 1000,
+                "p50_wait_ms": float(np.percentile(waits, 50)),
+                "p99_wait_ms": float(np.percentile(waits, 99)),
+                "max_wait_ms": self.max_wait * 1000,
+            }
+
+def _is_acquisition_timeout(error: Exception) -> bool:
+    return "failed to obtain a connection from the pool" in str(error)
+
+class DriverPool:
+    """
+    包裝 neo4j 驅動程式（本身即為連線池）：以設定好的 fetch_size 與資料庫開啟 session，
+    查詢走 execute_read（叢集中會被導向讀取節點，暫時性錯誤會自動重試），寫入走 execute_write，
+    並記錄取得連線的統計。
+    """
+
+    def __init__(self, uri: Optional[str] = NEO4J_URI, auth: Any = (NEO4J_USERNAME, NEO4J_PASSWORD),
+                 max_pool_size: int = MAX_POOL_SIZE, fetch_size: int = FETCH_SIZE,
+                 database: Optional[str] = NEO4J_DATABASE):
+        from neo4j import GraphDatabase
+
+        self.driver = GraphDatabase.driver(
+            uri, auth=auth,
+            max_connection_pool_size=max_pool_size,
+            connection_timeout=CONNECTION_TIMEOUT,
+            connection_acquisition_timeout=ACQUISITION_TIMEOUT,
+            max_transaction_retry_time=MAX_RETRY_TIME,
+            max_connection_lifetime=MAX_CONNECTION_LIFETIME,
+        )
+        self.max_pool_size = max_pool_size
+        self.fetch_size = fetch_size
+        self.database = database
+        self.metrics = PoolMetrics()
+        self.closed = False
+
+    def session(self, **config):
+        """以共用設定開啟 session，config 可覆寫 fetch_size、default_access_mode 等 session 設定。"""
+        return self.driver.session(**{"database": self.database, "fetch_size": self.fetch_size, **config})
+
+    def _execute(self, write: bool, work: Callable[..., Any], *args, **kwargs) -> Any:
+        start = self.metrics.begin()
+        acquired = False
+
+        def timed(tx, *work_args, **work_kwargs):
+            nonlocal acquired
+            if not acquired:
+                # 只記錄第一次執行：重試時等待的是退避時間，不是連線池
+                acquired = True
+                self.metrics.acquired(start)
+            return work(tx, *work_args, **work_kwargs)
+
+        timed_out = False
+        try:
+            with self.session() as session:
+                execute = session.execute_write if write else session.execute_read
+                return execute(timed, *args, **kwargs)
+        except Exception as e:
+            timed_out = _is_acquisition_timeout(e)
+            raise
+        finally:
+            self.metrics.end(timed_out)
+
+    def read(self, work: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        以讀取交易執行 work(tx, *args, **kwargs)。結果必須在 work 內讀完（例如 list(result) 或 result.data()）。
+
+        Returns:
+            Any: work 的回傳值。
+        """
+        return self._execute(False, work, *args, **kwargs)
+
+    def write(self, work: Callable[..., Any], *args, **kwargs) -> Any:
+        """以寫入交易執行 work(tx, *args, **kwargs)，回傳其回傳值。"""
+        return self._execute(True, work, *args, **kwargs)
+
+    def stream(self, query: str, **parameters) -> Iterator[Any]:
+        """
+        以讀取模式的自動提交查詢逐筆串流結果，每次向伺服器拉取 fetch_size 筆，用於讀出大量節點。
+
+        Yields:
+            neo4j.Record: 查詢結果。
+        """
+        from neo4j import READ_ACCESS
+
+        start = self.metrics.begin()
+        timed_out = False
+        try:
+            with self.session(default_access_mode=READ_ACCESS) as session:
+                result = session.run(query, parameters)
+                self.metrics.acquired(start)
+                yield from result
+        except Exception as e:
+            timed_out = _is_acquisition_timeout(e)
+            raise
+        finally:
+            self.metrics.end(timed_out)
+
+    def close(self) -> None:
+        if not self.closed:
+            self.closed = True
+            self.driver.close()
+
+_pool: Optional[DriverPool] = None
+_pool_lock = threading.Lock()
+
+def get_pool(max_pool_size: Optional[int] = None) -> DriverPool:
+    """
+    取得行程內共用的連線池，第一次呼叫時才建立驅動程式（匯入模組時不會連線），行程結束時自動關閉。
+
+    Args:
+        max_pool_size (Optional[int]): 第一次建立時的連線池大小，None 表示 NEO4J_MAX_POOL_SIZE。
+            連線池已建立時只能為 None 或與現有大小相同。
+
+    Returns:
+        DriverPool: 共用的連線池。
+
+    Raises:
+        ValueError: 連線池已以不同大小建立（需先 close_pool() 再以新的大小建立）。
+    """
+    global _pool
+    pool = _pool
+    if pool is None or pool.closed:
+        with _pool_lock:
+            if _pool is None or _pool.closed:
+                if _pool is None:
+                    atexit.register(close_pool)
+                _pool = DriverPool(max_pool_size=max_pool_size or MAX_POOL_SIZE)
+            pool = _pool
+    if max_pool_size is not None and max_pool_size != pool.max_pool_size:
+        raise ValueError(f"共用連線池已以大小 {pool.max_pool_size} 建立，無法改為 {max_pool_size}；"
+                         f"請先呼叫 close_pool()")
+    return pool
+
+def close_pool() -> None:
+    """關閉共用的連線池（可重複呼叫）；之後再呼叫 get_pool() 會重新建立。"""
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+
+def load_test(concurrency: int, requests: int, query: str = "RETURN 1 AS value") -> Dict[str, float]:
+    """
+    以多個執行緒同時送出讀取查詢，量測在此並行度下取得連線的等待時間，用來決定連線池大小。
+
+    Args:
+        concurrency (int): 同時查詢的執行緒數量。
+        requests (int): 總查詢次數。
+        query (str): 查詢語句。
+
+    Returns:
+        Dict[str, float]: PoolMetrics.snapshot() 的結果，另含 seconds（總耗時）。
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    pool = get_pool()
+    pool.metrics = PoolMetrics()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(lambda _: pool.read(lambda tx: tx.run(query).consume()), range(requests)))
+    return {**pool.metrics.snapshot(), "seconds": time.perf_counter() - start}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="以並行讀取查詢量測 Neo4j 連線池取得連線的等待時間")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128], help="同時查詢的執行緒數量")
+    parser.add_argument("--requests", type=int, default=2000, help="每種並行度的總查詢次數")
+    args = parser.parse_args()
+
+    print(f"連線池大小 {get_pool().max_pool_size}，fetch_size {get_pool().fetch_size}")
+    for concurrency in args.concurrency:
+        metrics = load_test(concurrency, args.requests)
+        print(f"並行 {concurrency:>4}：{args.requests / metrics['seconds']:.0f} 查詢/秒，"
+              f"等待連線 p50 {metrics['p50_wait_ms']:.2f} ms，p99 {metrics['p99_wait_ms']:.2f} ms，"
+              f"最大 {metrics['max_wait_ms']:.2f} ms，同時使用 {metrics['peak_in_use']}，逾時 {metrics['timeouts']}")
@@ -1,37 +1,89 @@
-from neo4j import GraphDatabase
-from sentence_transformers import SentenceTransformer
-from dotenv import load_dotenv
+from KG_Graph import get_graph
+from KG_Parser import HASHED_LABELS, content_hash, iter_batches
+from KG_VectorStore import get_vector_store
+from KG_EmbeddingCache import cached_model
+from KG_Encoder import ENCODER_QUANTIZE
+import argparse
 import os
-# 連接到 Neo4j
-# 加載 .env 文件中的環境變數
-load_dotenv()
-
-# 使用環境變數
-uri = os.getenv("NEO4J_URI")
-username = os.getenv("NEO4J_USERNAME")
-password = os.getenv("NEO4J_PASSWORD")
-driver = GraphDatabase.driver(uri, auth=(username, password))
-
-# 加載嵌入模型
-model = SentenceTransformer('shibing624/text2vec-base-chinese')
-
-# 提取節點文本並生成嵌入向量
-def add_embeddings_to_nodes():
-    with driver.session() as session:
-        # 提取所有需要嵌入的節點
-        nodes = session.run("MATCH (n) RETURN elementId(n) AS id, n.text AS text")
-        
-        for record in nodes:
-            node_id = record["id"]
-            text = record["text"]
-            if text:  # 確保文本不為空
-                # 生成嵌入向量
-                embedding = model.encode(text).tolist()
-                # 更新節點，將嵌入向量存為屬性
-                session.run(
-                    "MATCH (n) WHERE elementId(n) = $id SET n.embedding = $embedding",
-                    id=node_id, embedding=embedding
-                )
-
-# 執行嵌入添加
-add_embeddings_to_nodes()
+import time
+
+MODEL_NAME = 'shibing624/text2vec-base-chinese'
+# 每批送進模型的文本數量
+ENCODE_BATCH_SIZE = 64
+# 每次寫回圖譜的批數：一次交給編碼服務 WRITE_BATCHES * 行程數 批，讓每個編碼行程都有工作
+WRITE_BATCHES = 2
+# 每寫回幾次就將圖譜持久化一次（local 後端），中斷後重新執行會從最後一次持久化的位置繼續
+CHECKPOINT_EVERY = 20
+# 嵌入整個圖譜時的編碼行程數量
+EMBEDDING_WORKERS = int(os.getenv("KG_EMBEDDING_WORKERS", str(max(1, (os.cpu_count() or 1) // 4))))
+
+# 節點上記錄的模型名稱（量化模型的向量不同，名稱加上 +int8，與 EncoderService.cache_name 相同）
+EMBEDDING_MODEL = f"{MODEL_NAME}+int8" if ENCODER_QUANTIZE else MODEL_NAME
+
+_model = None
+
+def get_model():
+    """加載嵌入模型（第一次呼叫時才建立）；重建圖譜後文本未變的節點直接從嵌入快取取得向量。"""
+    global _model
+    if _model is None:
+        _model = cached_model(MODEL_NAME, workers=EMBEDDING_WORKERS)
+    return _model
+
+# 函數：找出需要嵌入的節點：沒有嵌入、文本在嵌入後有變動、被增量建置標記、嵌入是由其他模型產生，
+# 或向量存放區中沒有對應版本的向量（包含舊版存在節點屬性上的嵌入）
+def select_nodes_to_embed(graph, store, label, force=False):
+    nodes = []
+    properties = ["id", "text", "embedding_hash", "embedding_model", "needs_embedding", "vector_row", "vector_version"]
+    for record in graph.iter_nodes(label, properties):
+        text = record["text"]
+        if not text:  # 確保文本不為空
+            continue
+        text_hash = content_hash(text)
+        if (force or record["needs_embedding"] or record["embedding_hash"] != text_hash
+                or record["embedding_model"] != EMBEDDING_MODEL
+                or store.version(record["vector_row"]) != record["vector_version"]):
+            nodes.append({"id": record["id"], "text": text, "hash": text_hash})
+    return nodes
+
+# 提取節點文本並批次生成嵌入向量，只處理需要（重新）嵌入的節點
+def add_embeddings_to_nodes(labels=HASHED_LABELS, batch_size=ENCODE_BATCH_SIZE, force=False):
+    graph = get_graph()
+    model = get_model()
+    start = time.perf_counter()
+    total = 0
+    for label in labels:
+        store = get_vector_store(label, writable=True)
+        nodes = select_nodes_to_embed(graph, store, label, force)
+        print(f"{label}: {len(nodes)} 個節點需要嵌入")
+        chunk_size = batch_size * WRITE_BATCHES * max(1, EMBEDDING_WORKERS)
+        for i, batch in enumerate(iter_batches(nodes, chunk_size), start=1):
+            # 生成嵌入向量（編碼服務依長度分批並分送給各編碼行程）
+            embeddings = model.encode([node["text"] for node in batch], batch_size=batch_size)
+            # 向量寫入向量存放區，節點只記錄列號、版本及對應的文本雜湊，並清除需要重新嵌入的標記與舊的嵌入屬性
+            locations = store.put([node["id"] for node in batch], embeddings)
+            graph.upsert_nodes(label, [
+                {"id": node["id"], "vector_row": row, "vector_version": version, "embedding_hash": node["hash"],
+                 "embedding_model": EMBEDDING_MODEL, "needs_embedding": None, "embedding": None}
+                for node, (row, version) in zip(batch, locations)
+            ])
+            total += len(batch)
+            if i % CHECKPOINT_EVERY == 0:
+                graph.flush()
+                print(f"{label}: 已嵌入 {min(i * chunk_size, len(nodes))}/{len(nodes)}")
+        graph.flush()
+    model.flush()
+    elapsed = time.perf_counter() - start
+    stats = model.stats()
+    print(f"共嵌入 {total} 個節點，耗時 {elapsed:.2f} 秒，"
+          f"快取命中 {stats['memory_hits'] + stats['disk_hits']} 筆，模型編碼 {stats['misses']} 筆")
+    return total
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="為圖譜節點批次生成嵌入向量")
+    parser.add_argument("--labels", nargs="+", default=HASHED_LABELS, choices=HASHED_LABELS, help="要嵌入的節點標籤")
+    parser.add_argument("--batch-size", type=int, default=ENCODE_BATCH_SIZE, help="每批編碼與寫回的節點數量")
+    parser.add_argument("--force", action="store_true", help="忽略既有嵌入，全部重新嵌入")
+    args = parser.parse_args()
+
+    # 執行嵌入添加
+    add_embeddings_to_nodes(args.labels, args.batch_size, args.force)
@@ -0,0 +1,262 @@
+from collections import OrderedDict
+from dotenv import load_dotenv
+from typing import Any, Dict, List, Optional, Sequence, Union
+import argparse
+import hashlib
+import numpy as np
+import os
+import threading
+
+# 加載 .env 文件中的環境變數
+load_dotenv()
+
+# 快取目錄，每個模型各自一組向量檔與鍵值索引檔
+EMBEDDING_CACHE_DIR = os.getenv("KG_EMBEDDING_CACHE_DIR", "embedding_cache")
+# 磁碟上最多保留的向量筆數，超過時淘汰最久未使用的向量
+EMBEDDING_CACHE_SIZE = int(os.getenv("KG_EMBEDDING_CACHE_SIZE", "200000"))
+# 記憶體 LRU 層保留的向量筆數
+EMBEDDING_CACHE_MEMORY = int(os.getenv("KG_EMBEDDING_CACHE_MEMORY", "4096"))
+# 向量檔的儲存精度：float32 或 float16（讀出時一律轉回 float32）
+EMBEDDING_CACHE_DTYPE = os.getenv("KG_EMBEDDING_CACHE_DTYPE", "float32")
+# 向量檔初始容量，之後每次加倍直到 EMBEDDING_CACHE_SIZE
+INITIAL_CAPACITY = 1024
+
+# 鍵值索引的每一列：文本雜湊（sha256 原始位元組）及最後使用順序（0 表示空列）
+INDEX_DTYPE = np.dtype([("key", "u1", (32,)), ("tick", "<i8")])
+
+class EmbeddingCache:
+    """
+    放在 SentenceTransformer.encode 前面的持久化嵌入快取，以 (模型名稱, 文本雜湊) 為鍵。
+
+    向量存在記憶體映射的 .npy 檔，鍵值索引存在另一個記憶體映射的 .npy 檔（每列 40 bytes），
+    重新啟動後只需讀入索引即可沿用先前的結果。最近使用的向量另外保留在記憶體 LRU 層。
+    同一個快取目錄同時只應由一個行程寫入（例如離線嵌入工作），其他行程（例如查詢服務）以 writable=False
+    唯讀開啟：只讀取開啟時已存在的向量，新編碼的向量只保留在記憶體層。讀出的每一列都會比對索引中的鍵，
+    該列已被寫入者淘汰並改存其他文本時視為未命中。
+    """
+
+    def __init__(self, model: Any, model_name: str, cache_dir: str = EMBEDDING_CACHE_DIR,
+                 max_rows: int = EMBEDDING_CACHE_SIZE, memory_rows: int = EMBEDDING_CACHE_MEMORY,
+                 dtype: str = EMBEDDING_CACHE_DTYPE, writable: bool = True):
+        self.model = model
+        self.model_name = model_name
+        self.writable = writable
+        self.max_rows = max_rows
+        self.memory_rows = memory_rows
+        self.dtype = np.dtype(dtype)
+        prefix = os.path.join(cache_dir, model_name.replace("/", "__"))
+        self.vector_path = f"{prefix}.vectors.npy"
+        self.index_path = f"{prefix}.index.npy"
+        if writable:
+            os.makedirs(cache_dir, exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.memory: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        # 鍵對應磁碟層的列號，依最後使用順序排列（最久未使用者在最前），淘汰時直接取出第一個
+        self.rows: "OrderedDict[bytes, int]" = OrderedDict()
+        self.free_rows: List[int] = []
+        self.vectors: Optional[np.memmap] = None
+        self.index: Optional[np.memmap] = None
+        self.tick = 0
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+        self._open()
+
+    def _open(self) -> None:
+        if not (os.path.exists(self.vector_path) and os.path.exists(self.index_path)):
+            return
+        mode = "r+" if self.writable else "r"
+        vectors = np.load(self.vector_path, mmap_mode=mode)
+        index = np.load(self.index_path, mmap_mode=mode)
+        if vectors.dtype != self.dtype or len(vectors) != len(index):
+            # 精度設定改變或檔案不一致時捨棄舊快取
+            print(f"嵌入快取 {self.vector_path} 與目前設定不符，重新建立")
+            return
+        self.vectors, self.index = vectors, index
+        ticks = np.asarray(index["tick"])
+        keys = index["key"]
+        used = np.flatnonzero(ticks)
+        for row in used[np.argsort(ticks[used], kind="stable")].tolist():
+            self.rows[keys[row].tobytes()] = row
+        self.free_rows = np.flatnonzero(ticks == 0)[::-1].tolist()
+        self.tick = int(ticks.max()) if len(index) else 0
+
+    def _allocate(self, capacity: int, dimension: int) -> None:
+        # 建立新檔再替換，舊資料依列號原樣複製
+        vectors = np.lib.format.open_memmap(f"{self.vector_path}.tmp", mode="w+", dtype=self.dtype,
+                                            shape=(capacity, dimension))
+        index = np.lib.format.open_memmap(f"{self.index_path}.tmp", mode="w+", dtype=INDEX_DTYPE,
+                                          shape=(capacity,))
+        old_capacity = 0
+        if self.vectors is not None:
+            old_capacity = len(self.vectors)
+            vectors[:old_capacity] = self.vectors
+            index[:old_capacity] = self.index
+        vectors.flush()
+        index.flush()
+        del vectors, index
+        self.vectors = self.index = None
+        os.replace(f"{self.vector_path}.tmp", self.vector_path)
+        os.replace(f"{self.index_path}.tmp", self.index_path)
+        self.vectors = np.load(self.vector_path, mmap_mode="r+")
+        self.index = np.load(self.index_path, mmap_mode="r+")
+        self.free_rows = list(range(capacity - 1, old_capacity - 1, -1)) + self.free_rows
+
+    def _key(self, text: str, options: str) -> bytes:
+        return hashlib.sha256(f"{self.model_name}\0{options}\0{text}".encode("utf-8")).digest()
+
+    def _remember(self, key: bytes, vector: np.ndarray) -> None:
+        self.memory[key] = vector
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_rows:
+            self.memory.popitem(last=False)
+
+    def _lookup(self, key: bytes) -> Optional[np.ndarray]:
+        vector = self.memory.get(key)
+        if vector is not None:
+            self.memory.move_to_end(key)
+            self.counters["memory_hits"] += 1
+            return vector
+        row = self.rows.get(key)
+        if row is None:
+            return None
+        # 讀出向量後再比對該列的鍵：寫入者淘汰一列時先清除鍵再寫入新向量，讀到被改寫的列時鍵必定不符
+        vector = np.array(self.vectors[row], dtype=np.float32)
+        if self.index["key"][row].tobytes() != key:
+            del self.rows[key]
+            return None
+        if self.writable:
+            self.tick += 1
+            self.index["tick"][row] = self.tick
+            self.rows.move_to_end(key)
+        self._remember(key, vector)
+        self.counters["disk_hits"] += 1
+        return vector
+
+    def _store(self, key: bytes, vector: np.ndarray) -> None:
+        if self.max_rows <= 0 or not self.writable:
+            return
+        if key in self.rows:
+            # 並行的 encode 已寫入同一文本
+            return
+        if not self.free_rows:
+            capacity = 0 if self.vectors is None else len(self.vectors)
+            if capacity < self.max_rows:
+                self._allocate(min(self.max_rows, max(INITIAL_CAPACITY, capacity * 2)), len(vector))
+            else:
+                # 磁碟層已滿，淘汰最久未使用的一列
+                _, row = self.rows.popitem(last=False)
+                self.free_rows.append(row)
+                self.counters["evictions"] += 1
+        row = self.free_rows.pop()
+        self.tick += 1
+        # 先清除舊鍵、寫向量，最後寫鍵，中斷或唯讀行程同時讀取時都不會讓鍵指向未寫完的向量
+        self.index["key"][row] = 0
+        self.vectors[row] = vector
+        self.index["key"][row] = np.frombuffer(key, dtype=np.uint8)
+        self.index["tick"][row] = self.tick
+        self.rows[key] = row
+
+    def encode(self, sentences: Union[str, Sequence[str]], batch_size: int = 32, **kwargs: Any) -> np.ndarray:
+        """
+        與 SentenceTransformer.encode 相同的介面；只有快取中沒有的文本才會送進模型。
+
+        Args:
+            sentences (Union[str, Sequence[str]]): 單一文本或文本列表。
+            batch_size (int): 送進模型的批次大小。
+            **kwargs: 其餘傳給 SentenceTransformer.encode 的參數（會納入快取鍵）。
+
+        Returns:
+            np.ndarray: float32 向量；輸入單一文本時為一維，否則為 (文本數, 維度)，順序與輸入相同。
+        """
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        options = repr(sorted(kwargs.items()))
+        keys = [self._key(text, options) for text in texts]
+        vectors: List[Optional[np.ndarray]] = [None] * len(texts)
+        missing: Dict[bytes, List[int]] = {}
+        with self.lock:
+            for i, key in enumerate(keys):
+                vectors[i] = self._lookup(key)
+                if vectors[i] is None:
+                    missing.setdefault(key, []).append(i)
+            self.counters["misses"] += sum(len(positions) for positions in missing.values())
+
+        if missing:
+            # 模型推論在鎖外進行，重複的文本只編碼一次
+            misses = [texts[positions[0]] for positions in missing.values()]
+            encoded = np.asarray(self.model.encode(misses, batch_size=batch_size, **kwargs), dtype=np.float32)
+            with self.lock:
+                for (key, positions), vector in zip(missing.items(), encoded):
+                    self._store(key, vector)
+                    self._remember(key, vector)
+                    for i in positions:
+                        vectors[i] = vector
+
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        result = np.stack(vectors)
+        return result[0] if single else result
+
+    def flush(self) -> None:
+        """將記憶體映射的向量檔與索引檔寫回磁碟。"""
+        with self.lock:
+            if self.vectors is not None and self.writable:
+                self.vectors.flush()
+                self.index.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        回傳快取的命中統計。
+
+        Returns:
+            Dict[str, Any]: memory_hits、disk_hits、misses、evictions、rows（磁碟層筆數）、
+            capacity（向量檔容量）及 hit_rate。
+        """
+        with self.lock:
+            stats: Dict[str, Any] = dict(self.counters)
+            stats["rows"] = len(self.rows)
+            stats["capacity"] = 0 if self.vectors is None else len(self.vectors)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+def cached_model(model_name: str, workers: Optional[int] = None, quantize: Optional[bool] = None,
+                 device: Optional[str] = "cpu", **kwargs: Any) -> EmbeddingCache:
+    """
+    建立 KG_Encoder 編碼服務並包上持久化嵌入快取。
+
+    Args:
+        model_name (str): 模型名稱，同時作為快取鍵的一部分及快取檔名（量化模型加上 +int8）。
+        workers (Optional[int]): 編碼行程數量，None 表示 KG_ENCODER_WORKERS。
+        quantize (Optional[bool]): 是否使用 int8 動態量化模型，None 表示 KG_ENCODER_QUANTIZE。
+        device (Optional[str]): 目前行程中模型使用的裝置（編碼行程一律使用 CPU），None 表示由 SentenceTransformer 決定。
+        **kwargs: 傳給 EmbeddingCache 的設定。
+
+    Returns:
+        EmbeddingCache: 可直接取代模型呼叫 encode 的快取物件。
+    """
+    from KG_Encoder import ENCODER_QUANTIZE, ENCODER_WORKERS, EncoderService
+
+    encoder = EncoderService(model_name,
+                             workers=ENCODER_WORKERS if workers is None else workers,
+                             quantize=ENCODER_QUANTIZE if quantize is None else quantize, device=device)
+    return EmbeddingCache(encoder, encoder.cache_name, **kwargs)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="查看或清除嵌入快取")
+    parser.add_argument("model", help="模型名稱，例如 shibing624/text2vec-base-chinese")
+    parser.add_argument("--cache-dir", default=EMBEDDING_CACHE_DIR, help="快取目錄")
+    parser.add_argument("--clear", action="store_true", help="刪除該模型的快取檔")
+    args = parser.parse_args()
+
+    cache = EmbeddingCache(None, args.model, cache_dir=args.cache_dir, writable=False)
+    if args.clear:
+        del cache
+        for path in [f"{os.path.join(args.cache_dir, args.model.replace('/', '__'))}.{suffix}.npy"
+                     for suffix in ("vectors", "index")]:
+            if os.path.exists(path):
+                os.remove(path)
+        print("已清除嵌入快取")
+    else:
+        stats = cache.stats()
+        print(f"{args.model}: {stats['rows']} 筆向量，容量 {stats['capacity']}")
@@ -0,0 +1,233 @@
+from concurrent.futures import ProcessPoolExecutor
+from dotenv import load_dotenv
+from typing import Any, List, Optional, Sequence, Union
+import argparse
+import atexit
+import multiprocessing
+import numpy as np
+import os
+import threading
+import time
+
+# 加載 .env 文件中的環境變數
+load_dotenv()
+
+# 專案使用的中文嵌入模型
+DEFAULT_MODEL_NAME = "shibing624/text2vec-base-chinese"
+# 編碼行程數量，0 表示在目前行程中編碼
+ENCODER_WORKERS = int(os.getenv("KG_ENCODER_WORKERS", "0"))
+# 每個編碼行程（或目前行程）使用的 torch 執行緒數量，0 表示依 CPU 核心數平均分配
+ENCODER_THREADS = int(os.getenv("KG_ENCODER_THREADS", "0"))
+# 是否使用 int8 動態量化的模型（只量化 Linear 層，向量與原模型略有差異）
+ENCODER_QUANTIZE = os.getenv("KG_ENCODER_QUANTIZE", "0") == "1"
+# 每批最多的文本數量
+ENCODE_BATCH_SIZE = 64
+# 每批的字元預算：長文本的批次較小，短文本的批次較大，避免大量補齊（padding）
+BATCH_CHAR_BUDGET = 64 * 256
+# 超過模型最大長度的部分會被截斷，估算字元預算時以此為上限
+MAX_TEXT_CHARS = 512
+
+def load_model(model_name: str, threads: int = 0, quantize: bool = False, device: Optional[str] = "cpu"):
+    """
+    載入 SentenceTransformer，並依需要設定 torch 執行緒數量及 int8 動態量化。
+
+    Args:
+        model_name (str): 模型名稱。
+        threads (int): torch 執行緒數量，0 表示不變更。
+        quantize (bool): 是否將 Linear 層動態量化為 int8（動態量化只支援 CPU，此時一律在 CPU 上載入）。
+        device (Optional[str]): 裝置，例如 "cpu" 或 "cuda"；None 表示由 SentenceTransformer 決定（有 CUDA 時使用 GPU）。
+
+    Returns:
+        SentenceTransformer: 載入的模型。
+    """
+    from sentence_transformers import SentenceTransformer
+    import torch
+
+    if threads > 0:
+        torch.set_num_threads(threads)
+    model = SentenceTransformer(model_name, device="cpu" if quantize else device)
+    if quantize:
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model
+
+def length_buckets(texts: Sequence[str], batch_size: int = ENCODE_BATCH_SIZE,
+                   char_budget: int = BATCH_CHAR_BUDGET) -> List[List[int]]:
+    """
+    依文本長度由長到短排序後切成批次，同一批的文本長度相近。
+
+    Args:
+        texts (Sequence[str]): 要編碼的文本。
+        batch_size (int): 每批最多的文本數量。
+        char_budget (int): 每批的字元預算（以最長文本的長度乘以文本數量估算）。
+
+    Returns:
+        List[List[int]]: 每批文本在 texts 中的位置。
+    """
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+    buckets: List[List[int]] = []
+    current: List[int] = []
+    longest = 0
+    for i in order:
+        length = max(1, min(len(texts[i]), MAX_TEXT_CHARS))
+        longest = max(longest, length)
+        if current and (len(current) >= batch_size or longest * (len(current) + 1) > char_budget):
+            buckets.append(current)
+            current = []
+            longest = length
+        current.append(i)
+    if current:
+        buckets.append(current)
+    return buckets
+
+# 編碼行程中的模型，由 _init_worker 載入
+_worker_model = None
+
+def _init_worker(model_name: str, threads: int, quantize: bool) -> None:
+    global _worker_model
+    _worker_model = load_model(model_name, threads, quantize)
+
+def _encode_in_worker(texts: List[str], kwargs: dict) -> np.ndarray:
+    return np.asarray(_worker_model.encode(texts, batch_size=len(texts), **kwargs), dtype=np.float32)
+
+class EncoderService:
+    """
+    編碼服務，提供與 SentenceTransformer.encode 相同的 encode 介面。
+
+    輸入先依長度分批（length_buckets），再分送給多個編碼行程，每個行程各自載入一份模型
+    並使用固定數量的 torch 執行緒；結果依輸入順序回傳。只有一批文本（例如單筆查詢）時
+    直接在目前行程中編碼，不經過行程池。編碼行程一律使用 CPU，目前行程的模型使用 device 指定的裝置
+    （例如 GPU 上的相似度查詢以 workers=0 搭配 device="cuda"）。模型與行程池都在第一次需要時才建立。
+    """
+
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME, workers: int = ENCODER_WORKERS,
+                 threads: int = ENCODER_THREADS, quantize: bool = ENCODER_QUANTIZE, device: Optional[str] = "cpu"):
+        self.model_name = model_name
+        self.device = device
+        self.workers = workers
+        if threads <= 0 and workers > 0:
+            # 未指定時讓各行程平分 CPU 核心，避免執行緒互相搶占
+            threads = max(1, (os.cpu_count() or 1) // workers)
+        self.threads = threads
+        self.quantize = quantize
+        self.lock = threading.Lock()
+        self.model = None
+        self.executor: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def cache_name(self) -> str:
+        """快取鍵使用的模型名稱；量化模型的向量不同，使用不同的名稱。"""
+        return f"{self.model_name}+int8" if self.quantize else self.model_name
+
+    def _local_model(self):
+        with self.lock:
+            if self.model is None:
+                self.model = load_model(self.model_name, self.threads, self.quantize, self.device)
+            return self.model
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self.lock:
+            if self.executor is None:
+                # 以 spawn 啟動，避免 fork 已初始化 torch 執行緒的行程
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker, initargs=(self.model_name, self.threads, self.quantize))
+                atexit.register(self.close)
+            return self.executor
+
+    def warmup(self) -> None:
+        """預先載入模型：目前行程的模型（單批查詢用）一定載入，有編碼行程時也啟動並等待每個行程載入模型。"""
+        self._local_model()
+        if self.workers > 0:
+            list(self._pool().map(_encode_in_worker, [["暖機"]] * self.workers, [{}] * self.workers))
+
+    def encode(self, sentences: Union[str, Sequence[str]], batch_size: int = ENCODE_BATCH_SIZE,
+               **kwargs: Any) -> np.ndarray:
+        """
+        編碼文本。
+
+        Args:
+            sentences (Union[str, Sequence[str]]): 單一文本或文本列表。
+            batch_size (int): 每批最多的文本數量。
+            **kwargs: 其餘傳給 SentenceTransformer.encode 的參數。
+
+        Returns:
+            np.ndarray: float32 向量；輸入單一文本時為一維，否則為 (文本數, 維度)，順序與輸入相同。
+        """
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        kwargs.setdefault("show_progress_bar", False)
+        buckets = length_buckets(texts, batch_size)
+        if self.workers > 0 and len(buckets) > 1:
+            batches = self._pool().map(_encode_in_worker, [[texts[i] for i in bucket] for bucket in buckets],
+                                       [kwargs] * len(buckets))
+        else:
+            model = self._local_model()
+            batches = (np.asarray(model.encode([texts[i] for i in bucket], batch_size=len(bucket), **kwargs),
+                                  dtype=np.float32) for bucket in buckets)
+
+        result: Optional[np.ndarray] = None
+        for bucket, vectors in zip(buckets, batches):
+            if result is None:
+                result = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+            result[bucket] = vectors
+        if result is None:
+            return np.empty((0, 0), dtype=np.float32)
+        return result[0] if single else result
+
+    def close(self) -> None:
+        """關閉編碼行程池。"""
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown()
+                self.executor = None
+
+def benchmark(texts: List[str], model_name: str = DEFAULT_MODEL_NAME, workers: int = ENCODER_WORKERS,
+              threads: int = ENCODER_THREADS, quantize: bool = ENCODER_QUANTIZE) -> None:
+    """
+    比較原本逐筆呼叫 SentenceTransformer.encode 與編碼服務的吞吐量（texts/sec）。
+
+    Args:
+        texts (List[str]): 測試文本。
+        model_name (str): 模型名稱。
+        workers (int): 編碼行程數量。
+        threads (int): 每個行程的 torch 執行緒數量。
+        quantize (bool): 是否使用 int8 動態量化模型。
+    """
+    model = load_model(model_name)
+    start = time.perf_counter()
+    baseline = np.stack([model.encode(text, show_progress_bar=False) for text in texts])
+    elapsed = time.perf_counter() - start
+    print(f"逐筆編碼：{len(texts)} 筆，{elapsed:.2f} 秒，{len(texts) / elapsed:.1f} texts/sec")
+
+    service = EncoderService(model_name, workers, threads, quantize)
+    service.encode(texts[:1])  # 載入模型（及啟動行程池）不計入時間
+    if workers > 0:
+        service.encode(texts[:ENCODE_BATCH_SIZE * workers * 2])
+    start = time.perf_counter()
+    vectors = service.encode(texts)
+    elapsed = time.perf_counter() - start
+    print(f"編碼服務（workers={workers}, threads={service.threads}, int8={quantize}）："
+          f"{len(texts)} 筆，{elapsed:.2f} 秒，{len(texts) / elapsed:.1f} texts/sec")
+
+    cosine = np.sum(baseline * vectors, axis=1) / (
+        np.linalg.norm(baseline, axis=1) * np.linalg.norm(vectors, axis=1) + 1e-12)
+    print(f"與逐筆編碼的餘弦相似度：最小 {cosine.min():.6f}，平均 {cosine.mean():.6f}")
+    service.close()
+
+if __name__ == "__main__":
+    from KG_Parser import citation_extractor, iter_case_records, iter_statutes
+
+    parser = argparse.ArgumentParser(description="編碼服務吞吐量測試")
+    parser.add_argument("--statutes", default="statute.txt", help="法條文檔路徑")
+    parser.add_argument("--cases", default="example_cases.txt", help="範例案件文檔路徑")
+    parser.add_argument("--limit", type=int, default=2000, help="最多使用的文本數量")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 1) // 4), help="編碼行程數量")
+    parser.add_argument("--threads", type=int, default=ENCODER_THREADS, help="每個行程的 torch 執行緒數量")
+    parser.add_argument("--quantize", action="store_true", help="使用 int8 動態量化模型")
+    args = parser.parse_args()
+
+    statutes = list(iter_statutes(args.statutes))
+    texts = [text for statute in statutes for text in (statute["text"], statute["explanation"])]
+    if os.path.exists(args.cases):
+        texts += [record["fact_text"] for record in iter_case_records(args.cases, citation_extractor(statutes))]
+    benchmark(texts[:args.limit], workers=args.workers, threads=args.threads, quantize=args.quantize)
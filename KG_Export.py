@@ -0,0 +1,151 @@
+from KG_Parser import (ANCHOR_RELATIONS, ANCHORS, CASE_LABELS, HASHED_LABELS, PARENT_RELATIONS, citation_extractor,
+                       collect_citations, collect_nodes, iter_batches, iter_case_records, iter_statutes)
+from KG_Graph import BUILD_ANCHOR
+from typing import Dict, List
+import argparse
+import csv
+import hashlib
+import os
+import time
+
+# 一次交給解析器的案件數量，只影響記憶體用量
+EXPORT_CHUNK_SIZE = 1000
+
+NODE_HEADER = ["id:ID(Node)", "text", "content_hash", ":LABEL"]
+ANCHOR_HEADER = ["name:ID(Anchor)", "build_id", ":LABEL"]
+REL_HEADERS = {
+    "rels_node_node.csv": [":START_ID(Node)", ":END_ID(Node)", ":TYPE"],
+    "rels_anchor_node.csv": [":START_ID(Anchor)", ":END_ID(Node)", ":TYPE"],
+    "rels_anchor_anchor.csv": [":START_ID(Anchor)", ":END_ID(Anchor)", ":TYPE"],
+    # 引用關係帶有限定語陣列（neo4j-admin 預設以 ; 分隔陣列元素）
+    "rels_citation.csv": [":START_ID(Node)", ":END_ID(Node)", "qualifiers:string[]", ":TYPE"],
+}
+
+def import_command(out_dir: str, database: str = "neo4j") -> str:
+    """
+    產生匯入輸出目錄中 CSV 檔所需的 neo4j-admin 指令。
+
+    Args:
+        out_dir (str): export_csv 的輸出目錄。
+        database (str): 目標資料庫名稱（匯入前必須為空或不存在）。
+
+    Returns:
+        str: neo4j-admin database import full 指令。
+    """
+    nodes = " ".join(f"--nodes={os.path.join(out_dir, f'nodes_{label}.csv')}" for label in HASHED_LABELS)
+    anchors = f"--nodes={os.path.join(out_dir, 'nodes_anchor.csv')}"
+    rels = " ".join(f"--relationships={os.path.join(out_dir, name)}" for name in REL_HEADERS)
+    return f"neo4j-admin database import full --multiline-fields=true {anchors} {nodes} {rels} {database}"
+
+def source_build_id(*paths: str) -> str:
+    """
+    以來源文檔內容的雜湊作為匯出圖譜的建置編號：同一份來源得到相同的編號，來源有變動時編號不同，
+    由圖譜衍生的檢索快照（KG_RetrievalSnapshot）因此會失效。
+
+    Args:
+        *paths (str): 來源文檔路徑（依序納入雜湊）。
+
+    Returns:
+        str: 例如 source-1a2b3c4d5e6f7a8b。
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as file:
+            for chunk in iter(lambda: file.read(1 << 20), b""):
+                digest.update(chunk)
+        digest.update(b"\0")
+    return f"source-{digest.hexdigest()[:16]}"
+
+def export_csv(statute_path: str, case_path: str, out_dir: str, workers: int = 0) -> Dict[str, int]:
+    """
+    解析法條及範例案件文檔，輸出 neo4j-admin database import 格式的節點與關係 CSV。
+
+    節點 ID 與 KG_Build 的交易式建置相同，同一份來源永遠產生相同的檔案。
+    案件以串流方式解析並寫出，記憶體用量與案件數量無關（法條 ID 集合除外）。
+
+    Args:
+        statute_path (str): 法條文檔路徑。
+        case_path (str): 範例案件文檔路徑。
+        out_dir (str): 輸出目錄。
+        workers (int): 平行解析案件的行程數量。
+
+    Returns:
+        Dict[str, int]: 各標籤節點數量與關係數量（鍵為 "relationships"）。
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    counts = {label: 0 for label in HASHED_LABELS}
+    counts["relationships"] = 0
+    files = []
+
+    def open_writer(name: str, header: List[str]):
+        file = open(os.path.join(out_dir, name), "w", encoding="utf-8", newline="")
+        files.append(file)
+        writer = csv.writer(file)
+        writer.writerow(header)
+        return writer
+
+    try:
+        node_writers = {label: open_writer(f"nodes_{label}.csv", NODE_HEADER) for label in HASHED_LABELS}
+        rel_writers = {name: open_writer(name, header) for name, header in REL_HEADERS.items()}
+
+        def write_nodes(label: str, rows: List[Dict[str, str]]) -> None:
+            parent_label, rel_type = PARENT_RELATIONS[label]
+            node_writers[label].writerows([row["id"], row["text"], row["hash"], label] for row in rows)
+            if parent_label in ANCHORS:
+                rel_writers["rels_anchor_node.csv"].writerows(
+                    [ANCHORS[parent_label], row["id"], rel_type] for row in rows)
+            else:
+                rel_writers["rels_node_node.csv"].writerows(
+                    [row["parent_id"], row["id"], rel_type] for row in rows)
+            counts[label] += len(rows)
+            counts["relationships"] += len(rows)
+
+        anchor_writer = open_writer("nodes_anchor.csv", ANCHOR_HEADER)
+        # 匯入的圖譜同樣帶有建置編號（空字串的欄位不會成為屬性），由來源內容決定，輸出保持可重現
+        build_id = source_build_id(statute_path, case_path)
+        anchor_writer.writerows([name, build_id if label == BUILD_ANCHOR else "", label]
+                                for label, name in ANCHORS.items())
+        rel_writers["rels_anchor_anchor.csv"].writerows(
+            [ANCHORS[start], ANCHORS[end], rel_type] for start, end, rel_type in ANCHOR_RELATIONS)
+        counts["relationships"] += len(ANCHOR_RELATIONS)
+
+        statutes = list(iter_statutes(statute_path))
+        statute_nodes = collect_nodes(statutes, [])
+        write_nodes("Statute", statute_nodes["Statute"])
+        write_nodes("Explanation", statute_nodes["Explanation"])
+        statute_ids = {statute["id"] for statute in statutes}
+
+        extractor = citation_extractor(statutes)
+        for records in iter_batches(iter_case_records(case_path, extractor, workers=workers), EXPORT_CHUNK_SIZE):
+            nodes = collect_nodes([], records)
+            for label in CASE_LABELS:
+                write_nodes(label, nodes[label])
+            # 與 MATCH ... MERGE 相同：只連到存在的法條；解析時 extract_batch 已將同一對節點合併為一條關係
+            citations = [row for row in collect_citations(records) if row["statute_id"] in statute_ids]
+            rel_writers["rels_citation.csv"].writerows(
+                [row["legal_id"], row["statute_id"], ";".join(row["qualifiers"]), "引用法條"] for row in citations)
+            counts["relationships"] += len(citations)
+    finally:
+        for file in files:
+            file.close()
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description="將法條與範例判決書匯出為 neo4j-admin import 格式的 CSV")
+    parser.add_argument("out_dir", help="CSV 輸出目錄")
+    parser.add_argument("--statutes", default="statute.txt", help="法條文檔路徑")
+    parser.add_argument("--cases", default="example_cases.txt", help="範例案件文檔路徑")
+    parser.add_argument("--workers", type=int, default=0, help="平行解析案件的行程數量")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    counts = export_csv(args.statutes, args.cases, args.out_dir, workers=args.workers)
+    elapsed = time.perf_counter() - start
+    total = sum(counts.values())
+    print(", ".join(f"{key}: {value}" for key, value in counts.items()))
+    print(f"已匯出 {total} 筆節點與關係，耗時 {elapsed:.2f} 秒（{total / elapsed:.1f} rows/sec）")
+    print(f"匯入指令：{import_command(args.out_dir)}")
+    print("匯入完成後請執行 python KG_Schema.py 建立唯一性約束")
+
+if __name__ == "__main__":
+    main()
@@ -1,99 +1,329 @@
-from neo4j import GraphDatabase
-from sentence_transformers import SentenceTransformer
+from concurrent.futures import ThreadPoolExecutor
+from KG_EmbeddingCache import EmbeddingCache, cached_model
+from KG_Graph import GraphBackend, get_graph
+from KG_Index import IndexConfig, create_index, get_resident_index, index_paths, save_index_files
+from KG_MetadataStore import FactMetadata
+from KG_Parser import HASHED_LABELS
+from KG_RetrievalSnapshot import SnapshotGraph, get_retrieval_graph
+from KG_StatuteRanking import COCITATION_WEIGHT, STATUTE_TOKEN_BUDGET, apply_token_budget, rank_statutes
+from KG_VectorStore import get_vector_store, load_node_vectors
+import argparse
 import numpy as np
 import faiss
 import os
-from typing import List, Dict, Tuple, Any
-from dotenv import load_dotenv
-
-# 加載 .env 配置
-load_dotenv()
-
-# Neo4j 配置
-uri = os.getenv("NEO4J_URI")
-username = os.getenv("NEO4J_USERNAME")
-password = os.getenv("NEO4J_PASSWORD")
-driver = GraphDatabase.driver(uri, auth=(username, password))
-
-# 索引保存路徑
-INDEX_PATH = "fact_index_hnsw.faiss"
-
-# 初始化嵌入模型
-model = SentenceTransformer("shibing624/text2vec-base-chinese")
-
-def build_faiss_index() -> Tuple[faiss.IndexHNSWFlat, List[str], List[str]]:
-    """
-    從 Neo4j 數據庫中構建 FAISS 索引並保存到磁盤。
-
-    Returns:
-        Tuple[faiss.IndexHNSWFlat, List[str], List[str]]: FAISS 索引，事實節點 ID 列表，事實文本列表。
-    """
-    with driver.session() as session:
-        # 查詢所有 Fact 節點的 ID、文本和嵌入
-        results = session.run("MATCH (f:Fact) RETURN f.id AS id, f.text AS text, f.embedding AS embedding")
-        embeddings = []
-        fact_ids = []
-        fact_texts = []
-        
-        for record in results:
-            fact_ids.append(record["id"])
-            fact_texts.append(record["text"])
-            embeddings.append(np.array(record["embedding"], dtype="float32"))
-
-    # 構建 FAISS HNSW 索引
-    dimension = len(embeddings[0])
-    M = 32  # HNSW 的參數，決定連接數量
-    index = faiss.IndexHNSWFlat(dimension, M)
-    index.hnsw.efConstruction = 200  # 構建時的 ef 值
-    index.hnsw.efSearch = 100  # 查詢時的 ef 值
-    index.add(np.array(embeddings))  # 添加嵌入向量
-
-    # 保存索引到磁盤
-    faiss.write_index(index, INDEX_PATH)
-    with open("fact_metadata_hnsw.npy", "wb") as f:
-        np.save(f, {"fact_ids": fact_ids, "fact_texts": fact_texts})
-    
+import threading
+import time
+from typing import List, Dict, Optional, Sequence, Tuple, Any
+
+# 已刪除（被取代或移除）的事實超過索引內事實總數的這個比例時，增量更新改為整個重建（壓縮）
+COMPACT_RATIO = 0.2
+# 是否預設使用混合查詢（向量 + BM25 詞彙索引，以 RRF 融合）
+HYBRID_SEARCH = os.getenv("KG_HYBRID_SEARCH", "0") == "1"
+# 混合查詢時向量與詞彙兩路各取的候選數量，以及 RRF 的常數 k
+HYBRID_CANDIDATES = 50
+RRF_K = 60
+# 多標籤查詢預設的標籤權重：直接比對法條解釋可以不經案件就得到候選法條
+LABEL_WEIGHTS = {"Fact": 1.0, "Explanation": 0.8}
+
+# 查詢用的嵌入模型
+QUERY_MODEL_NAME = "shibing624/text2vec-base-chinese"
+
+_model: Optional[EmbeddingCache] = None
+_search_executor: Optional[ThreadPoolExecutor] = None
+_lazy_lock = threading.Lock()
+
+def get_model() -> EmbeddingCache:
+    """
+    取得查詢用的嵌入模型（包上嵌入快取，相同輸入的重複查詢直接讀取快取）。嵌入快取由 KG_Embedding
+    的離線嵌入工作寫入，查詢服務只唯讀開啟，新的查詢向量只保留在記憶體層。
+    第一次呼叫時才開啟快取，模型本身在第一次編碼時才載入（可先呼叫 KG_Warmup.warmup）。
+
+    Returns:
+        EmbeddingCache: 行程內共用的嵌入模型。
+    """
+    global _model
+    if _model is None:
+        with _lazy_lock:
+            if _model is None:
+                _model = cached_model(QUERY_MODEL_NAME, writable=False)
+    return _model
+
+def get_search_executor() -> ThreadPoolExecutor:
+    """多標籤查詢時各標籤的索引在不同執行緒中查詢（faiss 查詢期間會釋放 GIL），執行緒池在第一次使用時建立。"""
+    global _search_executor
+    if _search_executor is None:
+        with _lazy_lock:
+            if _search_executor is None:
+                _search_executor = ThreadPoolExecutor(max_workers=len(HASHED_LABELS), thread_name_prefix="faiss-search")
+    return _search_executor
+
+def build_faiss_index(config: IndexConfig = None, label: str = "Fact") -> Tuple[faiss.Index, List[str], List[str]]:
+    """
+    從知識圖譜中構建某一標籤節點的 FAISS 索引並保存到磁盤。
+
+    Args:
+        config (IndexConfig): KG_Index 的索引設定（hnsw_flat、hnsw_fp16、hnsw_sq8、ivf_pq 等），
+            None 表示 KG_FAISS_INDEX 環境變數指定的設定或 KG_IndexTuning 調校後的設定。
+        label (str): 節點標籤（Fact、Case、Statute、Explanation 等有文本的節點），預設為 Fact。
+
+    Returns:
+        Tuple[faiss.Index, List[str], List[str]]: FAISS 索引，節點 ID 列表，節點文本列表。
+    """
+    # 查詢所有該標籤節點的 ID 和文本，嵌入直接從向量存放區讀取
+    records, embeddings = load_node_vectors(get_graph(), label)
+    fact_ids = [record["id"] for record in records]
+    fact_texts = [record["text"] for record in records]
+    # 記錄每個事實所用向量的列號與版本，增量更新時據此找出新增或變動的事實
+    versions = [(record["vector_row"], record["vector_version"]) for record in records]
+
+    # 依設定構建 FAISS 索引（預設為 HNSW，M=32、efConstruction=200、efSearch=100），
+    # 以 fact_ids 的下標作為穩定的 int64 ID，之後可增量加入
+    index = create_index(config, embeddings, ids=np.arange(len(fact_ids), dtype=np.int64))
+
+    # 保存索引到磁盤（常駐索引會在下次檢查時換上新索引）
+    save_index_files(config, index, fact_ids, fact_texts, versions, label=label)
+
     return index, fact_ids, fact_texts
 
-def load_faiss_index() -> Tuple[faiss.IndexHNSWFlat, List[str], List[str]]:
+def update_faiss_index(config: IndexConfig = None, compact_ratio: float = COMPACT_RATIO,
+                       label: str = "Fact") -> Dict[str, int]:
     """
-    加載 FAISS 索引和對應的元數據。如果索引不存在，則構建索引。
+    增量更新已保存的 FAISS 索引：新的事實以新的 ID 加入，被刪除或文本變動（向量版本不同）的事實
+    標記為已刪除（tombstone），查詢時排除。已刪除的比例超過 compact_ratio 時改為整個重建，
+    重新訓練並回收已刪除的 ID。索引不存在（包括只有舊版 pickle 元數據 .npy）時同樣整個重建。
+
+    Args:
+        config (IndexConfig): 索引設定。
+        compact_ratio (float): 觸發重建的已刪除比例。
+        label (str): 節點標籤。
 
     Returns:
-        Tuple[faiss.IndexHNSWFlat, List[str], List[str]]: FAISS 索引，事實節點 ID 列表，事實文本列表。
+        Dict[str, int]: added、deleted（本次新增與刪除的事實數）、total（索引內有效的事實數）及 rebuilt（是否整個重建）。
     """
-    if os.path.exists(INDEX_PATH) and os.path.exists("fact_metadata_hnsw.npy"):
-        # 從磁盤加載索引
-        index = faiss.read_index(INDEX_PATH)
-        metadata = np.load("fact_metadata_hnsw.npy", allow_pickle=True).item()
-        return index, metadata["fact_ids"], metadata["fact_texts"]
-    else:
-        # 索引不存在時構建索引
-        return build_faiss_index()
+    paths = index_paths(config, label)
+    if not (os.path.exists(paths["index"]) and os.path.exists(paths["metadata"])):
+        _, fact_ids, _ = build_faiss_index(config, label)
+        return {"added": len(fact_ids), "deleted": 0, "total": len(fact_ids), "rebuilt": 1}
+
+    metadata = FactMetadata(paths["metadata"])
+    versions = metadata.versions
+    deleted = set(metadata.deleted.tolist())
+    live = {fact_id: position for position, fact_id in enumerate(metadata.fact_ids) if position not in deleted}
 
-def query_faiss(input_text: str, top_k: int = 5) -> List[Dict[str, Any]]:
+    # 只讀取節點屬性與列號，比對後只從向量存放區取出新增或變動事實的向量
+    store = get_vector_store(label)
+    seen = set()
+    added = []
+    newly_deleted = []
+    for record in get_graph().iter_nodes(label, ["id", "text", "vector_row", "vector_version"]):
+        row = record["vector_row"]
+        if row is None or store.version(row) != record["vector_version"]:
+            continue
+        seen.add(record["id"])
+        position = live.get(record["id"])
+        if position is not None and tuple(versions[position]) == (row, record["vector_version"]):
+            continue
+        if position is not None:
+            newly_deleted.append(position)
+        added.append(record)
+    newly_deleted.extend(position for fact_id, position in live.items() if fact_id not in seen)
+
+    deleted.update(newly_deleted)
+    total = len(metadata) + len(added)
+    if len(deleted) > compact_ratio * total:
+        _, fact_ids, _ = build_faiss_index(config, label)
+        return {"added": len(added), "deleted": len(newly_deleted), "total": len(fact_ids), "rebuilt": 1}
+
+    if added or newly_deleted:
+        index = faiss.read_index(paths["index"])
+        labels = np.arange(len(metadata), total, dtype=np.int64)
+        if added:
+            index.add_with_ids(np.ascontiguousarray(store.read(record["vector_row"] for record in added)), labels)
+        # 只編碼新增的事實，原有的元數據以原始位元組複製
+        save_index_files(config, index, [record["id"] for record in added], [record["text"] for record in added],
+                         [(record["vector_row"], record["vector_version"]) for record in added],
+                         sorted(deleted), base=metadata, label=label)
+    return {"added": len(added), "deleted": len(newly_deleted), "total": total - len(deleted), "rebuilt": 0}
+
+def load_faiss_index(config: IndexConfig = None, label: str = "Fact") -> Tuple[faiss.Index, Sequence[str], Sequence[str]]:
     """
-    在 FAISS 索引中查詢最相似的事實。
+    取得常駐記憶體的 FAISS 索引和對應的元數據。第一次呼叫時從磁盤加載（索引不存在則構建索引），
+    之後直接使用已載入的索引；索引檔被重建時自動換上新索引。
+    增量更新過的索引含有已刪除的事實，查詢請使用 query_faiss_batch（會排除已刪除的事實）。
 
     Args:
-        input_text (str): 用戶輸入的文本。
-        top_k (int): 返回的最相似事實數量。
+        config (IndexConfig): 索引設定，每種設定各自保存一組索引檔。
+        label (str): 節點標籤，每個標籤各自一組索引檔。
 
     Returns:
-        List[Dict[str, Any]]: 包含最相似事實的 ID、文本和距離的列表。
+        Tuple[faiss.Index, Sequence[str], Sequence[str]]: FAISS 索引，節點 ID 及節點文本
+            （記憶體映射的唯讀欄位，以下標取值時才解碼）。
     """
-    query_embedding = np.array([model.encode(input_text)], dtype="float32")
-    index, fact_ids, fact_texts = load_faiss_index()
-    distances, indices = index.search(query_embedding, top_k)
-    results = []
+    loaded = get_resident_index(config, build_faiss_index, label).get()
+    return loaded.index, loaded.fact_ids, loaded.fact_texts
 
-    for dist, idx in zip(distances[0], indices[0]):
-        results.append({
+def search_index(query_embeddings: np.ndarray, top_k: int = 5, config: IndexConfig = None,
+                 label: str = "Fact") -> List[List[Dict[str, Any]]]:
+    """
+    以已編碼的查詢向量查詢某一標籤的常駐索引。
+
+    Args:
+        query_embeddings (np.ndarray): (查詢數, 維度) 的 float32 查詢向量。
+        top_k (int): 每個查詢返回的最相似節點數量。
+        config (IndexConfig): 索引設定。
+        label (str): 節點標籤。
+
+    Returns:
+        List[List[Dict[str, Any]]]: 與查詢順序相同，每個查詢各一個包含最相似節點的 ID、文本和距離的列表。
+    """
+    loaded = get_resident_index(config, build_faiss_index, label).get()
+    fact_ids, fact_texts = loaded.fact_ids, loaded.fact_texts
+    distances, indices = loaded.search(query_embeddings, top_k)
+    batch_results = []
+
+    for row_distances, row_indices in zip(distances, indices):
+        results = []
+        for dist, idx in zip(row_distances, row_indices):
+            if idx < 0:  # 有效的節點不足 top_k 個時以 -1 補位
+                continue
+            results.append({
+                "id": fact_ids[idx],
+                "text": fact_texts[idx],
+                "distance": dist
+            })
+        batch_results.append(results)
+    return batch_results
+
+def hybrid_search(input_texts: List[str], query_embeddings: np.ndarray, top_k: int = 5, config: IndexConfig = None,
+                  label: str = "Fact", candidates: int = HYBRID_CANDIDATES) -> List[List[Dict[str, Any]]]:
+    """
+    混合查詢：向量索引與 BM25 詞彙索引各取 candidates 個候選，以 RRF（Reciprocal Rank Fusion）融合，
+    分數為 Σ 1 / (RRF_K + 名次)。能補足向量查詢對精確法律用語（例如「逆向」「酒駕」）的不足。
+    該標籤沒有詞彙索引時結果與向量查詢的排序相同。
+
+    Args:
+        input_texts (List[str]): 用戶輸入的文本列表。
+        query_embeddings (np.ndarray): 與 input_texts 對應的查詢向量。
+        top_k (int): 每個輸入返回的節點數量。
+        config (IndexConfig): 索引設定。
+        label (str): 節點標籤。
+        candidates (int): 每一路的候選數量。
+
+    Returns:
+        List[List[Dict[str, Any]]]: 與輸入順序相同，每個命中含 id、text、distance（只由詞彙索引找到時為 None）、
+        bm25（沒有命中任何詞項時為 0）及 score（RRF 分數）。
+    """
+    loaded = get_resident_index(config, build_faiss_index, label).get()
+    fact_ids, fact_texts = loaded.fact_ids, loaded.fact_texts
+    distances, indices = loaded.search(query_embeddings, max(candidates, top_k))
+    lexical_hits = loaded.lexical_search_batch(list(input_texts), max(candidates, top_k))
+    batch_results = []
+
+    for (docs, scores), row_distances, row_indices in zip(lexical_hits, distances, indices):
+        fused: Dict[int, float] = {}
+        dense: Dict[int, float] = {}
+        for rank, (dist, idx) in enumerate(zip(row_distances, row_indices)):
+            if idx < 0:
+                continue
+            dense[int(idx)] = dist
+            fused[int(idx)] = 1.0 / (RRF_K + rank + 1)
+        lexical: Dict[int, float] = {}
+        for rank, (doc, score) in enumerate(zip(docs.tolist(), scores.tolist())):
+            lexical[doc] = score
+            fused[doc] = fused.get(doc, 0.0) + 1.0 / (RRF_K + rank + 1)
+
+        best = sorted(fused, key=fused.get, reverse=True)[:top_k]
+        batch_results.append([{
             "id": fact_ids[idx],
             "text": fact_texts[idx],
-            "distance": dist
-        })
-    return results
+            "distance": dense.get(idx),
+            "bm25": lexical.get(idx, 0.0),
+            "score": fused[idx]
+        } for idx in best])
+    return batch_results
+
+def query_faiss_batch(input_texts: List[str], top_k: int = 5, config: IndexConfig = None,
+                      label: str = "Fact", hybrid: bool = HYBRID_SEARCH) -> List[List[Dict[str, Any]]]:
+    """
+    在 FAISS 索引中批次查詢最相似的事實：所有輸入一次編碼，並以單一次 index.search 查詢整個查詢矩陣。
+
+    Args:
+        input_texts (List[str]): 用戶輸入的文本列表。
+        top_k (int): 每個輸入返回的最相似事實數量。
+        config (IndexConfig): 索引設定。
+        label (str): 要查詢的節點標籤，預設為 Fact。
+        hybrid (bool): 是否改用 hybrid_search 融合 BM25 詞彙索引，預設由 KG_HYBRID_SEARCH 決定。
+
+    Returns:
+        List[List[Dict[str, Any]]]: 與輸入順序相同，每個輸入各一個包含最相似事實的 ID、文本和距離的列表。
+    """
+    if not input_texts:
+        return []
+    query_embeddings = np.asarray(get_model().encode(list(input_texts)), dtype="float32")
+    if hybrid:
+        return hybrid_search(input_texts, query_embeddings, top_k, config, label)
+    return search_index(query_embeddings, top_k, config, label)
+
+def query_labels_batch(input_texts: List[str], weights: Optional[Dict[str, float]] = None, top_k: int = 5,
+                       config: IndexConfig = None) -> List[List[Dict[str, Any]]]:
+    """
+    同時查詢多個標籤的索引並合併結果。輸入只編碼一次，各標籤的索引在不同執行緒中平行查詢，
+    每個命中的分數為 標籤權重 / (1 + 距離)，依分數由高到低取前 top_k 個。
+
+    Args:
+        input_texts (List[str]): 用戶輸入的文本列表。
+        weights (Optional[Dict[str, float]]): 標籤對應權重，None 表示 LABEL_WEIGHTS。
+        top_k (int): 每個輸入返回的節點數量（每個標籤各取 top_k 個後合併）。
+        config (IndexConfig): 索引設定，所有標籤共用。
+
+    Returns:
+        List[List[Dict[str, Any]]]: 與輸入順序相同，每個輸入各一個列表，
+        每個命中含 label、id、text、distance 及 score。
+    """
+    if not input_texts:
+        return []
+    weights = LABEL_WEIGHTS if weights is None else weights
+    query_embeddings = np.asarray(get_model().encode(list(input_texts)), dtype="float32")
+    futures = {label: get_search_executor().submit(search_index, query_embeddings, top_k, config, label)
+               for label in weights}
+    merged: List[List[Dict[str, Any]]] = [[] for _ in input_texts]
+    for label, future in futures.items():
+        for results, hits in zip(merged, future.result()):
+            results.extend({"label": label, **hit, "score": weights[label] / (1.0 + float(hit["distance"]))}
+                           for hit in hits)
+    return [sorted(results, key=lambda hit: hit["score"], reverse=True)[:top_k] for results in merged]
+
+def query_labels(input_text: str, weights: Optional[Dict[str, float]] = None, top_k: int = 5,
+                 config: IndexConfig = None) -> List[Dict[str, Any]]:
+    """
+    同時查詢多個標籤的索引並依加權分數合併，例如 {"Fact": 1.0, "Explanation": 0.8}。
+
+    Args:
+        input_text (str): 用戶輸入的文本。
+        weights (Optional[Dict[str, float]]): 標籤對應權重，None 表示 LABEL_WEIGHTS。
+        top_k (int): 返回的節點數量。
+        config (IndexConfig): 索引設定。
+
+    Returns:
+        List[Dict[str, Any]]: 包含 label、id、text、distance 及 score 的列表，依 score 由高到低排序。
+    """
+    return query_labels_batch([input_text], weights, top_k, config)[0]
+
+def query_faiss(input_text: str, top_k: int = 5, config: IndexConfig = None,
+                hybrid: bool = HYBRID_SEARCH) -> List[Dict[str, Any]]:
+    """
+    在 FAISS 索引中查詢最相似的事實。與 query_faiss_batch 共用同一條路徑，結果與批次查詢相同。
+
+    Args:
+        input_text (str): 用戶輸入的文本。
+        top_k (int): 返回的最相似事實數量。
+        config (IndexConfig): 索引設定。
+        hybrid (bool): 是否融合 BM25 詞彙索引。
+
+    Returns:
+        List[Dict[str, Any]]: 包含最相似事實的 ID、文本和距離的列表。
+    """
+    return query_faiss_batch([input_text], top_k, config, hybrid=hybrid)[0]
 
 def get_statutes_for_case(fact_id: str) -> List[Dict[str, Any]]:
     """
@@ -105,17 +335,7 @@ def get_statutes_for_case(fact_id: str) -> List[Dict[str, Any]]:
     Returns:
         List[Dict[str, Any]]: 包含案件 ID 和引用法條的列表。
     """
-    with driver.session() as session:
-        results = session.run(
-            """
-            MATCH (c:Case)-[:案件事實]->(f:Fact {id: $fact_id})
-            MATCH (c)-[:案件相關法條]->(l:LegalReference)
-            MATCH (l)-[:引用法條]->(s:Statute)
-            RETURN c.id AS case_id, collect(s.id) AS statutes
-            """,
-            fact_id=fact_id
-        )
-        return [{"case_id": record["case_id"], "statutes": record["statutes"]} for record in results]
+    return get_retrieval_graph().get_statutes_for_case(fact_id)
 
 def fetch_statutes_and_explanations(statutes: List[str]) -> List[Dict[str, str]]:
     """
@@ -127,21 +347,55 @@ def fetch_statutes_and_explanations(statutes: List[str]) -> List[Dict[str, str]]
     Returns:
         List[Dict[str, str]]: 包含法條 ID、條文和口語化解釋的字典列表。
     """
-    query = """
-    MATCH (s:Statute)-[:口語化解釋]->(e:Explanation)
-    WHERE s.id IN $statutes
-    RETURN s.id AS statute_id, s.text AS statute_text, e.text AS explanation_text
-    """
-    with driver.session() as session:
-        results = session.run(query, statutes=statutes)
-        return [
-            {
-                "statute_id": record["statute_id"],
-                "statute_text": record["statute_text"],
-                "explanation_text": record["explanation_text"]
-            }
-            for record in results
-        ]
+    return get_retrieval_graph().fetch_statutes_and_explanations(statutes)
+
+def _cocitations(graph: GraphBackend, statutes_by_fact: Dict[str, List[Dict[str, Any]]],
+                 cocitation_weight: float) -> Optional[Dict[str, Dict[str, float]]]:
+    """
+    取得候選法條之間的共同引用機率。共同引用在建立檢索快照時預先算好，快照過期或不使用先驗時為 None。
+    """
+    if cocitation_weight <= 0 or not isinstance(graph, SnapshotGraph):
+        return None
+    statute_ids = [statute_id for cases in statutes_by_fact.values()
+                   for case in cases for statute_id in case["statutes"]]
+    return graph.get_cocitations(statute_ids)
+
+def rank_legal_batch(inputs: List[Tuple[str, str]], top_k: int = 5,
+                     cocitation_weight: float = COCITATION_WEIGHT) -> List[List[Dict[str, Any]]]:
+    """
+    批次為每個輸入的候選法條排序：最相似的 top_k 個事實依相似度為其案件引用的法條投票，
+    可再加上共同引用先驗（KG_StatuteRanking.rank_statutes）。所有命中事實的引用法條以單一次查詢取得。
+
+    Args:
+        inputs (List[Tuple[str, str]]): (案件事實, 受傷情形) 列表。
+        top_k (int): 參與投票的相似事實數量。
+        cocitation_weight (float): 共同引用先驗的權重，0 表示只依投票排序。
+
+    Returns:
+        List[List[Dict[str, Any]]]: 與輸入順序相同，每個輸入依分數由高到低、含 statute_id 及 score 的列表。
+    """
+    input_texts = [f"{case_facts} {injury_details}" for case_facts, injury_details in inputs]
+    similar_facts_batch = query_faiss_batch(input_texts, top_k=top_k)
+    fact_ids = list(dict.fromkeys(fact["id"] for similar_facts in similar_facts_batch for fact in similar_facts))
+    graph = get_retrieval_graph()
+    statutes_by_fact = graph.get_statutes_for_facts(fact_ids) if fact_ids else {}
+    cocitations = _cocitations(graph, statutes_by_fact, cocitation_weight)
+    return [[{"statute_id": statute_id, "score": score}
+             for statute_id, score in rank_statutes(similar_facts, statutes_by_fact, cocitations, cocitation_weight)]
+            for similar_facts in similar_facts_batch]
+
+def get_legal_batch(inputs: List[Tuple[str, str]]) -> List[str]:
+    """
+    批次根據案件事實和受傷情形生成相關的法條引用。所有輸入一次查詢 FAISS，
+    所有命中事實的引用法條以單一次圖譜查詢取得。
+
+    Args:
+        inputs (List[Tuple[str, str]]): (案件事實, 受傷情形) 列表。
+
+    Returns:
+        List[str]: 與輸入順序相同，每個輸入的相關法條字符串列表，依 rank_legal_batch 的分數由高到低排列。
+    """
+    return ["\n".join(statute["statute_id"] for statute in ranked) for ranked in rank_legal_batch(inputs)]
 
 def get_legal(case_facts: str, injury_details: str) -> str:
     """
@@ -154,15 +408,68 @@ def get_legal(case_facts: str, injury_details: str) -> str:
     Returns:
         str: 相關法條的字符串列表。
     """
-    input_text = f"{case_facts} {injury_details}"
-    similar_facts = query_faiss(input_text, top_k=5)
-    statutes_set = set()
+    return get_legal_batch([(case_facts, injury_details)])[0]
+
+def get_legal_with_explanations_batch(inputs: List[Tuple[str, str]], top_k: int = 5,
+                                      token_budget: int = STATUTE_TOKEN_BUDGET,
+                                      cocitation_weight: float = COCITATION_WEIGHT) -> List[List[Dict[str, Any]]]:
+    """
+    批次取得相關法條的條文及口語化解釋，相當於 get_legal 之後再 fetch_statutes_and_explanations，
+    但所有命中事實的引用法條與法條內容以單一次圖譜查詢取得，查詢次數與 top_k 及輸入數量無關。
+    法條依 rank_legal_batch 的方式排序，並只保留放得進 token_budget 的前幾條。
+
+    Args:
+        inputs (List[Tuple[str, str]]): (案件事實, 受傷情形) 列表。
+        top_k (int): 參與投票的相似事實數量。
+        token_budget (int): 條文與口語化解釋的 token 上限，0 表示不限制。
+        cocitation_weight (float): 共同引用先驗的權重，0 表示只依投票排序。
+
+    Returns:
+        List[List[Dict[str, Any]]]: 與輸入順序相同，每個輸入依分數由高到低、
+        包含法條 ID、條文、口語化解釋和分數（score）的字典列表。
+    """
+    input_texts = [f"{case_facts} {injury_details}" for case_facts, injury_details in inputs]
+    similar_facts_batch = query_faiss_batch(input_texts, top_k=top_k)
+    fact_ids = list(dict.fromkeys(fact["id"] for similar_facts in similar_facts_batch for fact in similar_facts))
+    graph = get_retrieval_graph()
+    statutes_by_fact, explanations = graph.get_legal_context(fact_ids) if fact_ids else ({}, {})
+    cocitations = _cocitations(graph, statutes_by_fact, cocitation_weight)
+    results = []
+
+    for similar_facts in similar_facts_batch:
+        ranked = rank_statutes(similar_facts, statutes_by_fact, cocitations, cocitation_weight)
+        statutes = [{**explanations[statute_id], "score": score}
+                    for statute_id, score in ranked if statute_id in explanations]
+        results.append(apply_token_budget(statutes, token_budget))
+    return results
+
+def get_legal_with_explanations(case_facts: str, injury_details: str) -> List[Dict[str, Any]]:
+    """
+    根據案件事實和受傷情形取得相關法條的條文及口語化解釋（單一次圖譜查詢），依分數由高到低並受 token 上限限制。
+
+    Args:
+        case_facts (str): 案件事實。
+        injury_details (str): 受傷情形。
+
+    Returns:
+        List[Dict[str, Any]]: 包含法條 ID、條文、口語化解釋和分數的字典列表。
+    """
+    return get_legal_with_explanations_batch([(case_facts, injury_details)])[0]
 
-    for fact in similar_facts:
-        fact_id = fact["id"]
-        statutes_info = get_statutes_for_case(fact_id)
-        for info in statutes_info:
-            statutes_set.update(info["statutes"])
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="建置或增量更新各標籤的 FAISS 索引")
+    parser.add_argument("--config", default=None, help="索引設定名稱（預設為 KG_FAISS_INDEX 或調校後的設定）")
+    parser.add_argument("--labels", nargs="+", default=["Fact"], choices=HASHED_LABELS, help="要建置索引的節點標籤")
+    parser.add_argument("--rebuild", action="store_true", help="忽略既有索引，整個重建")
+    args = parser.parse_args()
 
-    legal_references = "\n".join(sorted(statutes_set))
-    return legal_references
+    for label in args.labels:
+        start = time.perf_counter()
+        if args.rebuild:
+            _, fact_ids, _ = build_faiss_index(args.config, label)
+            print(f"{label}: 已重建索引：{len(fact_ids)} 個節點")
+        else:
+            result = update_faiss_index(args.config, label=label)
+            print(f"{label}: {'已重建' if result['rebuilt'] else '已更新'}索引：新增 {result['added']}，"
+                  f"刪除 {result['deleted']}，有效節點 {result['total']}")
+        print(f"{label}: 耗時 {time.perf_counter() - start:.2f} 秒")
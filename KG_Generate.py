@@ -1,13 +1,10 @@
-from langchain.chains import LLMChain
-from langchain.prompts import PromptTemplate
-from langchain_ollama import OllamaLLM
 from KG_Legal_References import generate_legal_reference
 import re
 
-# 定義提示模板
-prompt_template = PromptTemplate(
-    input_variables=["case_facts", "legal_references"],
-    template="""
+# 定義提示模板的變數與文字；PromptTemplate 物件（prompt_template、comp_promt）在第一次取用時才建立，
+# 匯入本模組不會載入 langchain
+PROMPT_VARIABLES = ["case_facts", "legal_references"]
+PROMPT_TEXT = """
 你是一個台灣原告律師，你要撰寫一份車禍起訴狀，但你只需要根據下列格式進行輸出，並確保每個段落內容完整：
 （一）事實概述：完整描述事故經過，事件結果盡量越詳細越好，要使用"緣被告"做開頭，並且在這段中都要以"原告""被告"作人物代稱，如果我給你的案件事實中沒有出現原告或被告的姓名，則請直接使用"原告""被告"作為代稱，請絕對不要自己憑空杜撰被告的姓名
 （二）法律依據：按照我給你的條列式的法條資訊，轉化為以下模板的格式做輸出:
@@ -21,10 +18,8 @@ prompt_template = PromptTemplate(
 ### 法條資訊：
 {legal_references}
 """
-)
-comp_promt=PromptTemplate(
-    input_variables=["injury_details", "compensation_request"],
-    template="""
+COMP_VARIABLES = ["injury_details", "compensation_request"]
+COMP_TEXT = """
 你是一個台灣原告律師，你要幫助原告整理賠償資訊，你只需要根據下列格式進行輸出，並確保每個段落內容完整：
 要確保完全照著模板的格式輸出，開頭的損害項目記得前面要加上（三），"損害項目總覽："前面要加上（四）。
 （三）損害項目：列出所有損害項目的金額，並說明對應事實。
@@ -59,7 +54,6 @@ comp_promt=PromptTemplate(
 ### 賠償請求：
 {compensation_request}
     """
-)
 user_input="""
 一、事故發生緣由：
 被告於民國94年10月10日20時6分許，駕駛車牌號碼3191-XA號自小客車，沿台南縣山上鄉○○村○○○○○道路由東往西方向行駛，於行經明和村明和192之6號前時，原應注意汽車不得逆向行駛，且應注意車前狀況，並減速慢行，作好隨時準備煞車之安全措施，依當時天氣晴朗、路面平坦無缺陷、無障礙物、桅距良好等，並無不能注意之情事，竟仍疏未注意，逆向駛入對向車道，致其上開自小客車車頭與由乙○○所騎乘、後方搭載其妹丙○○，行駛於對向車道之UWL-1855號輕型機車發生對撞，致原告乙○○、丙○○人車倒地。
@@ -94,7 +88,32 @@ def split_input(user_input):
     }
     return input_dict
 
+# 模組屬性名稱對應 (輸入變數, 模板文字)
+_PROMPTS = {
+    "prompt_template": (PROMPT_VARIABLES, PROMPT_TEXT),
+    "comp_promt": (COMP_VARIABLES, COMP_TEXT),
+}
+_prompt_cache = {}
+
+# 取得提示模板（langchain 的 PromptTemplate），第一次呼叫時建立
+def get_prompt(name):
+    if name not in _prompt_cache:
+        from langchain.prompts import PromptTemplate
+
+        input_variables, template = _PROMPTS[name]
+        _prompt_cache[name] = PromptTemplate(input_variables=input_variables, template=template)
+    return _prompt_cache[name]
+
+# 讓 prompt_template、comp_promt 維持為 PromptTemplate，在第一次存取時才建立
+def __getattr__(name):
+    if name in _PROMPTS:
+        return get_prompt(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 def generate_fact_and_legal(user_input):
+    from langchain.chains import LLMChain
+    from langchain_ollama import OllamaLLM
+
     input_data=split_input(user_input)
     legal_references = generate_legal_reference(user_input)
     input_data["legal_references"] = legal_references
@@ -103,7 +122,7 @@ def generate_fact_and_legal(user_input):
                     keep_alive=0,
                     )
     # 創建 LLMChain
-    llm_chain = LLMChain(llm=llm, prompt=prompt_template)
+    llm_chain = LLMChain(llm=llm, prompt=get_prompt("prompt_template"))
     # 傳入數據生成起訴書
     lawsuit_draft = llm_chain.run({
         "case_facts": input_data["case_facts"],
@@ -112,13 +131,16 @@ def generate_fact_and_legal(user_input):
     return lawsuit_draft
 
 def generate_comp(user_input):
+    from langchain.chains import LLMChain
+    from langchain_ollama import OllamaLLM
+
     input_data=split_input(user_input)
     llm = OllamaLLM(model="deepseek-r1:32b",
                     temperature=0.1,
                     keep_alive=0,
                     )
     # 創建 LLMChain
-    llm_chain = LLMChain(llm=llm, prompt=comp_promt)
+    llm_chain = LLMChain(llm=llm, prompt=get_prompt("comp_promt"))
     # 傳入數據生成起訴書
     lawsuit_draft = llm_chain.run({
         "injury_details": input_data["injury_details"],
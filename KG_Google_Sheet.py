@@ -1,6 +1,4 @@
 from KG_Generate import generate_lawsuit
-from googleapiclient.discovery import build
-from google.oauth2.service_account import Credentials
 import os
 from dotenv import load_dotenv
 load_dotenv()
@@ -12,13 +10,23 @@ SPREADSHEET_ID = os.getenv("SPREADSHEET_ID")
 RANGE_READ = 'Sheet1!A:A'  # 讀取 A 欄
 RANGE_WRITE = 'Sheet1!D1'  # 從 B1 開始寫入
 
-# 初始化 Google Sheets 客戶端
-creds = Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=SCOPES)
-service = build('sheets', 'v4', credentials=creds)
-sheet = service.spreadsheets()
+_sheet = None
+
+# 初始化 Google Sheets 客戶端（第一次使用時才讀取金鑰並建立連線）
+def get_sheet():
+    global _sheet
+    if _sheet is None:
+        from googleapiclient.discovery import build
+        from google.oauth2.service_account import Credentials
+
+        creds = Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=SCOPES)
+        service = build('sheets', 'v4', credentials=creds)
+        _sheet = service.spreadsheets()
+    return _sheet
 
 # 讀取試算表數據並逐條生成結果
 def read_and_write_sheets():
+    sheet = get_sheet()
     # 讀取 A 欄數據
     result = sheet.values().get(spreadsheetId=SPREADSHEET_ID, range=RANGE_READ).execute()
     values = result.get("values", [])
@@ -0,0 +1,492 @@
+from KG_Driver import close_pool, get_pool
+from KG_Parser import (ANCHOR_RELATIONS, ANCHORS, CASE_LABELS, PARENT_RELATIONS, collect_citations, collect_nodes,
+                       iter_batches)
+from KG_Schema import UNIQUE_KEYS
+from abc import ABC, abstractmethod
+from dotenv import load_dotenv
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import json
+import os
+import threading
+import time
+import uuid
+
+# 加載 .env 文件中的環境變數
+load_dotenv()
+
+# 圖譜後端：neo4j 或 local（行程內字典儲存，可存成快照檔）
+GRAPH_BACKEND = os.getenv("KG_GRAPH_BACKEND", "neo4j")
+# local 後端的快照檔路徑
+GRAPH_SNAPSHOT_PATH = os.getenv("KG_GRAPH_SNAPSHOT", "graph_snapshot.json")
+SNAPSHOT_VERSION = 1
+# Neo4j 後端每個寫入交易包含的資料筆數
+WRITE_BATCH_SIZE = 10000
+# 記錄圖譜建置編號的錨點節點標籤，每次建置或增量更新後寫入新的 build_id 屬性
+BUILD_ANCHOR = "ReferenceData"
+
+NodeRef = Tuple[str, str]
+
+def new_build_id() -> str:
+    """產生新的圖譜建置編號（建置時間加上隨機字尾），例如 20240501-153000-1a2b3c4d。"""
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+class GraphBackend(ABC):
+    """
+    知識圖譜存取介面。節點以 (標籤, 唯一鍵) 識別，唯一鍵屬性由 KG_Schema.UNIQUE_KEYS 決定
+    （一般節點為 id，錨點節點為 name）。
+    """
+
+    @abstractmethod
+    def upsert_nodes(self, label: str, rows: List[Dict[str, Any]]) -> None:
+        """
+        新增或更新節點屬性。值為 None 的屬性會被移除。
+
+        Args:
+            label (str): 節點標籤。
+            rows (List[Dict[str, Any]]): 節點屬性，必須包含該標籤的唯一鍵。
+        """
+
+    @abstractmethod
+    def upsert_edges(self, rel_type: str, start_label: str, end_label: str, rows: List[Dict[str, Any]]) -> None:
+        """
+        新增或更新關係。與 MATCH ... MERGE 相同，兩端節點都存在時才會建立。
+
+        Args:
+            rel_type (str): 關係類型。
+            start_label (str): 起點節點標籤。
+            end_label (str): 終點節點標籤。
+            rows (List[Dict[str, Any]]): 每筆含 start、end（兩端節點的唯一鍵），可選 properties。
+        """
+
+    @abstractmethod
+    def iter_nodes(self, label: str, properties: List[str]) -> Iterator[Dict[str, Any]]:
+        """
+        依序讀出某一標籤所有節點的指定屬性。
+
+        Args:
+            label (str): 節點標籤。
+            properties (List[str]): 要讀取的屬性名稱，不存在的屬性為 None。
+
+        Yields:
+            Dict[str, Any]: 屬性名稱對應屬性值。
+        """
+
+    @abstractmethod
+    def get_statutes_for_case(self, fact_id: str) -> List[Dict[str, Any]]:
+        """
+        查詢指定事實所屬案件引用的法條（Fact -> Case -> LegalReference -> Statute）。
+
+        Args:
+            fact_id (str): 事實節點的 ID。
+
+        Returns:
+            List[Dict[str, Any]]: 包含案件 ID 和引用法條的列表。
+        """
+
+    @abstractmethod
+    def get_statutes_for_facts(self, fact_ids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        一次查詢多個事實所屬案件引用的法條，結果與逐一呼叫 get_statutes_for_case 相同。
+
+        Args:
+            fact_ids (List[str]): 事實節點的 ID 列表。
+
+        Returns:
+            Dict[str, List[Dict[str, Any]]]: 事實 ID 對應 get_statutes_for_case 的結果；沒有引用法條的事實對應空列表。
+        """
+
+    @abstractmethod
+    def fetch_statutes_and_explanations(self, statutes: List[str]) -> List[Dict[str, str]]:
+        """
+        查詢指定法條的條文內容及其口語化解釋。
+
+        Args:
+            statutes (List[str]): 要查詢的法條 ID 列表。
+
+        Returns:
+            List[Dict[str, str]]: 包含法條 ID、條文和口語化解釋的字典列表。
+        """
+
+    def get_legal_context(self, fact_ids: List[str]
+                          ) -> Tuple[Dict[str, List[Dict[str, Any]]], Dict[str, Dict[str, str]]]:
+        """
+        一次取得多個事實所屬案件引用的法條，以及這些法條的條文與口語化解釋，
+        相當於 get_statutes_for_facts 加上 fetch_statutes_and_explanations；後端可以覆寫為單一次查詢。
+
+        Args:
+            fact_ids (List[str]): 事實節點的 ID 列表。
+
+        Returns:
+            Tuple[Dict[str, List[Dict[str, Any]]], Dict[str, Dict[str, str]]]: get_statutes_for_facts 的結果，
+            以及法條 ID 對應 fetch_statutes_and_explanations 的一筆結果（沒有口語化解釋的法條不在其中）。
+        """
+        statutes_by_fact = self.get_statutes_for_facts(fact_ids)
+        statute_ids = [statute_id for cases in statutes_by_fact.values()
+                       for case in cases for statute_id in case["statutes"]]
+        explanations: Dict[str, Dict[str, str]] = {}
+        for explanation in self.fetch_statutes_and_explanations(statute_ids):
+            explanations.setdefault(explanation["statute_id"], explanation)
+        return statutes_by_fact, explanations
+
+    @abstractmethod
+    def get_build_id(self) -> Optional[str]:
+        """
+        讀取圖譜目前的建置編號，用來判斷由圖譜衍生的快照是否過期。
+
+        Returns:
+            Optional[str]: 最近一次 mark_build 寫入的編號；尚未寫入過時為 None。
+        """
+
+    def mark_build(self, build_id: Optional[str] = None) -> str:
+        """
+        寫入新的建置編號。圖譜內容有變動的建置流程（KG_Build、load_records）結束時呼叫。
+
+        Args:
+            build_id (Optional[str]): 建置編號，None 表示以 new_build_id() 產生。
+
+        Returns:
+            str: 寫入的建置編號。
+        """
+        build_id = build_id or new_build_id()
+        self.upsert_nodes(BUILD_ANCHOR, [{"name": ANCHORS[BUILD_ANCHOR], "build_id": build_id}])
+        return build_id
+
+    def flush(self) -> None:
+        """將寫入持久化。Neo4j 的寫入已在交易中提交，不需要額外動作。"""
+
+    def close(self) -> None:
+        """釋放後端資源。"""
+
+# Neo4jGraph 的查詢語句（KG_Schema.check_query_plans 會以 EXPLAIN 檢查這些語句是否命中索引）
+# 指定事實所屬案件引用的法條
+STATUTES_FOR_CASE_QUERY = """
+MATCH (c:Case)-[:案件事實]->(f:Fact {id: $fact_id})
+MATCH (c)-[:案件相關法條]->(l:LegalReference)
+MATCH (l)-[:引用法條]->(s:Statute)
+RETURN c.id AS case_id, collect(s.id) AS statutes
+"""
+# 多個事實所屬案件引用的法條
+STATUTES_FOR_FACTS_QUERY = """
+UNWIND $fact_ids AS fact_id
+MATCH (c:Case)-[:案件事實]->(f:Fact {id: fact_id})
+MATCH (c)-[:案件相關法條]->(l:LegalReference)
+MATCH (l)-[:引用法條]->(s:Statute)
+RETURN fact_id, c.id AS case_id, collect(s.id) AS statutes
+"""
+# 多個事實引用的法條，連同法條的條文與口語化解釋
+LEGAL_CONTEXT_QUERY = """
+UNWIND $fact_ids AS fact_id
+MATCH (c:Case)-[:案件事實]->(f:Fact {id: fact_id})
+MATCH (c)-[:案件相關法條]->(l:LegalReference)
+MATCH (l)-[:引用法條]->(s:Statute)
+OPTIONAL MATCH (s)-[:口語化解釋]->(e:Explanation)
+RETURN fact_id, c.id AS case_id, collect(s.id) AS statutes,
+       collect(CASE WHEN e IS NULL THEN null
+               ELSE {statute_id: s.id, statute_text: s.text, explanation_text: e.text} END) AS explanations
+"""
+# 指定法條的條文及其口語化解釋
+STATUTE_EXPLANATIONS_QUERY = """
+MATCH (s:Statute)-[:口語化解釋]->(e:Explanation)
+WHERE s.id IN $statutes
+RETURN s.id AS statute_id, s.text AS statute_text, e.text AS explanation_text
+"""
+
+class Neo4jGraph(GraphBackend):
+    """
+    以 Neo4j 資料庫為後端的圖譜存取，透過 KG_Driver.DriverPool 共用連線池：
+    查詢以 execute_read 執行（暫時性錯誤自動重試），寫入以 execute_write 執行。
+    """
+
+    def __init__(self, pool=None):
+        # None 表示使用 KG_Driver 的共用連線池（關閉後再使用時會重新建立）
+        self._pool = pool
+
+    @property
+    def pool(self):
+        return self._pool if self._pool is not None else get_pool()
+
+    def _read(self, query: str, **parameters) -> List[Any]:
+        # 在讀取交易內讀完所有記錄，交易結束後仍可取用
+        return self.pool.read(lambda tx: list(tx.run(query, parameters)))
+
+    def _write_batches(self, query: str, rows: List[Dict[str, Any]]) -> None:
+        # 每 WRITE_BATCH_SIZE 筆一個交易，避免單一交易過大
+        for batch in iter_batches(rows, WRITE_BATCH_SIZE):
+            self.pool.write(lambda tx: tx.run(query, rows=batch).consume())
+
+    def upsert_nodes(self, label: str, rows: List[Dict[str, Any]]) -> None:
+        key = UNIQUE_KEYS[label]
+        self._write_batches(f"UNWIND $rows AS row MERGE (n:{label} {{{key}: row.{key}}}) SET n += row", rows)
+
+    def upsert_edges(self, rel_type: str, start_label: str, end_label: str, rows: List[Dict[str, Any]]) -> None:
+        start_key = UNIQUE_KEYS[start_label]
+        end_key = UNIQUE_KEYS[end_label]
+        self._write_batches(
+            "UNWIND $rows AS row "
+            f"MATCH (a:{start_label} {{{start_key}: row.start}}), (b:{end_label} {{{end_key}: row.end}}) "
+            f"MERGE (a)-[r:{rel_type}]->(b) "
+            "SET r += coalesce(row.properties, {})",
+            rows
+        )
+
+    def iter_nodes(self, label: str, properties: List[str]) -> Iterator[Dict[str, Any]]:
+        # 節點數量可能很大，以串流方式逐批拉取，不在記憶體中保留全部記錄
+        projection = ", ".join(f".{name}" for name in properties)
+        for record in self.pool.stream(f"MATCH (n:{label}) RETURN n {{{projection}}} AS node"):
+            yield record["node"]
+
+    def get_statutes_for_case(self, fact_id: str) -> List[Dict[str, Any]]:
+        records = self._read(STATUTES_FOR_CASE_QUERY, fact_id=fact_id)
+        return [{"case_id": record["case_id"], "statutes": record["statutes"]} for record in records]
+
+    def get_statutes_for_facts(self, fact_ids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        results: Dict[str, List[Dict[str, Any]]] = {fact_id: [] for fact_id in fact_ids}
+        records = self._read(STATUTES_FOR_FACTS_QUERY, fact_ids=list(results))
+        for record in records:
+            results[record["fact_id"]].append({"case_id": record["case_id"], "statutes": record["statutes"]})
+        return results
+
+    def fetch_statutes_and_explanations(self, statutes: List[str]) -> List[Dict[str, str]]:
+        records = self._read(STATUTE_EXPLANATIONS_QUERY, statutes=statutes)
+        return [
+            {
+                "statute_id": record["statute_id"],
+                "statute_text": record["statute_text"],
+                "explanation_text": record["explanation_text"]
+            }
+            for record in records
+        ]
+
+    def get_legal_context(self, fact_ids: List[str]
+                          ) -> Tuple[Dict[str, List[Dict[str, Any]]], Dict[str, Dict[str, str]]]:
+        statutes_by_fact: Dict[str, List[Dict[str, Any]]] = {fact_id: [] for fact_id in fact_ids}
+        explanations: Dict[str, Dict[str, str]] = {}
+        records = self._read(LEGAL_CONTEXT_QUERY, fact_ids=list(statutes_by_fact))
+        for record in records:
+            statutes_by_fact[record["fact_id"]].append({"case_id": record["case_id"], "statutes": record["statutes"]})
+            for explanation in record["explanations"]:
+                explanations.setdefault(explanation["statute_id"], dict(explanation))
+        return statutes_by_fact, explanations
+
+    def get_build_id(self) -> Optional[str]:
+        records = self._read(f"MATCH (n:{BUILD_ANCHOR} {{name: $name}}) RETURN n.build_id AS build_id",
+                             name=ANCHORS[BUILD_ANCHOR])
+        return records[0]["build_id"] if records else None
+
+    def close(self) -> None:
+        if self._pool is None:
+            close_pool()
+        else:
+            self._pool.close()
+
+class LocalGraph(GraphBackend):
+    """
+    行程內的圖譜存取：節點存在 {標籤: {唯一鍵: 屬性}}，關係存成雙向鄰接字典，
+    查詢只需字典查找，不需要網路往返。可存成 JSON 快照並在下次啟動時載入。
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.nodes: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.out_edges: Dict[str, Dict[NodeRef, Dict[NodeRef, Dict[str, Any]]]] = {}
+        self.in_edges: Dict[str, Dict[NodeRef, Dict[NodeRef, Dict[str, Any]]]] = {}
+
+    def upsert_nodes(self, label: str, rows: List[Dict[str, Any]]) -> None:
+        key = UNIQUE_KEYS[label]
+        table = self.nodes.setdefault(label, {})
+        for row in rows:
+            props = table.setdefault(row[key], {})
+            for name, value in row.items():
+                if value is None:
+                    props.pop(name, None)
+                else:
+                    props[name] = value
+
+    def upsert_edges(self, rel_type: str, start_label: str, end_label: str, rows: List[Dict[str, Any]]) -> None:
+        starts = self.nodes.get(start_label, {})
+        ends = self.nodes.get(end_label, {})
+        out_edges = self.out_edges.setdefault(rel_type, {})
+        in_edges = self.in_edges.setdefault(rel_type, {})
+        for row in rows:
+            if row["start"] not in starts or row["end"] not in ends:
+                continue
+            start = (start_label, row["start"])
+            end = (end_label, row["end"])
+            props = out_edges.setdefault(start, {}).setdefault(end, {})
+            props.update(row.get("properties") or {})
+            in_edges.setdefault(end, {})[start] = props
+
+    def iter_nodes(self, label: str, properties: List[str]) -> Iterator[Dict[str, Any]]:
+        for props in list(self.nodes.get(label, {}).values()):
+            yield {name: props.get(name) for name in properties}
+
+    def neighbors(self, rel_type: str, node: NodeRef, incoming: bool = False) -> List[NodeRef]:
+        """
+        回傳與節點以指定關係相連的節點。
+
+        Args:
+            rel_type (str): 關係類型。
+            node (NodeRef): (標籤, 唯一鍵)。
+            incoming (bool): True 表示沿關係反方向查找。
+
+        Returns:
+            List[NodeRef]: 相連節點，依建立順序排列。
+        """
+        edges = self.in_edges if incoming else self.out_edges
+        return list(edges.get(rel_type, {}).get(node, {}))
+
+    def get_statutes_for_case(self, fact_id: str) -> List[Dict[str, Any]]:
+        results = []
+        for case in self.neighbors("案件事實", ("Fact", fact_id), incoming=True):
+            if case[0] != "Case":
+                continue
+            statutes = [statute[1]
+                        for legal in self.neighbors("案件相關法條", case) if legal[0] == "LegalReference"
+                        for statute in self.neighbors("引用法條", legal) if statute[0] == "Statute"]
+            if statutes:
+                results.append({"case_id": case[1], "statutes": statutes})
+        return results
+
+    def get_statutes_for_facts(self, fact_ids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        return {fact_id: self.get_statutes_for_case(fact_id) for fact_id in fact_ids}
+
+    def fetch_statutes_and_explanations(self, statutes: List[str]) -> List[Dict[str, str]]:
+        statute_nodes = self.nodes.get("Statute", {})
+        results = []
+        for statute_id in dict.fromkeys(statutes):
+            statute = statute_nodes.get(statute_id)
+            if statute is None:
+                continue
+            for label, key in self.neighbors("口語化解釋", ("Statute", statute_id)):
+                results.append({
+                    "statute_id": statute_id,
+                    "statute_text": statute.get("text"),
+                    "explanation_text": self.nodes[label][key].get("text")
+                })
+        return results
+
+    def get_build_id(self) -> Optional[str]:
+        return self.nodes.get(BUILD_ANCHOR, {}).get(ANCHORS[BUILD_ANCHOR], {}).get("build_id")
+
+    def save(self, path: str) -> None:
+        """
+        將圖譜存成 JSON 快照。先寫入暫存檔再替換，讀取端不會看到寫到一半的檔案。
+
+        Args:
+            path (str): 快照檔路徑。
+        """
+        snapshot = {
+            "version": SNAPSHOT_VERSION,
+            "nodes": self.nodes,
+            "edges": {rel_type: [[start[0], start[1], end[0], end[1], props]
+                                 for start, ends in edges.items() for end, props in ends.items()]
+                      for rel_type, edges in self.out_edges.items()},
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "LocalGraph":
+        """
+        從 JSON 快照載入圖譜。
+
+        Args:
+            path (str): 快照檔路徑。
+
+        Returns:
+            LocalGraph: 載入的圖譜，之後的 flush() 會寫回同一路徑。
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            snapshot = json.load(f)
+        if snapshot.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"不支援的圖譜快照版本：{snapshot.get('version')}")
+        graph = cls(path)
+        graph.nodes = snapshot["nodes"]
+        for rel_type, edges in snapshot["edges"].items():
+            out_edges = graph.out_edges.setdefault(rel_type, {})
+            in_edges = graph.in_edges.setdefault(rel_type, {})
+            for start_label, start_key, end_label, end_key, props in edges:
+                start = (start_label, start_key)
+                end = (end_label, end_key)
+                out_edges.setdefault(start, {})[end] = props
+                in_edges.setdefault(end, {})[start] = props
+        return graph
+
+    def flush(self) -> None:
+        if self.path:
+            self.save(self.path)
+
+def load_records(graph: GraphBackend, statutes: List[Dict[str, str]], records: Iterable[Dict[str, Any]],
+                 batch_size: int = 1000) -> None:
+    """
+    透過圖譜存取介面寫入解析結果，產生與 KG_Build 相同的節點與關係。
+
+    Args:
+        graph (GraphBackend): 目標圖譜。
+        statutes (List[Dict[str, str]]): KG_Parser 解析出的法條。
+        records (Iterable[Dict[str, Any]]): KG_Parser 解析出的案件，可以是串流。
+        batch_size (int): 每批寫入的案件數量。
+    """
+    def write_nodes(nodes: Dict[str, List[Dict[str, str]]], labels: List[str]) -> None:
+        for label in labels:
+            rows = nodes[label]
+            graph.upsert_nodes(label, [{"id": row["id"], "text": row["text"], "content_hash": row["hash"]}
+                                       for row in rows])
+            parent_label, rel_type = PARENT_RELATIONS[label]
+            graph.upsert_edges(rel_type, parent_label, label,
+                               [{"start": row.get("parent_id", ANCHORS.get(parent_label)), "end": row["id"]}
+                                for row in rows])
+
+    for label, name in ANCHORS.items():
+        graph.upsert_nodes(label, [{"name": name}])
+    for start_label, end_label, rel_type in ANCHOR_RELATIONS:
+        graph.upsert_edges(rel_type, start_label, end_label,
+                           [{"start": ANCHORS[start_label], "end": ANCHORS[end_label]}])
+
+    write_nodes(collect_nodes(statutes, []), ["Statute", "Explanation"])
+    citations = []
+    for batch in iter_batches(records, batch_size):
+        write_nodes(collect_nodes([], batch), CASE_LABELS)
+        citations.extend(collect_citations(batch))
+    # 所有案件寫入後一次寫入全部引用關係，限定語存為關係屬性
+    graph.upsert_edges("引用法條", "LegalReference", "Statute",
+                       [{"start": row["legal_id"], "end": row["statute_id"],
+                         "properties": {"qualifiers": row["qualifiers"]}} for row in citations])
+    graph.mark_build()
+    graph.flush()
+
+_graph: Optional[GraphBackend] = None
+_graph_lock = threading.Lock()
+
+def get_graph() -> GraphBackend:
+    """
+    取得共用的圖譜存取物件，第一次呼叫時依 KG_GRAPH_BACKEND 建立（匯入模組時不會連線）。
+
+    Returns:
+        GraphBackend: 使用 KG_Driver 共用連線池的 Neo4jGraph，或從 KG_GRAPH_SNAPSHOT 載入（不存在時為空）的 LocalGraph。
+    """
+    global _graph
+    graph = _graph
+    if graph is None:
+        # 多個執行緒（例如 KG_Warmup 的各項預載）同時第一次呼叫時只建立一次
+        with _graph_lock:
+            if _graph is None:
+                if GRAPH_BACKEND == "local":
+                    if os.path.exists(GRAPH_SNAPSHOT_PATH):
+                        _graph = LocalGraph.load(GRAPH_SNAPSHOT_PATH)
+                    else:
+                        _graph = LocalGraph(GRAPH_SNAPSHOT_PATH)
+                else:
+                    _graph = Neo4jGraph()
+            graph = _graph
+    return graph
+
+def close_graph() -> None:
+    """關閉共用的圖譜存取物件（Neo4j 後端會關閉共用連線池）；之後再呼叫 get_graph() 會重新建立。"""
+    global _graph
+    with _graph_lock:
+        if _graph is not None:
+            _graph.close()
+            _graph = None
@@ -0,0 +1,536 @@
+from dotenv import load_dotenv
+from KG_Lexical import LEXICAL_LABELS, LexicalIndex, write_lexical_delta, write_lexical_index
+from KG_MetadataStore import FactMetadata, StringColumn, write_metadata
+from itertools import islice
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+import argparse
+import faiss
+import hashlib
+import json
+import numpy as np
+import os
+import threading
+import time
+
+# 加載 .env 文件中的環境變數
+load_dotenv()
+
+# 可選的索引設定。hnsw_flat 為原本的設定；其餘以較少記憶體換取些微召回率：
+#   hnsw_fp16  向量以 float16 存放（每維 2 bytes）
+#   hnsw_sq8   向量以 int8 純量量化存放（每維 1 byte）
+#   ivf_pq     倒排 + 乘積量化（每個向量 pq_m bytes），記憶體最小，適合大量事實
+#   flat       暴力搜尋，作為召回率的基準
+INDEX_CONFIGS: Dict[str, Dict[str, Any]] = {
+    "flat": {"type": "flat"},
+    "hnsw_flat": {"type": "hnsw_flat", "M": 32, "ef_construction": 200, "ef_search": 100},
+    "hnsw_fp16": {"type": "hnsw_sq", "quantizer": "fp16", "M": 32, "ef_construction": 200, "ef_search": 100},
+    "hnsw_sq8": {"type": "hnsw_sq", "quantizer": "8bit", "M": 32, "ef_construction": 200, "ef_search": 100},
+    "ivf_pq": {"type": "ivf_pq", "nlist": 1024, "pq_m": 48, "nbits": 8, "nprobe": 16},
+}
+# 預設使用的索引設定，可用環境變數切換；未設定時使用 KG_IndexTuning 寫入的調校結果，再沒有則為 hnsw_flat
+DEFAULT_INDEX_CONFIG = os.getenv("KG_FAISS_INDEX")
+# KG_IndexTuning 寫入的調校後索引設定
+TUNED_CONFIG_PATH = os.getenv("KG_FAISS_TUNED_CONFIG", "index_config.json")
+# 是否以記憶體映射方式讀取索引檔（faiss.IO_FLAG_MMAP），索引類型不支援時改為一般讀取
+INDEX_MMAP = os.getenv("KG_FAISS_MMAP", "0") == "1"
+# 常駐索引每隔幾秒檢查一次索引檔是否被重建
+RELOAD_CHECK_INTERVAL = float(os.getenv("KG_FAISS_RELOAD_INTERVAL", "5"))
+
+# 決定索引檔內容的建置參數；ef_search、nprobe 只在查詢時套用，不影響索引檔
+BUILD_PARAMS = ("quantizer", "M", "ef_construction", "nlist", "pq_m", "nbits")
+
+SCALAR_QUANTIZERS = {
+    "fp16": faiss.ScalarQuantizer.QT_fp16,
+    "8bit": faiss.ScalarQuantizer.QT_8bit,
+}
+
+IndexConfig = Union[str, Dict[str, Any], None]
+
+# (檔案修改時間, 設定)，調校結果檔被改寫後重新讀取
+_tuned_config: Tuple[Optional[int], Optional[Dict[str, Any]]] = (None, None)
+
+def load_tuned_config(path: str = TUNED_CONFIG_PATH) -> Optional[Dict[str, Any]]:
+    """
+    讀取 KG_IndexTuning 寫入的調校後索引設定。
+
+    Args:
+        path (str): 調校結果檔路徑。
+
+    Returns:
+        Optional[Dict[str, Any]]: 索引設定字典；檔案不存在時為 None。
+    """
+    global _tuned_config
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    if _tuned_config[0] != mtime:
+        with open(path, "r", encoding="utf-8") as f:
+            _tuned_config = (mtime, json.load(f)["config"])
+    return _tuned_config[1]
+
+def resolve_index_config(config: IndexConfig = None) -> Dict[str, Any]:
+    """
+    將索引設定名稱或設定字典展開為完整設定。
+
+    Args:
+        config (IndexConfig): INDEX_CONFIGS 中的名稱、含 name（或 type）的設定字典，None 表示 DEFAULT_INDEX_CONFIG
+            （未設定時為調校後的設定，沒有調校結果時為 hnsw_flat）。
+            字典中的值會覆蓋同名設定的預設值，例如 {"name": "ivf_pq", "nprobe": 32}。
+
+    Returns:
+        Dict[str, Any]: 含 name 與 type 的完整設定。
+    """
+    if config is None:
+        config = DEFAULT_INDEX_CONFIG or load_tuned_config() or "hnsw_flat"
+    if isinstance(config, str):
+        config = {"name": config}
+    name = config.get("name") or config.get("type")
+    if name not in INDEX_CONFIGS:
+        raise ValueError(f"未知的索引設定：{name}，可用設定為 {', '.join(INDEX_CONFIGS)}")
+    return {"name": name, **INDEX_CONFIGS[name], **config}
+
+def index_paths(config: IndexConfig = None, label: str = "Fact") -> Dict[str, str]:
+    """
+    回傳某一標籤、某一索引設定對應的索引檔、元數據檔與詞彙索引檔路徑。
+    hnsw_flat 沿用原本的檔名（fact_index_hnsw.faiss）。建置參數（BUILD_PARAMS）與 INDEX_CONFIGS 的預設值
+    不同時（例如調校後的 M 或 nlist），檔名另加上這些參數的雜湊，不會沿用以其他參數建置的索引檔。
+
+    Args:
+        config (IndexConfig): 索引設定。
+        label (str): 節點標籤，每個標籤各自一組索引檔。
+
+    Returns:
+        Dict[str, str]: index、metadata、lexical 及 lexical_delta（詞彙索引的增量附加段）路徑。
+    """
+    config = resolve_index_config(config)
+    name = config["name"]
+    params = {key: config[key] for key in BUILD_PARAMS if key in config}
+    defaults = {key: INDEX_CONFIGS[name][key] for key in BUILD_PARAMS if key in INDEX_CONFIGS[name]}
+    prefix = label.lower()
+    if name == "hnsw_flat":
+        name = "hnsw"
+    if params != defaults:
+        name = f"{name}_{hashlib.sha1(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()[:8]}"
+    return {"index": f"{prefix}_index_{name}.faiss", "metadata": f"{prefix}_metadata_{name}.meta",
+            "lexical": f"{prefix}_lexical_{name}.lex", "lexical_delta": f"{prefix}_lexical_{name}.delta.lex"}
+
+def create_index(config: IndexConfig, embeddings: np.ndarray, ids: Optional[np.ndarray] = None) -> faiss.Index:
+    """
+    依設定建立索引，需要訓練的索引（IVF-PQ、int8 量化）會先以 embeddings 訓練，再加入全部向量。
+
+    Args:
+        config (IndexConfig): 索引設定。
+        embeddings (np.ndarray): (向量數, 維度) 的 float32 向量。
+        ids (Optional[np.ndarray]): 若提供，索引外包 IndexIDMap2，向量以這些 int64 ID 加入，
+            查詢回傳 ID 而非加入順序，之後可以再以新的 ID 增量加入向量。
+
+    Returns:
+        faiss.Index: 已加入向量、並套用查詢參數的索引。
+    """
+    config = resolve_index_config(config)
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    count, dimension = embeddings.shape
+    index_type = config["type"]
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(dimension)
+    elif index_type == "hnsw_flat":
+        index = faiss.IndexHNSWFlat(dimension, config["M"])
+        index.hnsw.efConstruction = config["ef_construction"]
+    elif index_type == "hnsw_sq":
+        index = faiss.IndexHNSWSQ(dimension, SCALAR_QUANTIZERS[config["quantizer"]], config["M"])
+        index.hnsw.efConstruction = config["ef_construction"]
+    elif index_type == "ivf_pq":
+        if dimension % config["pq_m"]:
+            raise ValueError(f"pq_m={config['pq_m']} 必須整除向量維度 {dimension}")
+        if count < 2 ** config["nbits"]:
+            raise ValueError(f"IVF-PQ 至少需要 {2 ** config['nbits']} 個向量訓練，目前只有 {count} 個")
+        # 每個倒排列表至少約 39 個訓練向量，資料較少時自動減少 nlist
+        nlist = max(1, min(config["nlist"], count // 39))
+        quantizer = faiss.IndexFlatL2(dimension)
+        index = faiss.IndexIVFPQ(quantizer, dimension, nlist, config["pq_m"], config["nbits"])
+    else:
+        raise ValueError(f"未知的索引類型：{index_type}")
+
+    if ids is not None:
+        index = faiss.IndexIDMap2(index)
+    if not index.is_trained:
+        index.train(embeddings)
+    if ids is not None:
+        index.add_with_ids(embeddings, np.ascontiguousarray(ids, dtype=np.int64))
+    else:
+        index.add(embeddings)
+    apply_search_params(index, config)
+    return index
+
+def base_index(index: faiss.Index) -> faiss.Index:
+    """回傳 IndexIDMap 包裝內的實際索引；沒有包裝時回傳原索引。"""
+    if isinstance(index, faiss.IndexIDMap):
+        return faiss.downcast_index(index.index)
+    return index
+
+def apply_search_params(index: faiss.Index, config: IndexConfig) -> None:
+    """
+    套用查詢參數（HNSW 的 efSearch、IVF 的 nprobe）。從磁碟讀入的索引需要重新套用 nprobe。
+
+    Args:
+        index (faiss.Index): 索引。
+        config (IndexConfig): 索引設定。
+    """
+    config = resolve_index_config(config)
+    base = base_index(index)
+    if "ef_search" in config and hasattr(base, "hnsw"):
+        base.hnsw.efSearch = config["ef_search"]
+    if "nprobe" in config:
+        ivf = faiss.extract_index_ivf(index) if not isinstance(index, faiss.IndexIVF) else index
+        ivf.nprobe = config["nprobe"]
+
+def index_memory(index: faiss.Index) -> int:
+    """回傳索引序列化後的位元組數，即載入後常駐記憶體的近似值。"""
+    return int(faiss.serialize_index(index).nbytes)
+
+def recall_at_k(results: np.ndarray, truth: np.ndarray) -> float:
+    """
+    計算 recall@k：每個查詢的近似結果中命中暴力搜尋前 k 名的比例之平均。
+
+    Args:
+        results (np.ndarray): (查詢數, k) 的近似搜尋結果。
+        truth (np.ndarray): (查詢數, k) 的暴力搜尋結果。
+
+    Returns:
+        float: 0 到 1 之間的召回率。
+    """
+    k = truth.shape[1]
+    hits = sum(len(set(row[row >= 0]) & set(exact)) for row, exact in zip(results, truth))
+    return hits / (len(truth) * k)
+
+def benchmark_configs(embeddings: np.ndarray, configs: List[IndexConfig], k: int = 5,
+                      num_queries: int = 200, seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    以相同的向量比較各索引設定的召回率、記憶體與查詢延遲。查詢取自向量本身（加上少量雜訊）。
+
+    Args:
+        embeddings (np.ndarray): (向量數, 維度) 的 float32 向量。
+        configs (List[IndexConfig]): 要比較的索引設定。
+        k (int): 每個查詢取回的數量。
+        num_queries (int): 查詢數量。
+        seed (int): 抽樣查詢的亂數種子。
+
+    Returns:
+        List[Dict[str, Any]]: 每個設定一筆，含 name、recall、memory_bytes、build_seconds、
+        latency_ms（單筆查詢的中位數）及 batch_qps（整批查詢的吞吐量）。無法以這些向量建立的設定會被略過。
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(embeddings), size=min(num_queries, len(embeddings)), replace=False)
+    queries = embeddings[picks] + rng.normal(0, 0.01, (len(picks), embeddings.shape[1])).astype(np.float32)
+
+    exact = faiss.IndexFlatL2(embeddings.shape[1])
+    exact.add(embeddings)
+    _, truth = exact.search(queries, k)
+
+    report = []
+    for config in configs:
+        config = resolve_index_config(config)
+        start = time.perf_counter()
+        try:
+            index = create_index(config, embeddings)
+        except ValueError as e:
+            print(f"略過 {config['name']}：{e}")
+            continue
+        build_seconds = time.perf_counter() - start
+
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            index.search(query[None, :], k)
+            latencies.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        _, results = index.search(queries, k)
+        batch_seconds = time.perf_counter() - start
+
+        report.append({
+            "name": config["name"],
+            "recall": recall_at_k(results, truth),
+            "memory_bytes": index_memory(index),
+            "build_seconds": build_seconds,
+            "latency_ms": float(np.median(latencies)) * 1000,
+            "batch_qps": len(queries) / batch_seconds if batch_seconds else float("inf"),
+        })
+    return report
+
+def save_index_files(config: IndexConfig, index: faiss.Index, fact_ids: Sequence[str], fact_texts: Sequence[str],
+                     versions: Sequence[Sequence[int]], deleted: Sequence[int] = (),
+                     base: Optional[FactMetadata] = None, label: str = "Fact") -> None:
+    """
+    保存索引及元數據（KG_MetadataStore 格式）；LEXICAL_LABELS 中的標籤另外保存詞彙索引，
+    文件編號與索引的 ID 相同。先寫入暫存檔再替換，常駐索引不會讀到寫到一半的檔案。
+
+    Args:
+        config (IndexConfig): 索引設定，決定檔案路徑。
+        index (faiss.Index): 索引。
+        fact_ids (Sequence[str]): 節點 ID，索引回傳的位置（或 IndexIDMap2 的 ID）即其下標；
+            提供 base 時只需傳入接在 base 之後新增的節點。
+        fact_texts (Sequence[str]): 與 fact_ids 對應的節點文本。
+        versions (Sequence[Sequence[int]]): 與 fact_ids 對應的 (向量列號, 向量版本)，增量更新時據此比對。
+        deleted (Sequence[int]): 已刪除（tombstone）的 ID。
+        base (Optional[FactMetadata]): 增量更新時原本的元數據。
+        label (str): 節點標籤。
+    """
+    paths = index_paths(config, label)
+    faiss.write_index(index, f"{paths['index']}.tmp")
+    write_metadata(paths["metadata"], fact_ids, fact_texts, versions, deleted, base)
+    if label in LEXICAL_LABELS:
+        save_lexical_files(paths, fact_texts, base)
+    os.replace(f"{paths['index']}.tmp", paths["index"])
+
+def save_lexical_files(paths: Dict[str, str], fact_texts: Sequence[str], base: Optional[FactMetadata] = None) -> None:
+    """
+    保存詞彙索引。整個建置時重建主索引；增量更新時只重寫主索引之後的附加段（write_lexical_delta），
+    主索引留到下次整個重建（壓縮）時才重建。沒有可沿用的主索引時同樣整個重建。
+
+    Args:
+        paths (Dict[str, str]): index_paths 的結果。
+        fact_texts (Sequence[str]): 節點文本；提供 base 時為接在 base 之後新增的節點。
+        base (Optional[FactMetadata]): 增量更新時原本的元數據。
+    """
+    main = None
+    if base is not None and os.path.exists(paths["lexical"]):
+        main = LexicalIndex(paths["lexical"])
+        if len(main) > len(base):
+            main = None
+    if main is None:
+        # 先移除舊的附加段，避免與新的主索引錯配
+        if os.path.exists(paths["lexical_delta"]):
+            os.remove(paths["lexical_delta"])
+        write_lexical_index(paths["lexical"], (list(base.fact_texts) if base is not None else []) + list(fact_texts))
+        return
+    appended = list(islice(base.fact_texts, len(main), None)) + list(fact_texts)
+    write_lexical_delta(paths["lexical_delta"], main, appended)
+
+def _file_version(paths: Dict[str, str]) -> Optional[Tuple[int, ...]]:
+    try:
+        stats = [os.stat(paths["index"]), os.stat(paths["metadata"])]
+    except FileNotFoundError:
+        return None
+    return tuple(value for stat in stats for value in (stat.st_mtime_ns, stat.st_size))
+
+def read_index(path: str, use_mmap: bool = INDEX_MMAP) -> faiss.Index:
+    """
+    讀取索引檔。use_mmap 時以 faiss.IO_FLAG_MMAP 映射，不支援的索引類型改為一般讀取。
+    """
+    if use_mmap:
+        try:
+            return faiss.read_index(path, faiss.IO_FLAG_MMAP)
+        except RuntimeError:
+            pass
+    return faiss.read_index(path)
+
+def deletion_selector(deleted: Sequence[int]) -> Optional[Tuple[Any, Any]]:
+    """
+    建立排除已刪除（tombstone）ID 的 ID 選擇器。選擇器是唯讀的，可由多個執行緒的查詢共用。
+
+    Args:
+        deleted (Sequence[int]): 已刪除的 ID。
+
+    Returns:
+        Optional[Tuple[Any, Any]]: (IDSelectorNot, 其引用的 IDSelectorBatch)，兩者必須一起保留；沒有刪除時為 None。
+    """
+    if not len(deleted):
+        return None
+    removed = faiss.IDSelectorBatch(np.asarray(deleted, dtype=np.int64))
+    return faiss.IDSelectorNot(removed), removed
+
+def search_parameters(index: faiss.Index, selector: Any) -> Any:
+    """
+    建立以 selector 過濾 ID 的查詢參數，並沿用索引目前的 efSearch／nprobe。
+    每次查詢都要建立新的參數：IndexIDMap2 查詢期間會暫時替換參數中的選擇器，共用參數的並行查詢會讀到
+    其他查詢已釋放的選擇器。
+
+    Args:
+        index (faiss.Index): 索引。
+        selector (Any): deletion_selector 的 ID 選擇器。
+
+    Returns:
+        Any: SearchParametersHNSW、SearchParametersIVF 或 SearchParameters。
+    """
+    base = base_index(index)
+    ivf = faiss.try_extract_index_ivf(base)
+    if hasattr(base, "hnsw"):
+        params = faiss.SearchParametersHNSW()
+        params.efSearch = base.hnsw.efSearch
+    elif ivf is not None:
+        params = faiss.SearchParametersIVF()
+        params.nprobe = ivf.nprobe
+    else:
+        params = faiss.SearchParameters()
+    params.sel = selector
+    return params
+
+class LoadedIndex(NamedTuple):
+    index: faiss.Index
+    fact_ids: StringColumn
+    fact_texts: StringColumn
+    version: Tuple[int, ...]
+    # 增量更新後才有的已刪除 ID 選擇器（deletion_selector），沒有刪除時為 None
+    selector: Optional[Tuple[Any, Any]] = None
+    # 已刪除的 ID 及詞彙索引（只有 LEXICAL_LABELS 中的標籤才有）
+    deleted: Optional[np.ndarray] = None
+    lexical: Optional[LexicalIndex] = None
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """查詢索引並排除已刪除的事實，回傳 (距離, fact_ids 下標)，不足 k 個時以 -1 補位。"""
+        if self.selector is None:
+            return self.index.search(queries, k)
+        return self.index.search(queries, k, params=search_parameters(self.index, self.selector[0]))
+
+    def lexical_search(self, text: str, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """以 BM25 查詢詞彙索引並排除已刪除的事實，回傳 (fact_ids 下標, 分數)；沒有詞彙索引時為空。"""
+        if self.lexical is None:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        return self.lexical.search(text, k, self.deleted)
+
+    def lexical_search_batch(self, texts: List[str], k: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """批次版本的 lexical_search，回傳與輸入順序相同的結果。"""
+        if self.lexical is None:
+            return [self.lexical_search(text, k) for text in texts]
+        return self.lexical.search_batch(texts, k, self.deleted)
+
+class ResidentIndex:
+    """
+    行程內常駐的索引。第一次使用時載入，之後每隔 check_interval 秒比對索引檔與元數據檔的
+    修改時間及大小，檔案被重建時在背景載入新索引，載入完成後整組替換。
+
+    get() 回傳的 LoadedIndex 是不會再變動的快照：查詢期間即使換上新索引，
+    進行中的查詢仍使用原本的索引與元數據，兩者不會錯配；載入新索引時其他查詢也不必等待。
+    """
+
+    def __init__(self, config: IndexConfig = None, build: Optional[Callable[[IndexConfig, str], Any]] = None,
+                 use_mmap: bool = INDEX_MMAP, check_interval: float = RELOAD_CHECK_INTERVAL, label: str = "Fact"):
+        self.config = resolve_index_config(config)
+        self.label = label
+        self.paths = index_paths(self.config, label)
+        self.build = build
+        self.use_mmap = use_mmap
+        self.check_interval = check_interval
+        self.current: Optional[LoadedIndex] = None
+        self.next_check = 0.0
+        self.load_lock = threading.Lock()
+        self.reloading = False
+        self.reloads = 0
+
+    def _load(self) -> Optional[LoadedIndex]:
+        version = _file_version(self.paths)
+        if version is None:
+            return None
+        index = read_index(self.paths["index"], self.use_mmap)
+        apply_search_params(index, self.config)
+        # 元數據以記憶體映射開啟，只有命中的事實才會解碼 ID 與文本
+        metadata = FactMetadata(self.paths["metadata"])
+        if index.ntotal != len(metadata) or _file_version(self.paths) != version:
+            # 讀取期間檔案被替換（索引與元數據不成對），下次檢查時再載入
+            return None
+        lexical = None
+        if os.path.exists(self.paths["lexical"]):
+            lexical = LexicalIndex(self.paths["lexical"], self.paths["lexical_delta"])
+            if len(lexical) != index.ntotal:
+                # 舊的詞彙索引（與目前的索引不成對），只使用向量查詢
+                lexical = None
+        return LoadedIndex(index, metadata.fact_ids, metadata.fact_texts, version,
+                           deletion_selector(metadata.deleted), metadata.deleted, lexical)
+
+    def _reload(self) -> None:
+        try:
+            loaded = self._load()
+            if loaded is not None:
+                self.current = loaded
+                self.reloads += 1
+                print(f"已載入索引 {self.paths['index']}（{loaded.index.ntotal} 個向量）")
+        finally:
+            self.reloading = False
+
+    def get(self) -> LoadedIndex:
+        """
+        取得目前的索引快照。尚未載入時同步載入（檔案不存在則先建置）；
+        之後檔案有變動時由背景執行緒載入，本次呼叫仍回傳目前的快照。
+
+        Returns:
+            LoadedIndex: 索引、事實節點 ID、事實文本及檔案版本。
+        """
+        current = self.current
+        if current is None:
+            with self.load_lock:
+                if self.current is None:
+                    if _file_version(self.paths) is None and self.build is not None:
+                        self.build(self.config, self.label)
+                    self.current = self._load()
+                    if self.current is None:
+                        raise FileNotFoundError(f"找不到索引檔 {self.paths['index']}")
+                    self.next_check = time.monotonic() + self.check_interval
+                return self.current
+
+        now = time.monotonic()
+        if now >= self.next_check:
+            with self.load_lock:
+                if now >= self.next_check and not self.reloading:
+                    self.next_check = now + self.check_interval
+                    if _file_version(self.paths) not in (None, current.version):
+                        self.reloading = True
+                        threading.Thread(target=self._reload, daemon=True).start()
+        return current
+
+_resident: Dict[str, ResidentIndex] = {}
+# 以設定名稱或 None 取得的常駐索引，之後的查詢不必再解析設定（包括讀取調校結果檔）
+_resident_by_name: Dict[Tuple[str, Optional[str]], ResidentIndex] = {}
+_resident_lock = threading.Lock()
+
+def get_resident_index(config: IndexConfig = None, build: Optional[Callable[[IndexConfig, str], Any]] = None,
+                       label: str = "Fact") -> ResidentIndex:
+    """
+    取得某一標籤、某一索引設定的共用常駐索引。
+
+    Args:
+        config (IndexConfig): 索引設定。
+        build (Optional[Callable[[IndexConfig, str], Any]]): 索引檔不存在時用來建置並保存索引的函數，
+            以 (設定, 標籤) 呼叫。
+        label (str): 節點標籤。
+
+    Returns:
+        ResidentIndex: 同一標籤、同一設定在行程內只會有一個。config 為 None 或名稱時只在第一次呼叫時解析，
+        之後調校結果檔或 KG_FAISS_INDEX 的變動要重新啟動行程才會生效。
+    """
+    named = config is None or isinstance(config, str)
+    if named:
+        resident = _resident_by_name.get((label, config))
+        if resident is not None:
+            return resident
+    resolved = resolve_index_config(config)
+    key = f"{label}:{sorted(resolved.items())!r}"
+    with _resident_lock:
+        if key not in _resident:
+            _resident[key] = ResidentIndex(resolved, build, label=label)
+        if named:
+            _resident_by_name[(label, config)] = _resident[key]
+        return _resident[key]
+
+def print_report(report: List[Dict[str, Any]], k: int) -> None:
+    print(f"{'設定':<12}{f'recall@{k}':>10}{'記憶體(MB)':>12}{'建置(s)':>10}{'延遲(ms)':>10}{'QPS':>10}")
+    for row in report:
+        print(f"{row['name']:<12}{row['recall']:>10.4f}{row['memory_bytes'] / 2 ** 20:>12.2f}"
+              f"{row['build_seconds']:>10.2f}{row['latency_ms']:>10.3f}{row['batch_qps']:>10.0f}")
+
+if __name__ == "__main__":
+    from KG_Graph import get_graph
+    from KG_VectorStore import load_node_vectors
+
+    parser = argparse.ArgumentParser(description="比較各 FAISS 索引設定的召回率、記憶體與延遲")
+    parser.add_argument("--configs", nargs="+", default=[name for name in INDEX_CONFIGS if name != "flat"],
+                        choices=list(INDEX_CONFIGS), help="要比較的索引設定")
+    parser.add_argument("--label", default="Fact", help="向量所屬的節點標籤")
+    parser.add_argument("--k", type=int, default=5, help="recall@k 的 k")
+    parser.add_argument("--queries", type=int, default=200, help="查詢數量")
+    args = parser.parse_args()
+
+    _, vectors = load_node_vectors(get_graph(), args.label)
+    print(f"{args.label}: {len(vectors)} 個向量，維度 {vectors.shape[1]}")
+    print_report(benchmark_configs(vectors, args.configs, args.k, args.queries), args.k)
@@ -0,0 +1,221 @@
+from KG_Index import (INDEX_CONFIGS, TUNED_CONFIG_PATH, apply_search_params, create_index, index_memory,
+                      recall_at_k, resolve_index_config)
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import argparse
+import faiss
+import json
+import numpy as np
+import os
+import time
+
+# 各索引類型要嘗試的建置參數；HNSW 的 efSearch 與 IVF 的 nprobe 只影響查詢，同一個索引直接切換
+HNSW_M_GRID = [16, 32, 48]
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH_GRID = [16, 32, 64, 100, 200, 400]
+IVF_NLIST_GRID = [256, 1024, 4096]
+IVF_NPROBE_GRID = [1, 4, 8, 16, 32, 64, 128]
+# 預設的召回率目標
+TARGET_RECALL = 0.95
+
+def split_queries(embeddings: np.ndarray, num_queries: int = 200, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    從向量中抽出查詢集，其餘作為索引內容。查詢向量不在索引內，近似實際以新案件事實查詢的情況。
+
+    Args:
+        embeddings (np.ndarray): (向量數, 維度) 的 float32 向量。
+        num_queries (int): 查詢數量，最多取向量數的一半。
+        seed (int): 抽樣的亂數種子。
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (索引向量, 查詢向量)。
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    held_out = np.zeros(len(embeddings), dtype=bool)
+    held_out[rng.choice(len(embeddings), size=min(num_queries, len(embeddings) // 2), replace=False)] = True
+    return np.ascontiguousarray(embeddings[~held_out]), np.ascontiguousarray(embeddings[held_out])
+
+def exact_ground_truth(base: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """以暴力搜尋計算每個查詢真正的前 k 名，作為召回率的基準。"""
+    exact = faiss.IndexFlatL2(base.shape[1])
+    exact.add(base)
+    _, truth = exact.search(queries, k)
+    return truth
+
+def build_grid(types: Sequence[str]) -> List[Tuple[Dict[str, Any], str, List[int]]]:
+    """
+    產生要建置的索引設定。
+
+    Args:
+        types (Sequence[str]): INDEX_CONFIGS 中的設定名稱。
+
+    Returns:
+        List[Tuple[Dict[str, Any], str, List[int]]]: (建置設定, 查詢參數名稱, 查詢參數候選值)；
+        flat 沒有查詢參數，候選值為空列表。
+    """
+    grid = []
+    for name in types:
+        config = resolve_index_config(name)
+        if config["type"] in ("hnsw_flat", "hnsw_sq"):
+            for m in HNSW_M_GRID:
+                grid.append(({**config, "M": m, "ef_construction": HNSW_EF_CONSTRUCTION},
+                             "ef_search", HNSW_EF_SEARCH_GRID))
+        elif config["type"] == "ivf_pq":
+            for nlist in IVF_NLIST_GRID:
+                grid.append(({**config, "nlist": nlist}, "nprobe", IVF_NPROBE_GRID))
+        else:
+            grid.append((config, "", []))
+    return grid
+
+def measure(index: faiss.Index, queries: np.ndarray, truth: np.ndarray) -> Dict[str, float]:
+    """
+    逐筆查詢並量測延遲，回傳 recall（recall@k）、p50_ms 及 p99_ms。
+    """
+    k = truth.shape[1]
+    index.search(queries[:1], k)  # 暖機，不計入延遲
+    results = np.empty_like(truth)
+    latencies = np.empty(len(queries))
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        _, results[i:i + 1] = index.search(query[None, :], k)
+        latencies[i] = time.perf_counter() - start
+    return {
+        "recall": recall_at_k(results, truth),
+        "p50_ms": float(np.percentile(latencies, 50)) * 1000,
+        "p99_ms": float(np.percentile(latencies, 99)) * 1000,
+    }
+
+def sweep(base: np.ndarray, queries: np.ndarray, truth: np.ndarray,
+          types: Sequence[str] = ("hnsw_flat", "hnsw_sq8", "ivf_pq")) -> List[Dict[str, Any]]:
+    """
+    逐一建置各設定，並在同一個索引上掃過查詢參數，量測召回率、延遲、建置時間與記憶體。
+
+    Args:
+        base (np.ndarray): 索引向量。
+        queries (np.ndarray): 查詢向量。
+        truth (np.ndarray): exact_ground_truth 的結果。
+        types (Sequence[str]): 要嘗試的索引設定名稱。
+
+    Returns:
+        List[Dict[str, Any]]: 每組參數一筆，含 config（完整索引設定）、recall、p50_ms、p99_ms、
+        build_seconds 及 memory_bytes。無法以這些向量建立的設定會被略過。
+    """
+    rows = []
+    built = set()
+    for config, param, values in build_grid(types):
+        start = time.perf_counter()
+        try:
+            index = create_index(config, base)
+        except ValueError as e:
+            print(f"略過 {config['name']}：{e}")
+            continue
+        build_seconds = time.perf_counter() - start
+        memory_bytes = index_memory(index)
+        if param == "nprobe":
+            # 資料較少時 create_index 會減少 nlist，記錄實際的 nlist，並略過大於 nlist 的 nprobe
+            nlist = faiss.extract_index_ivf(index).nlist
+            config = {**config, "nlist": nlist}
+            values = [value for value in values if value <= nlist]
+        if describe(config) in built:
+            continue
+        built.add(describe(config))
+        for value in values or [None]:
+            tuned = config if value is None else {**config, param: value}
+            apply_search_params(index, tuned)
+            rows.append({"config": tuned, **measure(index, queries, truth),
+                         "build_seconds": build_seconds, "memory_bytes": memory_bytes})
+    return rows
+
+def pareto_front(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    回傳不被其他設定支配的設定：沒有其他設定在召回率、p99 延遲與記憶體三者上都不差且至少一項更好。
+    """
+    def dominates(a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+        no_worse = a["recall"] >= b["recall"] and a["p99_ms"] <= b["p99_ms"] and a["memory_bytes"] <= b["memory_bytes"]
+        better = a["recall"] > b["recall"] or a["p99_ms"] < b["p99_ms"] or a["memory_bytes"] < b["memory_bytes"]
+        return no_worse and better
+
+    return [row for row in rows if not any(dominates(other, row) for other in rows)]
+
+def choose_config(rows: List[Dict[str, Any]], target_recall: float = TARGET_RECALL) -> Optional[Dict[str, Any]]:
+    """
+    從 Pareto 前緣中選出達到召回率目標且 p99 延遲最低的設定（延遲相同時取記憶體較小者）；
+    沒有設定達到目標時取召回率最高者。
+
+    Args:
+        rows (List[Dict[str, Any]]): sweep 的結果。
+        target_recall (float): recall@k 目標。
+
+    Returns:
+        Optional[Dict[str, Any]]: 選出的一筆結果；rows 為空時為 None。
+    """
+    front = pareto_front(rows)
+    if not front:
+        return None
+    qualified = [row for row in front if row["recall"] >= target_recall]
+    if qualified:
+        return min(qualified, key=lambda row: (row["p99_ms"], row["memory_bytes"]))
+    return max(front, key=lambda row: (row["recall"], -row["p99_ms"]))
+
+def describe(config: Dict[str, Any]) -> str:
+    """以設定名稱及與預設值不同的參數描述設定，例如 hnsw_flat M=48 ef_search=64。"""
+    params = {key: value for key, value in config.items()
+              if key not in ("name", "type") and INDEX_CONFIGS[config["name"]].get(key) != value}
+    return " ".join([config["name"]] + [f"{key}={value}" for key, value in params.items()])
+
+def save_tuned_config(row: Dict[str, Any], k: int, target_recall: float, path: str = TUNED_CONFIG_PATH) -> None:
+    """
+    將選出的設定寫入調校結果檔，之後 KG_Index 以它作為預設的索引設定（KG_FAISS_INDEX 未設定時）。
+
+    Args:
+        row (Dict[str, Any]): choose_config 選出的結果。
+        k (int): recall@k 的 k。
+        target_recall (float): 調校時的召回率目標。
+        path (str): 調校結果檔路徑。
+    """
+    metrics = {key: value for key, value in row.items() if key != "config"}
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump({"config": row["config"], "k": k, "target_recall": target_recall, "metrics": metrics,
+                   "tuned_at": time.strftime("%Y-%m-%d %H:%M:%S")}, f, ensure_ascii=False, indent=2)
+    os.replace(f"{path}.tmp", path)
+
+def print_sweep(rows: List[Dict[str, Any]], k: int, chosen: Optional[Dict[str, Any]] = None) -> None:
+    front = {id(row) for row in pareto_front(rows)}
+    print(f"  {'設定':<44}{f'recall@{k}':>10}{'p50(ms)':>10}{'p99(ms)':>10}{'建置(s)':>10}{'記憶體(MB)':>12}")
+    for row in sorted(rows, key=lambda row: (row["config"]["name"], -row["recall"])):
+        mark = ">" if row is chosen else "*" if id(row) in front else " "
+        print(f"{mark} {describe(row['config']):<44}{row['recall']:>10.4f}{row['p50_ms']:>10.3f}"
+              f"{row['p99_ms']:>10.3f}{row['build_seconds']:>10.2f}{row['memory_bytes'] / 2 ** 20:>12.2f}")
+    print("* Pareto 前緣，> 選出的設定")
+
+if __name__ == "__main__":
+    from KG_Graph import get_graph
+    from KG_VectorStore import load_node_vectors
+
+    parser = argparse.ArgumentParser(description="以實際向量調校 FAISS 索引參數，並寫回預設的索引設定")
+    parser.add_argument("--types", nargs="+", default=["hnsw_flat", "hnsw_sq8", "ivf_pq"],
+                        choices=list(INDEX_CONFIGS), help="要嘗試的索引設定")
+    parser.add_argument("--label", default="Fact", help="向量所屬的節點標籤")
+    parser.add_argument("--k", type=int, default=5, help="recall@k 的 k")
+    parser.add_argument("--queries", type=int, default=500, help="保留作為查詢的向量數量")
+    parser.add_argument("--target-recall", type=float, default=TARGET_RECALL, help="recall@k 目標")
+    parser.add_argument("--output", default=TUNED_CONFIG_PATH, help="調校結果檔路徑")
+    parser.add_argument("--dry-run", action="store_true", help="只輸出報告，不寫入調校結果檔")
+    args = parser.parse_args()
+
+    _, vectors = load_node_vectors(get_graph(), args.label)
+    base, queries = split_queries(vectors, args.queries)
+    print(f"{args.label}: 索引 {len(base)} 個向量，查詢 {len(queries)} 個，維度 {vectors.shape[1]}")
+    truth = exact_ground_truth(base, queries, args.k)
+    rows = sweep(base, queries, truth, args.types)
+    chosen = choose_config(rows, args.target_recall)
+    print_sweep(rows, args.k, chosen)
+    if chosen is None:
+        print("沒有可用的索引設定")
+    else:
+        if chosen["recall"] < args.target_recall:
+            print(f"沒有設定達到 recall@{args.k} >= {args.target_recall}，改取召回率最高者")
+        print(f"選出：{describe(chosen['config'])}")
+        if not args.dry_run:
+            save_tuned_config(chosen, args.k, args.target_recall, args.output)
+            print(f"已寫入 {args.output}，請以 python KG_Faiss_Query.py --rebuild 重建索引套用建置參數")
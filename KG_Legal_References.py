@@ -1,9 +1,7 @@
-from KG_Faiss_Query import get_legal, fetch_statutes_and_explanations  # 從外部模組導入查詢法條及相關資訊的函式
+from KG_Faiss_Query import get_legal_with_explanations  # 從外部模組導入查詢法條及相關資訊的函式
+from KG_StatuteRanking import format_statute  # 法條放入提示詞的格式（與 token 上限的估計一致）
 import re  # 用於正則表達式操作
-from langchain.chains import LLMChain  # 用於執行 LLM 鏈的核心模組
-from langchain.prompts import PromptTemplate  # 用於定義提示模板
-from langchain_ollama import OllamaLLM  # 用於調用 Ollama 模型的模組
-from typing import Dict, List  # 用於型別註解
+from typing import Any, Dict, List, Optional  # 用於型別註解
 
 # 使用者輸入的範例數據
 user_data: str = """
@@ -31,10 +29,10 @@ user_data: str = """
 4. 原告乙○○大學畢業，現在豐年豐和企業股份有限公司上班，月薪約30,000元左右，名下無不動產；原告丙○○為二專畢業，受傷之前的月薪約34,000元左右，名下有汽車1輛，無不動產。
 """
 
-# 定義提示模板，用於生成法律參考判斷的指引
-prompt: PromptTemplate = PromptTemplate(
-    input_variables=["case_facts", "injury_details", "compensation_request", "statutes_with_explanations"],
-    template="""你是一位專業的台灣律師，以下是案件的相關資料及可能需要引用的法條資訊，請根據這些資訊提供起訴書所需的法條引用。
+# 定義提示模板的變數與文字，用於生成法律參考判斷的指引；PromptTemplate 物件（prompt）在第一次取用時才建立，
+# 匯入本模組不會載入 langchain
+PROMPT_VARIABLES: List[str] = ["case_facts", "injury_details", "compensation_request", "statutes_with_explanations"]
+PROMPT_TEXT: str = """你是一位專業的台灣律師，以下是案件的相關資料及可能需要引用的法條資訊，請根據這些資訊提供起訴書所需的法條引用。
 ### 案件事實
 {case_facts}
 ### 受傷情形
@@ -51,7 +49,28 @@ prompt: PromptTemplate = PromptTemplate(
   - 民法第xxx條
     條文
 """
-)
+
+_prompt: Optional[Any] = None
+
+def get_prompt() -> Any:
+    """
+    取得法律參考判斷的提示模板，第一次呼叫時才匯入 langchain 並建立。
+
+    Returns:
+        Any: 以 PROMPT_VARIABLES 與 PROMPT_TEXT 建立的 langchain PromptTemplate。
+    """
+    global _prompt
+    if _prompt is None:
+        from langchain.prompts import PromptTemplate  # 用於定義提示模板
+
+        _prompt = PromptTemplate(input_variables=PROMPT_VARIABLES, template=PROMPT_TEXT)
+    return _prompt
+
+def __getattr__(name: str) -> Any:
+    # 讓模組屬性 prompt 維持為 PromptTemplate，在第一次存取時才建立
+    if name == "prompt":
+        return get_prompt()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def split_input(user_input: str) -> Dict[str, str]:
     """
@@ -82,20 +101,19 @@ def parse_legal_references(legal_references: str) -> List[str]:
     """
     return legal_references.split("\n")
 
-def get_statutes_and_explanation(user_data: str) -> List[Dict[str, str]]:
+def get_statutes_and_explanation(user_data: str) -> List[Dict[str, Any]]:
     """
-    根據使用者數據獲取相關法條和口語化解釋。
+    根據使用者數據獲取相關法條和口語化解釋（相似事實的引用法條與法條內容以單一次圖譜查詢取得），
+    依相似案件的加權投票由高到低排序，並只保留放得進 KG_STATUTE_TOKEN_BUDGET 的前幾條。
 
     Args:
         user_data (str): 使用者提供的案件資料。
 
     Returns:
-        List[Dict[str, str]]: 包含法條 ID、條文和口語化解釋的列表。
+        List[Dict[str, Any]]: 包含法條 ID、條文、口語化解釋和分數的列表。
     """
     input_data = split_input(user_data)
-    legal_ref = get_legal(input_data["case_facts"], input_data["injury_details"])
-    legal_list = parse_legal_references(legal_ref)
-    return fetch_statutes_and_explanations(legal_list)
+    return get_legal_with_explanations(input_data["case_facts"], input_data["injury_details"])
 
 def format_statutes_and_explanations(statutes_with_explanations: List[Dict[str, str]]) -> str:
     """
@@ -107,10 +125,7 @@ def format_statutes_and_explanations(statutes_with_explanations: List[Dict[str,
     Returns:
         str: 格式化的字符串。
     """
-    return "\n".join(
-        f"法條: {statute['statute_id']}\n條文: {statute['statute_text']}\n口語化解釋: {statute['explanation_text']}"
-        for statute in statutes_with_explanations
-    )
+    return "\n".join(format_statute(statute) for statute in statutes_with_explanations)
 
 def generate_legal_reference(user_data: str) -> str:
     """
@@ -122,6 +137,9 @@ def generate_legal_reference(user_data: str) -> str:
     Returns:
         str: 包含建議法律引用的文本。
     """
+    from langchain.chains import LLMChain  # 用於執行 LLM 鏈的核心模組
+    from langchain_ollama import OllamaLLM  # 用於調用 Ollama 模型的模組
+
     statutes_with_explanations = get_statutes_and_explanation(user_data)
     statutes_with_explanations_str = format_statutes_and_explanations(statutes_with_explanations)
     input_data = split_input(user_data)
@@ -133,7 +151,7 @@ def generate_legal_reference(user_data: str) -> str:
         num_predict=len(user_data) + 200
     )
 
-    llm_chain = LLMChain(llm=llm, prompt=prompt)
+    llm_chain = LLMChain(llm=llm, prompt=get_prompt())
     return llm_chain.run({
         "case_facts": input_data["case_facts"],
         "injury_details": input_data["injury_details"],
@@ -0,0 +1,293 @@
+from KG_MetadataStore import open_sections, write_sections
+from dotenv import load_dotenv
+from typing import List, Optional, Sequence, Tuple
+import argparse
+import numpy as np
+import os
+import time
+
+# 加載 .env 文件中的環境變數
+load_dotenv()
+
+# 建立詞彙索引的節點標籤（文本較長、用語精確的事實與案件）
+LEXICAL_LABELS = ["Fact", "Case"]
+# BM25 參數
+BM25_K1 = 1.2
+BM25_B = 0.75
+# 出現在超過這個比例文件中的常見詞項（例如「被告」「原告」）idf 很低，查詢時略過以免讀取很長的倒排列表
+STOP_TERM_RATIO = float(os.getenv("KG_LEXICAL_STOP_RATIO", "0.5"))
+
+def _char_codes(texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    將文本轉為 Unicode 碼位陣列，並回傳每個位置所屬的文本下標。文本之間以 0 分隔。
+    全形英數字轉為半形、英文字母轉為小寫；非中文字、英數字的位置設為 0。
+    """
+    joined = "\0".join(texts)
+    codes = np.frombuffer(joined.encode("utf-32-le"), dtype=np.uint32).copy()
+    owners = np.repeat(np.arange(len(texts), dtype=np.int32), [len(text) + 1 for text in texts])[:len(codes)]
+    fullwidth = (codes >= 0xFF01) & (codes <= 0xFF5E)
+    codes[fullwidth] -= 0xFEE0
+    upper = (codes >= 0x41) & (codes <= 0x5A)
+    codes[upper] += 0x20
+    valid = (((codes >= 0x4E00) & (codes <= 0x9FFF)) | ((codes >= 0x3400) & (codes <= 0x4DBF))
+             | ((codes >= 0x30) & (codes <= 0x39)) | ((codes >= 0x61) & (codes <= 0x7A)))
+    codes[~valid] = 0
+    return codes, owners
+
+def bigram_terms(texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    取出所有文本中相鄰兩字（中文字或英數字）的二元組，不跨越標點、空白或文本邊界。
+
+    Args:
+        texts (Sequence[str]): 文本列表。
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: 每個二元組的 uint64 詞項（前字碼位 << 32 | 後字碼位），
+        以及其所屬文本的下標（int32）。
+    """
+    codes, owners = _char_codes(texts)
+    if len(codes) < 2:
+        return np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.int32)
+    pairs = (codes[:-1] != 0) & (codes[1:] != 0)
+    terms = (codes[:-1][pairs].astype(np.uint64) << np.uint64(32)) | codes[1:][pairs].astype(np.uint64)
+    return terms, owners[:-1][pairs]
+
+def _run_starts(*keys: np.ndarray) -> np.ndarray:
+    """回傳排序後的鍵中每段相同值的起始位置。"""
+    changed = np.zeros(max(len(keys[0]) - 1, 0), dtype=bool)
+    for key in keys:
+        changed |= key[1:] != key[:-1]
+    return np.flatnonzero(np.concatenate([np.ones(min(len(keys[0]), 1), dtype=bool), changed]))
+
+def _lexical_sections(texts: Sequence[str], base: Optional["LexicalIndex"], k1: float,
+                      b: float) -> List[Tuple[str, np.ndarray]]:
+    """
+    計算 texts 的倒排記錄。提供 base 時文件編號接在 base 之後，idf 與平均文件長度以 base 加上 texts 計算。
+    """
+    first_doc = len(base) if base is not None else 0
+    terms, docs = bigram_terms(texts)
+    order = np.lexsort((docs, terms))
+    terms, docs = terms[order], docs[order]
+
+    # 同一 (詞項, 文件) 合併為一筆倒排記錄，詞頻為重複次數
+    starts = _run_starts(terms, docs)
+    tf = np.diff(np.append(starts, len(terms))).astype(np.float64)
+    posting_terms, posting_docs = terms[starts], docs[starts]
+    term_starts = _run_starts(posting_terms)
+    vocab = posting_terms[term_starts]
+    offsets = np.append(term_starts, len(posting_terms)).astype(np.int64)
+
+    df = np.diff(offsets)
+    doc_lengths = np.bincount(docs, minlength=len(texts)).astype(np.int32)
+    count, total_length = len(texts), int(doc_lengths.sum())
+    if base is not None:
+        count += len(base)
+        total_length += int(base.doc_lengths.sum())
+        df = df + base.document_frequency(vocab)
+    avgdl = max(total_length / count if count else 0.0, 1.0)
+    idf = np.log1p((count - df + 0.5) / (df + 0.5))
+    norm = k1 * (1 - b + b * doc_lengths[posting_docs] / avgdl)
+    scores = np.repeat(idf, np.diff(offsets)) * tf * (k1 + 1) / (tf + norm)
+
+    return [
+        ("vocab", vocab),
+        ("offsets", offsets),
+        ("docs", (posting_docs + first_doc).astype(np.int32)),
+        ("scores", scores.astype(np.float32)),
+        ("doc_lengths", doc_lengths),
+        ("first_doc", np.array([first_doc], dtype=np.int64)),
+    ]
+
+def write_lexical_index(path: str, texts: Sequence[str], k1: float = BM25_K1, b: float = BM25_B) -> None:
+    """
+    以中文二元組建立倒排索引並寫入檔案（KG_MetadataStore.write_sections 格式）。
+    文件編號即 texts 的下標，與同一組 FAISS 索引的 ID 相同。
+
+    每個詞項的倒排列表存放文件編號及該詞項對該文件的 BM25 分數（idf 與詞頻正規化在建置時算好），
+    查詢時只需要把命中詞項的分數依文件加總。
+
+    Args:
+        path (str): 索引檔路徑。
+        texts (Sequence[str]): 文件文本。
+        k1 (float): BM25 的 k1。
+        b (float): BM25 的 b。
+    """
+    write_sections(path, _lexical_sections(texts, None, k1, b))
+
+def write_lexical_delta(path: str, base: "LexicalIndex", texts: Sequence[str],
+                        k1: float = BM25_K1, b: float = BM25_B) -> None:
+    """
+    將增量加入的文件寫成接在主索引之後的附加段，不必重建主索引。
+    附加段的 idf 與平均文件長度以主索引加上新文件計算；主索引的分數維持建置時的值，
+    直到下次整個重建（壓縮）時才一併更新。刪除的文件由查詢時的 exclude 排除。
+
+    Args:
+        path (str): 附加段檔案路徑。
+        base (LexicalIndex): 只含主索引的詞彙索引，新文件的編號從 len(base) 開始。
+        texts (Sequence[str]): 主索引之後的所有文件文本（包括先前增量加入的）。
+        k1 (float): BM25 的 k1。
+        b (float): BM25 的 b。
+    """
+    write_sections(path, _lexical_sections(texts, base, k1, b))
+
+class LexicalIndex:
+    """
+    以記憶體映射開啟的二元組倒排索引，查詢以 BM25 排序。
+    詞項表為排序過的 uint64 陣列，以 np.searchsorted 查找；命中詞項的倒排列表以 np.bincount 依文件加總。
+    增量更新的文件存放在附加段（write_lexical_delta），查詢時與主索引的分數一起加總。
+    """
+
+    def __init__(self, path: str, delta_path: Optional[str] = None):
+        self.path = path
+        self.mmap, sections = open_sections(path)
+        self.vocab: np.ndarray = sections["vocab"]
+        self.offsets: np.ndarray = sections["offsets"]
+        self.docs: np.ndarray = sections["docs"]
+        self.scores: np.ndarray = sections["scores"]
+        self.doc_lengths: np.ndarray = sections["doc_lengths"]
+        self.first_doc = int(sections["first_doc"][0]) if "first_doc" in sections else 0
+        self.delta: Optional[LexicalIndex] = None
+        if delta_path is not None and os.path.exists(delta_path):
+            delta = LexicalIndex(delta_path)
+            # 主索引重建後舊的附加段不再成對，直接忽略
+            if delta.first_doc == len(self):
+                self.delta = delta
+
+    def __len__(self) -> int:
+        end = self.first_doc + len(self.doc_lengths)
+        return len(self.delta) if self.delta is not None else end
+
+    def _positions(self, terms: np.ndarray) -> np.ndarray:
+        """回傳各詞項在詞項表中的位置，不存在的詞項為 -1。"""
+        if not len(self.vocab):
+            return np.full(len(terms), -1, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self.vocab, terms), len(self.vocab) - 1)
+        return np.where(self.vocab[positions] == terms, positions, -1)
+
+    def document_frequency(self, terms: np.ndarray) -> np.ndarray:
+        """回傳各詞項在本段（不含附加段）出現的文件數。"""
+        positions = self._positions(terms)
+        found = positions >= 0
+        df = np.zeros(len(terms), dtype=np.int64)
+        df[found] = self.offsets[positions[found] + 1] - self.offsets[positions[found]]
+        return df
+
+    def search(self, text: str, k: int, exclude: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        以 BM25 查詢文本。
+
+        Args:
+            text (str): 查詢文本。
+            k (int): 返回的文件數量。
+            exclude (Optional[np.ndarray]): 要排除的文件編號（例如 FAISS 索引中已刪除的 ID）。
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: 依分數由高到低的文件編號（int64）與 BM25 分數（float32），
+            只包含至少命中一個詞項的文件，可能少於 k 個。
+        """
+        return self.search_batch([text], k, exclude)[0]
+
+    def search_batch(self, texts: List[str], k: int,
+                     exclude: Optional[np.ndarray] = None) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        查詢多個文本，回傳與輸入順序相同的 search 結果。所有查詢的二元組一次切出，
+        並以單一次 searchsorted 在詞項表中查找，之後才逐筆加總分數。
+        """
+        terms, owners = bigram_terms(texts)
+        empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+        if not len(terms):
+            return [empty for _ in texts]
+        # 同一查詢中重複的詞項只計一次
+        order = np.lexsort((terms, owners))
+        unique = _run_starts(owners[order], terms[order])
+        terms, owners = terms[order][unique], owners[order][unique]
+
+        segments = [self] if self.delta is None else [self, self.delta]
+        positions = [segment._positions(terms) for segment in segments]
+        df = sum(segment.document_frequency(terms) for segment in segments)
+        matched = df > 0
+        # 常見詞項略過；某個查詢只命中常見詞項時仍保留它們
+        common = df > STOP_TERM_RATIO * len(self)
+        has_rare = np.bincount(owners[matched & ~common], minlength=len(texts)) > 0
+        used = matched & (~common | ~has_rare[owners])
+
+        results = []
+        for query in range(len(texts)):
+            selected = used & (owners == query)
+            if not selected.any():
+                results.append(empty)
+                continue
+            totals = np.zeros(len(self))
+            for segment, found in zip(segments, positions):
+                found = found[selected & (found >= 0)]
+                if not len(found):
+                    continue
+                starts, ends = segment.offsets[found], segment.offsets[found + 1]
+                docs = np.concatenate([segment.docs[start:end] for start, end in zip(starts, ends)])
+                scores = np.concatenate([segment.scores[start:end] for start, end in zip(starts, ends)])
+                totals += np.bincount(docs, weights=scores, minlength=len(self))
+            results.append(_top_k(totals, k, exclude))
+        return results
+
+def _top_k(totals: np.ndarray, k: int, exclude: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """回傳分數最高且大於 0 的 k 個文件編號與分數。"""
+    if exclude is not None and len(exclude):
+        totals[exclude] = 0.0
+    # 對負分數取最小的 k 個；大多數文件為 0 分時，直接取最大的 k 個會退化得很慢
+    negated = -totals
+    hits = np.argpartition(negated, k)[:k] if k < len(negated) else np.arange(len(negated))
+    hits = hits[np.argsort(negated[hits], kind="stable")]
+    hits = hits[totals[hits] > 0]
+    return hits.astype(np.int64), totals[hits].astype(np.float32)
+
+def benchmark(texts: List[str], k: int = 50, num_queries: int = 500, seed: int = 0) -> None:
+    """
+    量測建置時間與查詢延遲。查詢取自文本中隨機的片段（20 到 60 字）。
+
+    Args:
+        texts (List[str]): 文件文本。
+        k (int): 每個查詢返回的文件數量。
+        num_queries (int): 查詢數量。
+        seed (int): 抽樣的亂數種子。
+    """
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "benchmark.lex")
+        start = time.perf_counter()
+        write_lexical_index(path, texts)
+        build_seconds = time.perf_counter() - start
+        index = LexicalIndex(path)
+        print(f"{len(texts)} 篇文件，{len(index.vocab)} 個詞項，{len(index.docs)} 筆倒排記錄，"
+              f"檔案 {os.path.getsize(path) / 2 ** 20:.2f} MB，建置 {build_seconds:.2f} 秒")
+
+        rng = np.random.default_rng(seed)
+        queries = []
+        for i in rng.integers(0, len(texts), num_queries):
+            length = int(rng.integers(20, 61))
+            offset = int(rng.integers(0, max(1, len(texts[i]) - length)))
+            queries.append(texts[i][offset:offset + length])
+        index.search(queries[0], k)  # 暖機，不計入延遲
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            index.search(query, k)
+            latencies.append(time.perf_counter() - start)
+        latencies = np.array(latencies) * 1000
+        print(f"BM25 查詢（k={k}）：p50 {np.percentile(latencies, 50):.3f} ms，"
+              f"p99 {np.percentile(latencies, 99):.3f} ms，最大 {latencies.max():.3f} ms")
+        del index
+
+if __name__ == "__main__":
+    from KG_Index import index_paths
+    from KG_MetadataStore import FactMetadata
+
+    parser = argparse.ArgumentParser(description="二元組 BM25 詞彙索引的建置時間與查詢延遲")
+    parser.add_argument("--label", default="Fact", choices=LEXICAL_LABELS, help="節點標籤")
+    parser.add_argument("--config", default=None, help="索引設定名稱（文件取自該設定的元數據）")
+    parser.add_argument("--k", type=int, default=50, help="每個查詢返回的文件數量")
+    parser.add_argument("--queries", type=int, default=500, help="查詢數量")
+    args = parser.parse_args()
+
+    metadata = FactMetadata(index_paths(args.config, args.label)["metadata"])
+    benchmark(list(metadata.fact_texts), args.k, args.queries)
@@ -0,0 +1,179 @@
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+import json
+import mmap
+import numpy as np
+import os
+
+# 檔案開頭的識別碼及版本
+MAGIC = b"KGMETA01"
+# 各區段的起始位置對齊的位元組數
+ALIGNMENT = 64
+
+class StringColumn:
+    """
+    以 offsets 陣列加上 UTF-8 位元組區塊存放的字串欄位，第 i 個字串為 blob[offsets[i]:offsets[i + 1]]。
+    直接建立在記憶體映射上，取用第 i 個字串時才解碼，可以像唯讀列表一樣以下標取值。
+    """
+
+    def __init__(self, offsets: np.ndarray, blob: Union[memoryview, bytes]):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return bytes(self.blob[int(self.offsets[i]):int(self.offsets[i + 1])]).decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self[i]
+
+def encode_strings(values: Sequence[str]) -> Tuple[np.ndarray, bytes]:
+    """
+    將字串列表編碼為 (offsets, UTF-8 blob)。
+
+    Args:
+        values (Sequence[str]): 字串列表。
+
+    Returns:
+        Tuple[np.ndarray, bytes]: 長度為 len(values) + 1 的 int64 offsets 及串接後的位元組。
+    """
+    encoded = [value.encode("utf-8") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    return offsets, b"".join(encoded)
+
+# 區段內容：numpy 陣列，或依序寫入的多段位元組（讀出時為 memoryview）
+Section = Union[np.ndarray, List[Union[bytes, memoryview]]]
+
+def open_sections(path: str) -> Tuple[mmap.mmap, Dict[str, Any]]:
+    """
+    以記憶體映射開啟 write_sections 寫入的檔案，只解析標頭，不複製各區段的內容。
+
+    Args:
+        path (str): 檔案路徑。
+
+    Returns:
+        Tuple[mmap.mmap, Dict[str, Any]]: 記憶體映射，以及區段名稱對應唯讀的 numpy 陣列或 memoryview。
+    """
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if mapped[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} 不是 KG_MetadataStore 格式的檔案")
+    header_length = int.from_bytes(mapped[len(MAGIC):len(MAGIC) + 8], "little")
+    start = len(MAGIC) + 8
+    header = json.loads(mapped[start:start + header_length].decode("utf-8"))
+    view = memoryview(mapped)
+    sections: Dict[str, Any] = {}
+    for name, (offset, dtype, shape) in header["sections"].items():
+        if dtype == "bytes":
+            sections[name] = view[offset:offset + shape[0]]
+        else:
+            count = int(np.prod(shape))
+            sections[name] = np.frombuffer(mapped, dtype=dtype, count=count, offset=offset).reshape(shape)
+    return mapped, sections
+
+def write_sections(path: str, sections: Sequence[Tuple[str, Section]]) -> None:
+    """
+    將多個具名區段寫入單一檔案：識別碼、JSON 標頭（各區段的位置、型別與形狀），之後是對齊的各區段。
+    先寫入暫存檔再替換，讀取端不會看到寫到一半的檔案。
+
+    Args:
+        path (str): 檔案路徑。
+        sections (Sequence[Tuple[str, Section]]): (區段名稱, 內容)。
+    """
+    # 先以估計的標頭長度排版，標頭變長時以新的長度重新排版，變短時以空白補齊
+    header_size = 0
+    while True:
+        offset = _align(len(MAGIC) + 8 + header_size)
+        layout = {}
+        for name, data in sections:
+            if isinstance(data, list):
+                size = sum(len(part) for part in data)
+                layout[name] = [offset, "bytes", [size]]
+            else:
+                size = data.nbytes
+                layout[name] = [offset, data.dtype.str, list(data.shape)]
+            offset = _align(offset + size)
+        header = json.dumps({"sections": layout}).encode("utf-8")
+        if len(header) <= header_size:
+            header = header.ljust(header_size)
+            break
+        header_size = len(header)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(len(header).to_bytes(8, "little"))
+        f.write(header)
+        for name, data in sections:
+            f.write(b"\0" * (layout[name][0] - f.tell()))
+            for part in (data if isinstance(data, list) else [np.ascontiguousarray(data)]):
+                f.write(part)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+class FactMetadata:
+    """
+    索引的事實元數據：fact_ids、fact_texts 兩個字串欄位，以及增量更新用的 versions（(列號, 版本)）與 deleted。
+
+    全部存在單一檔案中：識別碼、JSON 標頭（各區段的位置、型別與形狀），之後是對齊的各區段。
+    開啟時只讀標頭並建立記憶體映射，載入時間與記憶體用量不隨事實文本總量增加；
+    查詢時只解碼命中的事實 ID 與文本，不需要 pickle。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.mmap, self.sections = open_sections(path)
+        self.fact_ids = StringColumn(self.sections["ids_offsets"], self.sections["ids_blob"])
+        self.fact_texts = StringColumn(self.sections["texts_offsets"], self.sections["texts_blob"])
+        self.versions: np.ndarray = self.sections["versions"]
+        self.deleted: np.ndarray = self.sections["deleted"]
+
+    def __len__(self) -> int:
+        return len(self.fact_ids)
+
+def write_metadata(path: str, fact_ids: Sequence[str], fact_texts: Sequence[str],
+                   versions: Union[Sequence[Sequence[int]], np.ndarray], deleted: Sequence[int] = (),
+                   base: Optional[FactMetadata] = None) -> None:
+    """
+    寫入事實元數據（write_sections 格式）。
+
+    Args:
+        path (str): 元數據檔路徑。
+        fact_ids (Sequence[str]): 事實節點 ID；提供 base 時為接在 base 之後新增的事實。
+        fact_texts (Sequence[str]): 與 fact_ids 對應的事實文本。
+        versions (Union[Sequence[Sequence[int]], np.ndarray]): 與 fact_ids 對應的 (向量列號, 向量版本)。
+        deleted (Sequence[int]): 所有已刪除事實的下標（包含 base 中的）。
+        base (Optional[FactMetadata]): 增量更新時的原元數據，其內容以原始位元組複製，不需要解碼。
+    """
+    ids_offsets, ids_blob = encode_strings(fact_ids)
+    texts_offsets, texts_blob = encode_strings(fact_texts)
+    versions = np.asarray(versions, dtype=np.int64).reshape(-1, 2)
+    if base is not None:
+        ids_offsets = np.concatenate([base.fact_ids.offsets, ids_offsets[1:] + base.fact_ids.offsets[-1]])
+        texts_offsets = np.concatenate([base.fact_texts.offsets, texts_offsets[1:] + base.fact_texts.offsets[-1]])
+        versions = np.concatenate([base.versions, versions])
+        ids_blob = [base.fact_ids.blob, ids_blob]
+        texts_blob = [base.fact_texts.blob, texts_blob]
+    else:
+        ids_blob = [ids_blob]
+        texts_blob = [texts_blob]
+
+    write_sections(path, [
+        ("ids_offsets", ids_offsets),
+        ("ids_blob", ids_blob),
+        ("texts_offsets", texts_offsets),
+        ("texts_blob", texts_blob),
+        ("versions", versions),
+        ("deleted", np.asarray(sorted(deleted), dtype=np.int64)),
+    ])
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
@@ -0,0 +1,291 @@
+from KG_Citation import CitationExtractor
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+import hashlib
+import re
+
+# 每次從檔案讀取的字元數
+READ_CHUNK_SIZE = 1 << 20
+# 平行解析時每個工作單位包含的案件數量
+PARSE_CHUNK_SIZE = 256
+
+STATUTE_PATTERN = re.compile(r"第 (\d+-?\d*) 條\n(.*?)\n口語化解釋:\s*(.*)", re.S)
+CASE_PATTERN = re.compile(r'一、(.*?)二、(.*)', re.S)
+COMPENSATION_PATTERN = re.compile(r'\（\s*一\s*\）')
+# Handle both half-width and full-width brackets
+COMP_ITEM_PATTERN = re.compile(r'[（(]([^）)]+)[）)]\s*(.*?)(?=[（(]\w+[）)]|$)', re.S)
+
+# 帶有 id 與 text 的節點標籤，依父節點先於子節點的順序排列
+HASHED_LABELS = ["Statute", "Explanation", "Case", "Fact", "LegalReference", "Compensation", "CompensationItem"]
+CASE_LABELS = HASHED_LABELS[2:]
+
+# 錨點節點：標籤對應 name 屬性
+ANCHORS: Dict[str, str] = {
+    "LawNode": "起訴書相關法條",
+    "ReferenceNode": "參考用判決書",
+    "ReferenceData": "參考資料",
+}
+# 錨點節點之間的關係：(起點標籤, 終點標籤, 關係類型)
+ANCHOR_RELATIONS = [
+    ("ReferenceData", "LawNode", "中華民國民法法條"),
+    ("ReferenceData", "ReferenceNode", "範例判決書"),
+]
+
+# 各標籤節點的父節點標籤及關係類型；Statute 與 Case 的父節點是錨點節點
+PARENT_RELATIONS: Dict[str, Tuple[str, str]] = {
+    "Statute": ("LawNode", "相關法條"),
+    "Explanation": ("Statute", "口語化解釋"),
+    "Case": ("ReferenceNode", "參考用資料"),
+    "Fact": ("Case", "案件事實"),
+    "LegalReference": ("Case", "案件相關法條"),
+    "Compensation": ("Case", "賠償"),
+    "CompensationItem": ("Compensation", "細項"),
+}
+
+def parse_statute_section(section: str) -> Optional[Dict[str, str]]:
+    """
+    解析法條文檔中以 \"\"\" 分隔的單一段落。
+
+    Args:
+        section (str): 單一法條段落。
+
+    Returns:
+        Optional[Dict[str, str]]: 包含法條 ID、條文和口語化解釋的字典；段落不是法條時為 None。
+    """
+    match = STATUTE_PATTERN.search(section)
+    if not match:
+        return None
+    return {
+        "id": f"民法第{match.group(1).strip()}條",
+        "text": match.group(2).strip(),
+        "explanation": match.group(3).strip()
+    }
+
+def parse_case(i: int, case: str, extractor: CitationExtractor) -> Optional[Dict[str, Any]]:
+    """
+    解析單一範例案件，回傳建立該案件所有節點所需的資料。
+
+    Args:
+        i (int): 案件在文檔中的序號（從 0 開始），用於產生節點 ID。
+        case (str): 案件全文。
+        extractor (CitationExtractor): citation_extractor 建立的擷取器。
+
+    Returns:
+        Optional[Dict[str, Any]]: 案件、事實、法條、賠償及賠償細項的 ID 與文本，
+        以及法條段落引用已知法條的關係（extract_batch 的結果，同一法條已合併限定語）；格式不符時為 None。
+    """
+    match = CASE_PATTERN.search(case)
+    if not match:
+        return None
+    fact_text = match.group(1).strip()
+    remaining_text = match.group(2).strip()
+    comp_match = COMPENSATION_PATTERN.search(remaining_text)
+    if comp_match:
+        legal_text = remaining_text[:comp_match.start()].strip()
+        compensation_text = remaining_text[comp_match.start():].strip()
+    else:
+        legal_text = remaining_text
+        compensation_text = ""
+
+    comp_items = []
+    if compensation_text:
+        comp_items = [{"id": f"CompItem{i+1}_{j+1}", "text": item_text.strip()}
+                      for j, (item_label, item_text) in enumerate(COMP_ITEM_PATTERN.findall(compensation_text))]
+
+    return {
+        "case_id": f"Case{i+1}",
+        "case_text": case,
+        "fact_id": f"Fact{i+1}",
+        "fact_text": fact_text,
+        "legal_id": f"Legal{i+1}" if legal_text else None,
+        "legal_text": legal_text,
+        "citations": extractor.extract_batch([(f"Legal{i+1}", legal_text)]) if legal_text else [],
+        "comp_id": f"Compensation{i+1}" if compensation_text else None,
+        "comp_text": compensation_text,
+        "comp_items": comp_items
+    }
+
+def iter_sections(file: TextIO, delimiter: str, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[str]:
+    """
+    逐塊讀取文字檔並依分隔符切出段落，結果與 file.read().split(delimiter) 相同，
+    但記憶體用量只與單一段落大小有關。
+
+    Args:
+        file (TextIO): 已開啟的文字檔。
+        delimiter (str): 段落分隔符。
+        chunk_size (int): 每次讀取的字元數。
+
+    Yields:
+        str: 依序切出的段落（包含空段落）。
+    """
+    buffer = ""
+    while True:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            break
+        buffer += chunk
+        parts = buffer.split(delimiter)
+        # 最後一段可能尚未讀完，留到下一塊再處理
+        buffer = parts.pop()
+        yield from parts
+    yield buffer
+
+def iter_statutes(path: str) -> Iterator[Dict[str, str]]:
+    """
+    以串流方式解析法條文檔。
+
+    Args:
+        path (str): 法條文檔路徑。
+
+    Yields:
+        Dict[str, str]: 包含法條 ID、條文和口語化解釋的字典。
+    """
+    with open(path, 'r', encoding='utf-8') as file:
+        for section in iter_sections(file, '"""'):
+            statute = parse_statute_section(section)
+            if statute:
+                yield statute
+
+def iter_case_texts(path: str) -> Iterator[str]:
+    """
+    以串流方式讀出範例案件文檔中以 " 分隔的每一個案件全文。
+
+    Args:
+        path (str): 範例案件文檔路徑。
+
+    Yields:
+        str: 去除前後空白後的案件全文，空段落會被略過。
+    """
+    with open(path, 'r', encoding='utf-8') as file:
+        for section in iter_sections(file, '"'):
+            case = section.strip()
+            if case:
+                yield case
+
+def iter_batches(iterable: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """
+    將可迭代物件依序切成固定大小的列表。
+
+    Args:
+        iterable (Iterable[Any]): 任意可迭代物件。
+        size (int): 每批的大小。
+
+    Yields:
+        List[Any]: 最多 size 個元素的列表。
+    """
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+def _parse_case_chunk(chunk: List[Tuple[int, str]], extractor: CitationExtractor) -> List[Optional[Dict[str, Any]]]:
+    return [parse_case(i, case, extractor) for i, case in chunk]
+
+def citation_extractor(statutes: Iterable[Dict[str, str]]) -> CitationExtractor:
+    """
+    以已知法條建立法條引用擷取器，只有引用這些法條的關係會被建立。
+
+    Args:
+        statutes (Iterable[Dict[str, str]]): iter_statutes 的結果。
+
+    Returns:
+        CitationExtractor: 以法條 ID 建立的擷取器。
+    """
+    return CitationExtractor(statute["id"] for statute in statutes)
+
+def iter_case_records(path: str, extractor: CitationExtractor, workers: int = 0,
+                      chunk_size: int = PARSE_CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+    """
+    以串流方式解析範例案件文檔，可選擇以多個行程平行執行正則解析。
+
+    平行模式下最多同時有 workers * 2 個工作單位在處理中，結果依原始順序輸出，
+    因此記憶體用量固定，且節點 ID 與單行程解析完全相同。
+
+    Args:
+        path (str): 範例案件文檔路徑。
+        extractor (CitationExtractor): citation_extractor 建立的擷取器（隨工作單位送到各解析行程）。
+        workers (int): 解析行程數量，0 或 1 表示在目前行程中解析。
+        chunk_size (int): 每個工作單位包含的案件數量。
+
+    Yields:
+        Dict[str, Any]: parse_case 的解析結果，格式不符的案件會被略過。
+    """
+    cases = enumerate(iter_case_texts(path))
+    if workers <= 1:
+        for i, case in cases:
+            record = parse_case(i, case, extractor)
+            if record:
+                yield record
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for chunk in iter_batches(cases, chunk_size):
+            pending.append(executor.submit(_parse_case_chunk, chunk, extractor))
+            if len(pending) >= workers * 2:
+                yield from filter(None, pending.popleft().result())
+        while pending:
+            yield from filter(None, pending.popleft().result())
+
+def content_hash(text: str) -> str:
+    """
+    計算節點文本的內容雜湊，用於判斷節點是否需要更新及重新嵌入。
+
+    Args:
+        text (str): 節點文本。
+
+    Returns:
+        str: SHA-256 十六進位字串。
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def collect_nodes(statutes: Iterable[Dict[str, str]],
+                  records: Iterable[Dict[str, Any]]) -> Dict[str, List[Dict[str, str]]]:
+    """
+    將解析結果整理為各標籤的節點資料。
+
+    Args:
+        statutes (Iterable[Dict[str, str]]): parse_statute_section 的結果。
+        records (Iterable[Dict[str, Any]]): parse_case 的結果。
+
+    Returns:
+        Dict[str, List[Dict[str, str]]]: 標籤對應節點列表，每個節點含 id、text、hash，
+        非錨點子節點另含父節點的 parent_id。
+    """
+    nodes = {label: [] for label in HASHED_LABELS}
+    for statute in statutes:
+        nodes["Statute"].append({"id": statute["id"], "text": statute["text"]})
+        nodes["Explanation"].append({"id": f"{statute['id']}_explanation",
+                                     "text": statute["explanation"], "parent_id": statute["id"]})
+    for r in records:
+        nodes["Case"].append({"id": r["case_id"], "text": r["case_text"]})
+        nodes["Fact"].append({"id": r["fact_id"], "text": r["fact_text"], "parent_id": r["case_id"]})
+        if r["legal_id"]:
+            nodes["LegalReference"].append({"id": r["legal_id"], "text": r["legal_text"],
+                                            "parent_id": r["case_id"]})
+        if r["comp_id"]:
+            nodes["Compensation"].append({"id": r["comp_id"], "text": r["comp_text"],
+                                          "parent_id": r["case_id"]})
+            for item in r["comp_items"]:
+                nodes["CompensationItem"].append({"id": item["id"], "text": item["text"],
+                                                  "parent_id": r["comp_id"]})
+    for rows in nodes.values():
+        for row in rows:
+            row["hash"] = content_hash(row["text"])
+    return nodes
+
+def collect_citations(records: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    整理 LegalReference 到 Statute 的引用關係（解析時已由 extract_batch 合併同一對節點的限定語）。
+
+    Args:
+        records (Iterable[Dict[str, Any]]): parse_case 的結果。
+
+    Returns:
+        List[Dict[str, Any]]: 每筆含 legal_id、statute_id 及 qualifiers（例如 ["第1項前段"]）。
+    """
+    return [row for r in records for row in r["citations"]]
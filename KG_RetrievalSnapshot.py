@@ -0,0 +1,332 @@
+from KG_Graph import GraphBackend, get_graph
+from KG_MetadataStore import StringColumn, encode_strings, open_sections, write_sections
+from KG_Parser import iter_batches
+from dotenv import load_dotenv
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+import argparse
+import hashlib
+import numpy as np
+import os
+import threading
+import time
+
+# 加載 .env 文件中的環境變數
+load_dotenv()
+
+# 檢索快照檔路徑，設為空字串表示不使用快照、一律查詢圖譜
+RETRIEVAL_SNAPSHOT_PATH = os.getenv("KG_RETRIEVAL_SNAPSHOT", "retrieval_snapshot.meta")
+# 每隔幾秒比對一次快照與圖譜的建置編號（以及快照檔是否被重建）
+SNAPSHOT_CHECK_INTERVAL = float(os.getenv("KG_RETRIEVAL_SNAPSHOT_INTERVAL", "30"))
+# 建立快照時每次查詢引用法條的事實數量
+SNAPSHOT_BATCH_SIZE = 10000
+
+def _id_key(value: str) -> np.uint64:
+    """字串 ID 的 64 位元雜湊，作為排序與二分搜尋的鍵。"""
+    return np.uint64(int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "little"))
+
+def _sorted_by_key(ids: Sequence[str]) -> Tuple[np.ndarray, List[str]]:
+    """回傳依雜湊鍵排序後的鍵陣列及 ID 列表。"""
+    keys = np.array([_id_key(value) for value in ids], dtype=np.uint64)
+    order = np.argsort(keys, kind="stable")
+    return keys[order], [ids[i] for i in order]
+
+def _find(keys: np.ndarray, ids: StringColumn, value: str) -> int:
+    """以雜湊鍵二分搜尋 ID 的下標，雜湊相同時再比對字串；找不到時為 -1。"""
+    key = _id_key(value)
+    i = int(np.searchsorted(keys, key))
+    while i < len(keys) and keys[i] == key:
+        if ids[i] == value:
+            return i
+        i += 1
+    return -1
+
+def build_snapshot(graph: GraphBackend, path: str = RETRIEVAL_SNAPSHOT_PATH,
+                   batch_size: int = SNAPSHOT_BATCH_SIZE) -> str:
+    """
+    從圖譜讀出查詢流程需要的關係（事實 -> 案件 -> 引用法條，法條 -> 條文與口語化解釋），
+    存成以記憶體映射開啟的快照檔（KG_MetadataStore.write_sections 格式）：
+
+        fact_keys / fact_ids      依雜湊鍵排序的事實 ID
+        fact_cases                CSR：第 i 個事實的案件為 case_ids[fact_cases[i]:fact_cases[i + 1]]
+        case_ids / case_statutes  CSR：每個案件引用的法條為 statute_refs[case_statutes[j]:case_statutes[j + 1]]
+        statute_refs              法條在法條表中的下標（法條 ID 只存一次）
+        statute_*                 法條表：依雜湊鍵排序的法條 ID、條文，以及 CSR 的口語化解釋
+        statute_cases / cocited_* 引用每條法條的案件數，以及 CSR 的共同引用（同一案件也引用的法條及案件數）
+
+    Args:
+        graph (GraphBackend): 來源圖譜。圖譜尚未有建置編號時會先寫入一個。
+        path (str): 快照檔路徑。
+        batch_size (int): 每次查詢引用法條的事實數量。
+
+    Returns:
+        str: 快照對應的圖譜建置編號。
+    """
+    build_id = graph.get_build_id()
+    if build_id is None:
+        build_id = graph.mark_build()
+        graph.flush()
+        print(f"圖譜尚未有建置編號，已寫入 {build_id}")
+
+    statute_texts = {row["id"]: row["text"] or "" for row in graph.iter_nodes("Statute", ["id", "text"])}
+    statute_keys, statute_ids = _sorted_by_key(list(statute_texts))
+    statute_index = {statute_id: i for i, statute_id in enumerate(statute_ids)}
+    explanations: Dict[str, List[str]] = {}
+    for row in graph.fetch_statutes_and_explanations(statute_ids):
+        explanations.setdefault(row["statute_id"], []).append(row["explanation_text"] or "")
+
+    fact_keys, fact_ids = _sorted_by_key([row["id"] for row in graph.iter_nodes("Fact", ["id"])])
+    fact_cases = [0]
+    case_ids: List[str] = []
+    case_statutes = [0]
+    statute_refs: List[int] = []
+    # 共同引用以案件計數，同一案件有多個事實時只算一次
+    counted_cases = set()
+    statute_cases = np.zeros(len(statute_ids), dtype=np.int32)
+    cocited: Dict[Tuple[int, int], int] = {}
+    for batch in iter_batches(fact_ids, batch_size):
+        statutes_by_fact = graph.get_statutes_for_facts(batch)
+        for fact_id in batch:
+            for case in statutes_by_fact[fact_id]:
+                refs = [statute_index[statute_id] for statute_id in case["statutes"] if statute_id in statute_index]
+                if not refs:
+                    continue
+                case_ids.append(case["case_id"])
+                statute_refs.extend(refs)
+                case_statutes.append(len(statute_refs))
+                if case["case_id"] not in counted_cases:
+                    counted_cases.add(case["case_id"])
+                    unique_refs = sorted(set(refs))
+                    statute_cases[unique_refs] += 1
+                    for a in unique_refs:
+                        for b in unique_refs:
+                            if a != b:
+                                cocited[(a, b)] = cocited.get((a, b), 0) + 1
+            fact_cases.append(len(case_ids))
+
+    if graph.get_build_id() != build_id:
+        raise RuntimeError("建立快照期間圖譜被重建，請重新執行")
+
+    explanation_texts = [text for statute_id in statute_ids for text in explanations.get(statute_id, [])]
+    statute_explanations = np.zeros(len(statute_ids) + 1, dtype=np.int64)
+    np.cumsum([len(explanations.get(statute_id, [])) for statute_id in statute_ids], out=statute_explanations[1:])
+
+    pairs = sorted(cocited)
+    cocited_offsets = np.zeros(len(statute_ids) + 1, dtype=np.int64)
+    np.cumsum(np.bincount([a for a, _ in pairs], minlength=len(statute_ids)), out=cocited_offsets[1:])
+
+    sections = [("build_id", [build_id.encode("utf-8")]), ("fact_keys", fact_keys)]
+    for name, values in (("fact_ids", fact_ids), ("case_ids", case_ids), ("statute_ids", statute_ids),
+                         ("statute_texts", [statute_texts[statute_id] for statute_id in statute_ids]),
+                         ("explanation_texts", explanation_texts)):
+        offsets, blob = encode_strings(values)
+        sections += [(f"{name}_offsets", offsets), (f"{name}_blob", [blob])]
+    sections += [
+        ("fact_cases", np.asarray(fact_cases, dtype=np.int64)),
+        ("case_statutes", np.asarray(case_statutes, dtype=np.int64)),
+        ("statute_refs", np.asarray(statute_refs, dtype=np.int32)),
+        ("statute_keys", statute_keys),
+        ("statute_explanations", statute_explanations),
+        ("statute_cases", statute_cases),
+        ("cocited_offsets", cocited_offsets),
+        ("cocited_refs", np.asarray([b for _, b in pairs], dtype=np.int32)),
+        ("cocited_counts", np.asarray([cocited[pair] for pair in pairs], dtype=np.int32)),
+    ]
+    write_sections(path, sections)
+    return build_id
+
+class SnapshotGraph(GraphBackend):
+    """
+    以 build_snapshot 的快照檔回答查詢流程的圖譜查詢（引用法條、條文與口語化解釋），結果與圖譜後端相同。
+    開啟時只建立記憶體映射，不建立字典；查詢以雜湊鍵二分搜尋，只解碼命中的字串。不支援寫入。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.mmap, sections = open_sections(path)
+        self.build_id = bytes(sections["build_id"]).decode("utf-8")
+        columns = {name: StringColumn(sections[f"{name}_offsets"], sections[f"{name}_blob"])
+                   for name in ("fact_ids", "case_ids", "statute_ids", "statute_texts", "explanation_texts")}
+        self.fact_keys: np.ndarray = sections["fact_keys"]
+        self.fact_ids = columns["fact_ids"]
+        self.fact_cases: np.ndarray = sections["fact_cases"]
+        self.case_ids = columns["case_ids"]
+        self.case_statutes: np.ndarray = sections["case_statutes"]
+        self.statute_refs: np.ndarray = sections["statute_refs"]
+        self.statute_keys: np.ndarray = sections["statute_keys"]
+        self.statute_ids = columns["statute_ids"]
+        self.statute_texts = columns["statute_texts"]
+        self.statute_explanations: np.ndarray = sections["statute_explanations"]
+        self.explanation_texts = columns["explanation_texts"]
+        self.statute_cases: np.ndarray = sections["statute_cases"]
+        self.cocited_offsets: np.ndarray = sections["cocited_offsets"]
+        self.cocited_refs: np.ndarray = sections["cocited_refs"]
+        self.cocited_counts: np.ndarray = sections["cocited_counts"]
+
+    def get_build_id(self) -> Optional[str]:
+        return self.build_id
+
+    def upsert_nodes(self, label: str, rows: List[Dict[str, Any]]) -> None:
+        raise TypeError(f"檢索快照 {self.path} 為唯讀，請寫入圖譜後重新建立快照")
+
+    def upsert_edges(self, rel_type: str, start_label: str, end_label: str, rows: List[Dict[str, Any]]) -> None:
+        raise TypeError(f"檢索快照 {self.path} 為唯讀，請寫入圖譜後重新建立快照")
+
+    def iter_nodes(self, label: str, properties: List[str]) -> Iterator[Dict[str, Any]]:
+        # 快照只保存查詢流程需要的欄位，完整的節點屬性由圖譜讀取
+        return get_graph().iter_nodes(label, properties)
+
+    def get_statutes_for_case(self, fact_id: str) -> List[Dict[str, Any]]:
+        i = _find(self.fact_keys, self.fact_ids, fact_id)
+        if i < 0:
+            return []
+        results = []
+        for j in range(int(self.fact_cases[i]), int(self.fact_cases[i + 1])):
+            refs = self.statute_refs[self.case_statutes[j]:self.case_statutes[j + 1]]
+            results.append({"case_id": self.case_ids[j], "statutes": [self.statute_ids[ref] for ref in refs]})
+        return results
+
+    def get_statutes_for_facts(self, fact_ids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        return {fact_id: self.get_statutes_for_case(fact_id) for fact_id in fact_ids}
+
+    def fetch_statutes_and_explanations(self, statutes: List[str]) -> List[Dict[str, str]]:
+        results = []
+        for statute_id in dict.fromkeys(statutes):
+            i = _find(self.statute_keys, self.statute_ids, statute_id)
+            if i < 0:
+                continue
+            statute_text = self.statute_texts[i]
+            for j in range(int(self.statute_explanations[i]), int(self.statute_explanations[i + 1])):
+                results.append({
+                    "statute_id": statute_id,
+                    "statute_text": statute_text,
+                    "explanation_text": self.explanation_texts[j]
+                })
+        return results
+
+    def get_cocitations(self, statutes: List[str]) -> Dict[str, Dict[str, float]]:
+        """
+        查詢法條之間的共同引用機率：引用法條 s 的案件中，也引用法條 t 的比例。
+
+        Args:
+            statutes (List[str]): 法條 ID 列表，只計算列表內法條之間的共同引用。
+
+        Returns:
+            Dict[str, Dict[str, float]]: s 對應 {t: P(t | s)}，只包含至少被共同引用一次的 t；
+            快照中沒有的法條不在其中。
+        """
+        found = {}
+        for statute_id in dict.fromkeys(statutes):
+            i = _find(self.statute_keys, self.statute_ids, statute_id)
+            if i >= 0:
+                found[i] = statute_id
+        wanted = np.fromiter(found, dtype=np.int32, count=len(found))
+        results: Dict[str, Dict[str, float]] = {}
+        for i, statute_id in found.items():
+            start, end = int(self.cocited_offsets[i]), int(self.cocited_offsets[i + 1])
+            refs, counts = self.cocited_refs[start:end], self.cocited_counts[start:end]
+            mask = np.isin(refs, wanted)
+            cases = max(int(self.statute_cases[i]), 1)
+            results[statute_id] = {found[int(ref)]: int(count) / cases
+                                   for ref, count in zip(refs[mask], counts[mask])}
+        return results
+
+def _file_version(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+class ResidentSnapshot:
+    """
+    行程內常駐的檢索快照。快照的建置編號與圖譜目前的建置編號相同時由快照回答查詢，
+    否則（快照不存在、過期或無法讀取）改為查詢圖譜。
+
+    第一次使用時同步載入並比對建置編號；之後每隔 check_interval 秒在背景執行緒重新比對，
+    快照檔被重建時一併重新載入，查詢本身不需要等待圖譜往返。
+    """
+
+    def __init__(self, path: str = RETRIEVAL_SNAPSHOT_PATH, check_interval: float = SNAPSHOT_CHECK_INTERVAL):
+        self.path = path
+        self.check_interval = check_interval
+        self.current: Optional[SnapshotGraph] = None
+        self.version: Optional[Tuple[int, int]] = None
+        self.fresh = False
+        self.next_check: Optional[float] = None
+        self.lock = threading.Lock()
+        self.checking = False
+
+    def _refresh(self) -> None:
+        try:
+            version = _file_version(self.path)
+            if version != self.version:
+                self.current = SnapshotGraph(self.path) if version is not None else None
+                self.version = version
+            build_id = get_graph().get_build_id()
+            fresh = self.current is not None and build_id is not None and self.current.build_id == build_id
+            if fresh != self.fresh:
+                print(f"檢索快照 {self.path} " + ("已載入" if fresh else "不存在或已過期，改為查詢圖譜"))
+            self.fresh = fresh
+        except Exception as e:
+            self.fresh = False
+            print(f"無法使用檢索快照 {self.path}：{e}")
+        finally:
+            self.checking = False
+
+    def get(self) -> GraphBackend:
+        """
+        取得回答查詢用的圖譜存取物件。
+
+        Returns:
+            GraphBackend: 快照有效時為 SnapshotGraph，否則為 KG_Graph.get_graph()。
+        """
+        if not self.path:
+            return get_graph()
+        now = time.monotonic()
+        if self.next_check is None:
+            with self.lock:
+                if self.next_check is None:
+                    self._refresh()
+                    self.next_check = time.monotonic() + self.check_interval
+        elif now >= self.next_check:
+            with self.lock:
+                if now >= self.next_check and not self.checking:
+                    self.next_check = now + self.check_interval
+                    self.checking = True
+                    threading.Thread(target=self._refresh, daemon=True).start()
+        current = self.current
+        return current if self.fresh and current is not None else get_graph()
+
+_resident = ResidentSnapshot()
+
+def get_retrieval_graph() -> GraphBackend:
+    """
+    取得查詢流程用的圖譜存取物件：檢索快照有效時由快照回答，過期時改為查詢圖譜（Neo4j 或 local 後端）。
+
+    Returns:
+        GraphBackend: SnapshotGraph 或 KG_Graph.get_graph()。
+    """
+    return _resident.get()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="從圖譜建立查詢流程用的檢索快照")
+    parser.add_argument("--output", default=RETRIEVAL_SNAPSHOT_PATH or "retrieval_snapshot.meta", help="快照檔路徑")
+    parser.add_argument("--batch-size", type=int, default=SNAPSHOT_BATCH_SIZE, help="每次查詢引用法條的事實數量")
+    parser.add_argument("--check", action="store_true", help="只檢查既有快照是否與圖譜的建置編號相同")
+    args = parser.parse_args()
+
+    if args.check:
+        snapshot = SnapshotGraph(args.output)
+        build_id = get_graph().get_build_id()
+        state = "有效" if snapshot.build_id == build_id else "已過期"
+        print(f"快照建置編號 {snapshot.build_id}，圖譜建置編號 {build_id}：{state}")
+    else:
+        start = time.perf_counter()
+        build_id = build_snapshot(get_graph(), args.output, args.batch_size)
+        build_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        snapshot = SnapshotGraph(args.output)
+        load_ms = (time.perf_counter() - start) * 1000
+        print(f"已建立檢索快照 {args.output}（建置編號 {build_id}）：{len(snapshot.fact_ids)} 個事實，"
+              f"{len(snapshot.case_ids)} 筆案件，{len(snapshot.statute_ids)} 條法條，"
+              f"{os.path.getsize(args.output) / 2 ** 20:.2f} MB，建置 {build_seconds:.2f} 秒，載入 {load_ms:.2f} ms")
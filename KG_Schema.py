@@ -0,0 +1,121 @@
+from typing import Any, Dict, List, Tuple
+
+# 各標籤節點的唯一鍵：帶 id 的節點以 id 唯一，錨點節點以 name 唯一
+UNIQUE_KEYS: Dict[str, str] = {
+    "Statute": "id",
+    "Explanation": "id",
+    "Case": "id",
+    "Fact": "id",
+    "LegalReference": "id",
+    "Compensation": "id",
+    "CompensationItem": "id",
+    "LawNode": "name",
+    "ReferenceNode": "name",
+    "ReferenceData": "name",
+}
+
+# 查詢計畫中代表未使用索引、逐一掃描節點的運算子
+SCAN_OPERATORS = ("NodeByLabelScan", "AllNodesScan")
+
+def lookup_queries() -> Dict[str, Tuple[str, Dict[str, Any]]]:
+    """
+    建置與查詢流程中以鍵值查找節點的語句，應全部命中唯一性約束所建立的索引。
+    語句直接取自 KG_Graph 與 KG_Build 實際執行的常數；兩者都匯入本模組，因此在函數內匯入。
+
+    Returns:
+        Dict[str, Tuple[str, Dict[str, Any]]]: 語句名稱對應 (語句, 範例參數)。
+    """
+    from KG_Build import DELETE_NODES_QUERY, LINK_CITATIONS_QUERY, MERGE_NODES_QUERY, UPSERT_CHANGED_QUERY, node_query
+    from KG_Graph import (LEGAL_CONTEXT_QUERY, STATUTE_EXPLANATIONS_QUERY, STATUTES_FOR_CASE_QUERY,
+                          STATUTES_FOR_FACTS_QUERY)
+
+    node_row = {"id": "Fact1", "text": "", "hash": "", "parent_id": "Case1"}
+    return {
+        # KG_Graph.Neo4jGraph 的查詢
+        "get_statutes_for_case": (STATUTES_FOR_CASE_QUERY, {"fact_id": "Fact1"}),
+        "get_statutes_for_facts": (STATUTES_FOR_FACTS_QUERY, {"fact_ids": ["Fact1", "Fact2"]}),
+        "get_legal_context": (LEGAL_CONTEXT_QUERY, {"fact_ids": ["Fact1", "Fact2"]}),
+        "fetch_statutes_and_explanations": (STATUTE_EXPLANATIONS_QUERY, {"statutes": ["民法第184條"]}),
+        # KG_Build.merge_nodes_batch / upsert_changed_nodes
+        "merge_case": (node_query(MERGE_NODES_QUERY, "Case"), {"rows": [{**node_row, "id": "Case1"}]}),
+        "merge_fact": (node_query(MERGE_NODES_QUERY, "Fact"), {"rows": [node_row]}),
+        "merge_comp_item": (node_query(MERGE_NODES_QUERY, "CompensationItem"),
+                            {"rows": [{**node_row, "id": "CompItem1_1", "parent_id": "Compensation1"}]}),
+        "upsert_changed_fact": (node_query(UPSERT_CHANGED_QUERY, "Fact"), {"rows": [node_row]}),
+        # KG_Build.link_citations_batch
+        "link_citations": (LINK_CITATIONS_QUERY,
+                           {"rows": [{"legal_id": "Legal1", "statute_id": "民法第184條", "qualifiers": []}]}),
+        # KG_Build.delete_nodes_batch
+        "delete_nodes": (node_query(DELETE_NODES_QUERY, "Fact"), {"ids": ["Fact1"]}),
+    }
+
+def ensure_schema(session) -> None:
+    """
+    為每個節點標籤建立唯一性約束（同時建立對應的索引）。已存在的約束會被略過。
+
+    Args:
+        session: Neo4j session。
+    """
+    for label, key in UNIQUE_KEYS.items():
+        session.run(
+            f"CREATE CONSTRAINT {label.lower()}_{key}_unique IF NOT EXISTS "
+            f"FOR (n:{label}) REQUIRE n.{key} IS UNIQUE"
+        ).consume()
+    print(f"已確認 {len(UNIQUE_KEYS)} 個唯一性約束")
+
+def _collect_operators(plan: Dict[str, Any]) -> List[Dict[str, Any]]:
+    operators = [plan]
+    for child in plan.get("children", []):
+        operators.extend(_collect_operators(child))
+    return operators
+
+def find_label_scans(session, query: str, parameters: Dict[str, Any]) -> List[str]:
+    """
+    以 EXPLAIN 取得查詢計畫，找出其中退化為標籤掃描或全圖掃描的運算子。
+
+    Args:
+        session: Neo4j session。
+        query (str): 要檢查的 Cypher 語句。
+        parameters (Dict[str, Any]): 查詢參數。
+
+    Returns:
+        List[str]: 掃描運算子的描述，例如 "NodeByLabelScan (f:Fact)"；沒有掃描時為空列表。
+    """
+    plan = session.run(f"EXPLAIN {query}", parameters).consume().plan
+    scans = []
+    for operator in _collect_operators(plan or {}):
+        operator_type = operator.get("operatorType", "").split("@")[0]
+        if operator_type in SCAN_OPERATORS:
+            details = operator.get("args", {}).get("Details", "")
+            scans.append(f"{operator_type} {details}".strip())
+    return scans
+
+def check_query_plans(session) -> Dict[str, List[str]]:
+    """
+    檢查所有鍵值查找語句的查詢計畫，回報仍使用標籤掃描的語句。
+
+    Args:
+        session: Neo4j session。
+
+    Returns:
+        Dict[str, List[str]]: 語句名稱對應其掃描運算子；全部命中索引時為空字典。
+    """
+    report = {}
+    for name, (query, parameters) in lookup_queries().items():
+        scans = find_label_scans(session, query, parameters)
+        if scans:
+            report[name] = scans
+            print(f"[掃描] {name}: {', '.join(scans)}")
+        else:
+            print(f"[索引] {name}")
+    return report
+
+if __name__ == "__main__":
+    from KG_Driver import close_pool, get_pool
+
+    with get_pool().session() as session:
+        ensure_schema(session)
+        failed = check_query_plans(session)
+    close_pool()
+    if failed:
+        raise SystemExit(f"{len(failed)} 個查詢仍使用標籤掃描")
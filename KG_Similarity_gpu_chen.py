@@ -1,89 +1,98 @@
 import chainlit as cl
-from neo4j import GraphDatabase
-from sentence_transformers import SentenceTransformer
-from langchain_ollama import OllamaLLM
-from dotenv import load_dotenv
-import torch
+from KG_Graph import get_graph
+from KG_RetrievalSnapshot import get_retrieval_graph
+from KG_VectorStore import get_vector_store, load_node_vectors
+from KG_EmbeddingCache import cached_model
 import numpy as np
-import os
 
-# 加載 .env 文件中的環境變數
-load_dotenv()
-
-# Neo4j 配置
-uri = os.getenv("NEO4J_URI")
-username = os.getenv("NEO4J_USERNAME")
-password = os.getenv("NEO4J_PASSWORD")
-driver = GraphDatabase.driver(uri, auth=(username, password))
-
-# 初始化 SentenceTransformer
-model = SentenceTransformer('all-MiniLM-L6-v2')
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+# 模型、裝置與 LLM 都在第一次使用時才建立，匯入本模組不會匯入 torch 或載入模型
+_model = None
+_device = None
+_llm = None
+# (向量存放區, 事實 ID, 事實文本, 已正規化的嵌入張量)，向量存放區被更新後才重新載入
+_fact_matrix = None
+
+# 初始化 SentenceTransformer（包上嵌入快取），在 GPU 上（有 CUDA 時）於目前行程中編碼
+def get_model():
+    global _model
+    if _model is None:
+        _model = cached_model('all-MiniLM-L6-v2', workers=0, device=str(get_device()))
+    return _model
+
+def get_device():
+    global _device
+    if _device is None:
+        import torch
+        _device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    return _device
 
 # 初始化 LLM
-llm = OllamaLLM(model="kenneth85/llama-3-taiwan:8b-instruct")
+def get_llm():
+    global _llm
+    if _llm is None:
+        from langchain_ollama import OllamaLLM
+        _llm = OllamaLLM(model="kenneth85/llama-3-taiwan:8b-instruct")
+    return _llm
+
+# 取得所有事實的 ID、文本及已正規化的嵌入（常駐於 get_device() 上），查詢時不必重新讀取向量
+def get_fact_matrix():
+    global _fact_matrix
+    store = get_vector_store("Fact")
+    if _fact_matrix is None or _fact_matrix[0] is not store:
+        import torch
+
+        records, vectors = load_node_vectors(get_graph(), "Fact")
+        embeddings = torch.from_numpy(np.array(vectors, dtype=np.float32)).to(get_device())
+        _fact_matrix = (store, [record["id"] for record in records], [record["text"] for record in records],
+                        embeddings / embeddings.norm(dim=1, keepdim=True))
+    return _fact_matrix[1:]
 
 # 保存對話記憶
 conversation_history = []
 
-# Neo4j 查詢函數
+# 圖譜查詢函數
 def get_similar_facts_with_statutes(input_text, top_k=3):
-    input_embedding = model.encode(input_text)
-    input_embedding = torch.tensor(input_embedding, dtype=torch.float32).to(device)
+    import torch
 
-    with driver.session() as session:
-        results = session.run("MATCH (f:Fact) RETURN f.id AS id, f.text AS text, f.embedding AS embedding")
-        fact_ids = []
-        fact_texts = []
-        embeddings = []
+    device = get_device()
+    input_embedding = get_model().encode(input_text)
+    input_embedding = torch.tensor(input_embedding, dtype=torch.float32).to(device)
 
-        for record in results:
-            fact_ids.append(record["id"])
-            fact_texts.append(record["text"])
-            embeddings.append(torch.tensor(np.array(record["embedding"], dtype=np.float32)).to(device))
+    # 事實嵌入只在第一次查詢（或向量存放區更新後）載入並正規化
+    fact_ids, fact_texts, embeddings_norm = get_fact_matrix()
 
-        embeddings = torch.stack(embeddings)
+    input_norm = input_embedding / input_embedding.norm()
+    similarities = torch.matmul(embeddings_norm, input_norm.T).cpu().numpy()
 
-        input_norm = input_embedding / input_embedding.norm()
-        embeddings_norm = embeddings / embeddings.norm(dim=1, keepdim=True)
-        similarities = torch.matmul(embeddings_norm, input_norm.T).cpu().numpy()
+    top_indices = similarities.argsort()[-top_k:][::-1]
 
-        top_indices = similarities.argsort()[-top_k:][::-1]
+    # 所有命中事實的引用法條以單一次查詢取得（檢索快照有效時不需要查詢圖譜）
+    statutes_by_fact = get_retrieval_graph().get_statutes_for_facts([fact_ids[i] for i in top_indices])
 
-        similar_cases = []
-        for i in top_indices:
-            fact_id = fact_ids[i]
-            fact_text = fact_texts[i]
-            similarity = similarities[i]
-            statutes_for_fact = get_statutes_for_case(fact_id)
+    similar_cases = []
+    for i in top_indices:
+        fact_id = fact_ids[i]
+        fact_text = fact_texts[i]
+        similarity = similarities[i]
+        statutes_for_fact = statutes_by_fact[fact_id]
 
-            # 修正這裡的法條處理
-            statutes = ", ".join(
-                statute_id for statute in statutes_for_fact for statute_id in statute['statutes']
-            )
+        # 修正這裡的法條處理
+        statutes = ", ".join(
+            statute_id for statute in statutes_for_fact for statute_id in statute['statutes']
+        )
 
-            similar_cases.append({
-                "id": fact_id,
-                "content": fact_text,
-                "similarity": similarity,
-                "statutes": statutes
-            })
+        similar_cases.append({
+            "id": fact_id,
+            "content": fact_text,
+            "similarity": similarity,
+            "statutes": statutes
+        })
 
-        return similar_cases
+    return similar_cases
 
 
 def get_statutes_for_case(fact_id):
-    with driver.session() as session:
-        results = session.run(
-            """
-            MATCH (c:Case)-[:案件事實]->(f:Fact {id: $fact_id})
-            MATCH (c)-[:案件相關法條]->(l:LegalReference)
-            MATCH (l)-[:引用法條]->(s:Statute)
-            RETURN c.id AS case_id, collect(s.id) AS statutes
-            """,
-            fact_id=fact_id
-        )
-        return [{"case_id": record["case_id"], "statutes": record["statutes"]} for record in results]
+    return get_retrieval_graph().get_statutes_for_case(fact_id)
 
 @cl.on_chat_start
 async def on_chat_start():
@@ -147,7 +156,7 @@ async def on_message(message):
         """
 
         # 調用 LLM 生成起訴狀
-        result = llm.invoke([{"role": "user", "content": prompt}])
+        result = get_llm().invoke([{"role": "user", "content": prompt}])
 
         # 如果結果是字符串，直接使用
         if isinstance(result, str):
@@ -0,0 +1,126 @@
+from dotenv import load_dotenv
+from typing import Any, Dict, List, Optional, Tuple
+import os
+import re
+
+# 加載 .env 文件中的環境變數
+load_dotenv()
+
+# 放入提示詞的法條條文與口語化解釋的 token 上限，設為 0 表示不限制
+STATUTE_TOKEN_BUDGET = int(os.getenv("KG_STATUTE_TOKEN_BUDGET", "2000"))
+# 共同引用先驗的權重（0 到 1），0 表示只依相似案件的投票排序
+COCITATION_WEIGHT = float(os.getenv("KG_COCITATION_WEIGHT", "0"))
+
+# 估計 token 數時，中日韓文字每字算一個 token，其餘字元約四個算一個
+CJK_PATTERN = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\u3000-\u303f\uff00-\uffef]")
+
+def hit_weights(similar_facts: List[Dict[str, Any]]) -> List[float]:
+    """
+    相似事實的投票權重。向量查詢的命中為 1 / (1 + 距離)（與 KG_Faiss_Query.query_labels 相同）；
+    混合查詢只由詞彙索引找到的命中沒有距離，所有命中改用 RRF 分數，同一次查詢內的權重尺度一致。
+
+    Args:
+        similar_facts (List[Dict[str, Any]]): query_faiss 的結果。
+
+    Returns:
+        List[float]: 與 similar_facts 對應的權重。
+    """
+    if any(fact.get("distance") is None for fact in similar_facts):
+        return [float(fact.get("score", 0.0)) for fact in similar_facts]
+    return [1.0 / (1.0 + float(fact["distance"])) for fact in similar_facts]
+
+def vote_scores(similar_facts: List[Dict[str, Any]],
+                statutes_by_fact: Dict[str, List[Dict[str, Any]]]) -> Dict[str, float]:
+    """
+    以相似事實的權重為每條被引用的法條投票：分數為引用該法條的命中權重總和除以所有命中的權重總和，
+    介於 0 到 1，相當於以相似度加權後、引用該法條的相似案件比例。
+
+    Args:
+        similar_facts (List[Dict[str, Any]]): query_faiss 的結果。
+        statutes_by_fact (Dict[str, List[Dict[str, Any]]]): 事實 ID 對應 get_statutes_for_case 的結果。
+
+    Returns:
+        Dict[str, float]: 法條 ID 對應投票分數。
+    """
+    weights = hit_weights(similar_facts)
+    total = sum(weights)
+    votes: Dict[str, float] = {}
+    for fact, weight in zip(similar_facts, weights):
+        cited = {statute_id for case in statutes_by_fact.get(fact["id"], []) for statute_id in case["statutes"]}
+        for statute_id in cited:
+            votes[statute_id] = votes.get(statute_id, 0.0) + weight
+    return {statute_id: vote / total if total > 0 else 0.0 for statute_id, vote in votes.items()}
+
+def cocitation_prior(votes: Dict[str, float], cocitations: Dict[str, Dict[str, float]]) -> Dict[str, float]:
+    """
+    共同引用先驗：其他候選法條 t 以投票分數加權的 P(s | t) 平均，
+    與得票高的法條經常一起被引用的法條先驗較高。
+
+    Args:
+        votes (Dict[str, float]): vote_scores 的結果。
+        cocitations (Dict[str, Dict[str, float]]): t 對應 {s: P(s | t)}（SnapshotGraph.get_cocitations）。
+
+    Returns:
+        Dict[str, float]: 法條 ID 對應先驗，介於 0 到 1。
+    """
+    prior = {}
+    for statute_id in votes:
+        weight = sum(vote for other, vote in votes.items() if other != statute_id)
+        support = sum(vote * cocitations.get(other, {}).get(statute_id, 0.0)
+                      for other, vote in votes.items() if other != statute_id)
+        prior[statute_id] = support / weight if weight > 0 else 0.0
+    return prior
+
+def rank_statutes(similar_facts: List[Dict[str, Any]], statutes_by_fact: Dict[str, List[Dict[str, Any]]],
+                  cocitations: Optional[Dict[str, Dict[str, float]]] = None,
+                  cocitation_weight: float = COCITATION_WEIGHT) -> List[Tuple[str, float]]:
+    """
+    為相似事實引用的法條排序。分數為 (1 - cocitation_weight) * 投票分數 + cocitation_weight * 共同引用先驗；
+    沒有提供共同引用資料時只用投票分數。
+
+    Args:
+        similar_facts (List[Dict[str, Any]]): query_faiss 的結果。
+        statutes_by_fact (Dict[str, List[Dict[str, Any]]]): 事實 ID 對應 get_statutes_for_case 的結果。
+        cocitations (Optional[Dict[str, Dict[str, float]]]): 候選法條之間的共同引用機率。
+        cocitation_weight (float): 共同引用先驗的權重。
+
+    Returns:
+        List[Tuple[str, float]]: (法條 ID, 分數)，依分數由高到低排序，分數相同時依法條 ID。
+    """
+    votes = vote_scores(similar_facts, statutes_by_fact)
+    if cocitations is not None and cocitation_weight > 0:
+        prior = cocitation_prior(votes, cocitations)
+        scores = {statute_id: (1 - cocitation_weight) * vote + cocitation_weight * prior[statute_id]
+                  for statute_id, vote in votes.items()}
+    else:
+        scores = votes
+    return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+def estimate_tokens(text: str) -> int:
+    """粗估文本的 token 數：中日韓文字與全形標點每字一個，其餘字元每四個一個。"""
+    cjk = len(CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+def format_statute(statute: Dict[str, str]) -> str:
+    """將一條法條的條文與口語化解釋格式化為放入提示詞的文字。"""
+    return f"法條: {statute['statute_id']}\n條文: {statute['statute_text']}\n口語化解釋: {statute['explanation_text']}"
+
+def apply_token_budget(statutes: List[Dict[str, Any]], budget: int = STATUTE_TOKEN_BUDGET) -> List[Dict[str, Any]]:
+    """
+    依排序保留法條，直到加入下一條會超過 token 上限為止。第一條即使超過上限也會保留，提示詞不會沒有法條。
+
+    Args:
+        statutes (List[Dict[str, Any]]): 已排序、含法條 ID、條文和口語化解釋的字典列表。
+        budget (int): token 上限，0 或負數表示不限制。
+
+    Returns:
+        List[Dict[str, Any]]: statutes 的前綴。
+    """
+    if budget <= 0:
+        return statutes
+    used = 0
+    for i, statute in enumerate(statutes):
+        used += estimate_tokens(format_statute(statute)) + 1
+        if used > budget and i > 0:
+            return statutes[:i]
+    return statutes
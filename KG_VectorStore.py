@@ -0,0 +1,208 @@
+from dotenv import load_dotenv
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+import os
+
+# 加載 .env 文件中的環境變數
+load_dotenv()
+
+# 向量存放目錄，每個節點標籤各自一組檔案
+VECTOR_STORE_DIR = os.getenv("KG_VECTOR_STORE_DIR", "vector_store")
+# 向量檔初始容量，之後每次加倍
+INITIAL_CAPACITY = 1024
+# 新建向量檔的存放型別：float32，或 float16（檔案與分頁快取減半，讀出時轉回 float32）；
+# 已存在的向量檔沿用其原本的型別，要更換型別需刪除向量檔後重新嵌入
+VECTOR_DTYPE = os.getenv("KG_VECTOR_DTYPE", "float32")
+STORAGE_DTYPES = {"float32": np.float32, "float16": np.float16}
+
+class VectorStore:
+    """
+    圖譜之外的向量存放區。某一標籤的所有向量連續存放在記憶體映射的 .npy 檔中（float32 或 float16），
+    節點只記錄 vector_row（列號）與 vector_version（該列被寫入的次數），不再把向量存成節點屬性。
+    無論存放型別為何，讀出的向量一律為 float32。
+
+    每個標籤有三個檔案：
+        {label}.vectors.npy   (容量, 維度) 的 float32 或 float16 陣列
+        {label}.versions.npy  (容量,) 的 int64 陣列，每次覆寫該列時加 1
+        {label}.ids.txt       每行一個節點 ID，行號即列號，只會追加
+    寫入時先寫向量與版本並 flush，最後才追加 ID，中斷時不會留下指向未寫完向量的 ID。
+    同一組檔案同時只應由一個行程寫入，讀取端可以是任意多個行程。
+    """
+
+    def __init__(self, label: str, directory: str = VECTOR_STORE_DIR, writable: bool = False,
+                 dtype: str = VECTOR_DTYPE):
+        if dtype not in STORAGE_DTYPES:
+            raise ValueError(f"不支援的向量存放型別：{dtype}，可用型別為 {', '.join(STORAGE_DTYPES)}")
+        self.label = label
+        self.writable = writable
+        self.dtype = np.dtype(STORAGE_DTYPES[dtype])
+        prefix = os.path.join(directory, label)
+        self.vector_path = f"{prefix}.vectors.npy"
+        self.version_path = f"{prefix}.versions.npy"
+        self.id_path = f"{prefix}.ids.txt"
+        if writable:
+            os.makedirs(directory, exist_ok=True)
+
+        self.ids: List[str] = []
+        self.rows: Dict[str, int] = {}
+        self.vectors: Optional[np.memmap] = None
+        self.versions: Optional[np.memmap] = None
+        self.stamp = self._file_stamp()
+        if os.path.exists(self.vector_path) and os.path.exists(self.id_path):
+            mode = "r+" if writable else "r"
+            self.vectors = np.load(self.vector_path, mmap_mode=mode)
+            self.versions = np.load(self.version_path, mmap_mode=mode)
+            self.dtype = self.vectors.dtype
+            with open(self.id_path, "r", encoding="utf-8") as f:
+                self.ids = f.read().splitlines()
+            self.rows = {node_id: row for row, node_id in enumerate(self.ids)}
+
+    def _file_stamp(self) -> Tuple[int, ...]:
+        try:
+            return os.stat(self.id_path).st_size, os.stat(self.vector_path).st_mtime_ns
+        except FileNotFoundError:
+            return ()
+
+    def is_stale(self) -> bool:
+        """其他行程追加或覆寫向量後回傳 True（依 ID 檔大小及向量檔修改時間判斷）。"""
+        return self._file_stamp() != self.stamp
+
+    @property
+    def dimension(self) -> Optional[int]:
+        return None if self.vectors is None else self.vectors.shape[1]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _grow(self, needed: int, dimension: int) -> None:
+        capacity = 0 if self.vectors is None else len(self.vectors)
+        if needed <= capacity:
+            return
+        new_capacity = max(INITIAL_CAPACITY, capacity)
+        while new_capacity < needed:
+            new_capacity *= 2
+        # 建立新檔再替換，已寫入的列原樣複製
+        vectors = np.lib.format.open_memmap(f"{self.vector_path}.tmp", mode="w+", dtype=self.dtype,
+                                            shape=(new_capacity, dimension))
+        versions = np.lib.format.open_memmap(f"{self.version_path}.tmp", mode="w+", dtype=np.int64,
+                                             shape=(new_capacity,))
+        if self.vectors is not None:
+            vectors[:capacity] = self.vectors
+            versions[:capacity] = self.versions
+        vectors.flush()
+        versions.flush()
+        del vectors, versions
+        self.vectors = self.versions = None
+        os.replace(f"{self.vector_path}.tmp", self.vector_path)
+        os.replace(f"{self.version_path}.tmp", self.version_path)
+        self.vectors = np.load(self.vector_path, mmap_mode="r+")
+        self.versions = np.load(self.version_path, mmap_mode="r+")
+
+    def put(self, ids: Sequence[str], vectors: np.ndarray) -> List[Tuple[int, int]]:
+        """
+        寫入一批向量（轉為存放型別）。已存在的 ID 就地覆寫原本的列，新的 ID 追加在最後。
+
+        Args:
+            ids (Sequence[str]): 節點 ID。
+            vectors (np.ndarray): (筆數, 維度) 的向量，順序與 ids 相同。
+
+        Returns:
+            List[Tuple[int, int]]: 每個 ID 的 (vector_row, vector_version)，應寫回節點屬性。
+        """
+        if not self.writable:
+            raise ValueError(f"{self.label} 向量存放區以唯讀模式開啟")
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.dimension is not None and vectors.shape[1] != self.dimension:
+            raise ValueError(f"{self.label} 向量維度為 {self.dimension}，無法寫入 {vectors.shape[1]} 維向量；"
+                             f"更換模型時請先刪除 {self.vector_path}")
+        new_ids = [node_id for node_id in dict.fromkeys(ids) if node_id not in self.rows]
+        self._grow(len(self.ids) + len(new_ids), vectors.shape[1])
+        for row, node_id in enumerate(new_ids, start=len(self.ids)):
+            self.rows[node_id] = row
+
+        rows = np.array([self.rows[node_id] for node_id in ids], dtype=np.int64)
+        self.vectors[rows] = vectors
+        self.versions[rows] += 1
+        self.vectors.flush()
+        self.versions.flush()
+        if new_ids:
+            with open(self.id_path, "a", encoding="utf-8") as f:
+                f.write("".join(f"{node_id}\n" for node_id in new_ids))
+                f.flush()
+                os.fsync(f.fileno())
+            self.ids.extend(new_ids)
+        self.stamp = self._file_stamp()
+        return [(int(row), int(self.versions[row])) for row in rows]
+
+    def version(self, row: Optional[int]) -> Optional[int]:
+        """
+        回傳某一列目前的版本；列不存在時為 None。節點的 vector_version 與此不同表示向量已失效。
+        """
+        if row is None or self.versions is None or not 0 <= row < len(self.ids):
+            return None
+        return int(self.versions[row])
+
+    def read(self, rows: Iterable[int]) -> np.ndarray:
+        """
+        讀出多列向量。列號連續且以 float32 存放時直接回傳記憶體映射的切片（不複製），
+        否則一次取出所需的列；以 float16 存放時轉回 float32。
+
+        Args:
+            rows (Iterable[int]): 列號，通常來自節點的 vector_row。
+
+        Returns:
+            np.ndarray: (列數, 維度) 的 float32 陣列，順序與 rows 相同。
+        """
+        rows = np.fromiter(rows, dtype=np.int64)
+        if self.vectors is None or len(rows) == 0:
+            return np.empty((0, self.dimension or 0), dtype=np.float32)
+        if rows[-1] - rows[0] == len(rows) - 1 and np.all(np.diff(rows) == 1):
+            vectors = self.vectors[rows[0]:rows[-1] + 1]
+        else:
+            vectors = self.vectors[rows]
+        return vectors if vectors.dtype == np.float32 else vectors.astype(np.float32)
+
+_stores: Dict[Tuple[str, bool], VectorStore] = {}
+
+def get_vector_store(label: str, writable: bool = False) -> VectorStore:
+    """
+    取得共用的向量存放區，第一次呼叫時開啟。
+
+    Args:
+        label (str): 節點標籤。
+        writable (bool): 是否以可寫入模式開啟（只有嵌入流程需要）。
+
+    Returns:
+        VectorStore: 對應 VECTOR_STORE_DIR 下該標籤的向量存放區。唯讀的存放區在檔案被其他行程更新後會重新開啟。
+    """
+    key = (label, writable)
+    if key not in _stores or (not writable and _stores[key].is_stale()):
+        _stores[key] = VectorStore(label, writable=writable)
+    return _stores[key]
+
+def load_node_vectors(graph, label: str, properties: Sequence[str] = ("id", "text")
+                      ) -> Tuple[List[Dict[str, object]], np.ndarray]:
+    """
+    讀出某一標籤節點的屬性及其向量。只傳輸節點屬性與列號，向量直接從記憶體映射檔讀取。
+    沒有向量或版本與存放區不一致的節點會被略過。
+
+    Args:
+        graph: KG_Graph.GraphBackend。
+        label (str): 節點標籤。
+        properties (Sequence[str]): 要一併讀出的節點屬性。
+
+    Returns:
+        Tuple[List[Dict[str, object]], np.ndarray]: 節點屬性列表（另含 vector_row、vector_version），
+        以及順序相同的 (節點數, 維度) 向量。
+    """
+    store = get_vector_store(label)
+    records = []
+    rows = []
+    for record in graph.iter_nodes(label, list(properties) + ["vector_row", "vector_version"]):
+        row = record["vector_row"]
+        version = record["vector_version"]
+        if row is None or store.version(row) != version:
+            continue
+        records.append(record)
+        rows.append(row)
+    return records, store.read(rows)
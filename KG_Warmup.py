@@ -0,0 +1,83 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence
+import argparse
+import time
+
+# 匯入本模組與其他 KG_* 模組都不會載入模型、連線圖譜或讀取索引；
+# 這些資源在第一次查詢時才載入，或由 warmup() 在服務開始接收請求前一次預載。
+DEFAULT_COMPONENTS = ["embedding_model", "graph", "faiss_index", "retrieval_snapshot"]
+
+def _warm_embedding_model() -> None:
+    from KG_Faiss_Query import get_model
+
+    # EmbeddingCache.model 為 KG_Encoder 的編碼服務
+    get_model().model.warmup()
+
+def _warm_graph() -> None:
+    from KG_Graph import get_graph
+
+    # 讀取建置編號：Neo4j 後端會建立連線池並完成第一次連線，local 後端會載入圖譜快照
+    get_graph().get_build_id()
+
+def _warm_faiss_index(labels: Sequence[str]) -> None:
+    from KG_Faiss_Query import build_faiss_index
+    from KG_Index import get_resident_index
+
+    for label in labels:
+        get_resident_index(None, build_faiss_index, label).get()
+
+def _warm_retrieval_snapshot() -> None:
+    from KG_RetrievalSnapshot import get_retrieval_graph
+
+    get_retrieval_graph()
+
+def warmup(components: Optional[List[str]] = None, labels: Sequence[str] = ("Fact",)) -> Dict[str, Optional[float]]:
+    """
+    在不同執行緒中同時預載查詢流程用到的資源，並回報各項的載入時間。
+    某一項失敗不會影響其他項目，錯誤會印出，之後的查詢會在第一次使用時再次嘗試載入。
+
+    Args:
+        components (Optional[List[str]]): 要預載的項目（embedding_model、graph、faiss_index、retrieval_snapshot），
+            None 表示全部。
+        labels (Sequence[str]): faiss_index 要預載的節點標籤，預設只有 Fact。
+
+    Returns:
+        Dict[str, Optional[float]]: 項目名稱對應載入秒數，失敗的項目為 None。
+    """
+    loaders: Dict[str, Callable[[], None]] = {
+        "embedding_model": _warm_embedding_model,
+        "graph": _warm_graph,
+        "faiss_index": lambda: _warm_faiss_index(labels),
+        "retrieval_snapshot": _warm_retrieval_snapshot,
+    }
+    components = DEFAULT_COMPONENTS if components is None else components
+    unknown = [name for name in components if name not in loaders]
+    if unknown:
+        raise ValueError(f"未知的預載項目：{', '.join(unknown)}")
+
+    def timed(name: str) -> Optional[float]:
+        start = time.perf_counter()
+        try:
+            loaders[name]()
+        except Exception as e:
+            print(f"預載 {name} 失敗：{e}")
+            return None
+        return time.perf_counter() - start
+
+    if not components:
+        return {}
+    with ThreadPoolExecutor(max_workers=len(components), thread_name_prefix="warmup") as executor:
+        futures = {name: executor.submit(timed, name) for name in components}
+        return {name: future.result() for name, future in futures.items()}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="預載嵌入模型、圖譜連線、FAISS 索引與檢索快照，並回報各項載入時間")
+    parser.add_argument("--components", nargs="+", default=None, choices=DEFAULT_COMPONENTS, help="要預載的項目（預設全部）")
+    parser.add_argument("--labels", nargs="+", default=["Fact"], help="要預載索引的節點標籤")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    timings = warmup(args.components, args.labels)
+    for name, seconds in timings.items():
+        print(f"{name}: " + ("載入失敗" if seconds is None else f"{seconds:.2f} 秒"))
+    print(f"總耗時 {time.perf_counter() - start:.2f} 秒")